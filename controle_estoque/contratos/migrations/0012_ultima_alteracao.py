@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contratos', '0011_alter_cliente_cnpj'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='ultima_alteracao',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última Alteração'),
+        ),
+    ]
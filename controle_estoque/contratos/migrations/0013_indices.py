@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contratos', '0012_ultima_alteracao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['ativo', 'empresa'], name='cliente_ativo_empresa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['validade', 'ativo'], name='cliente_validade_ativo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['cnpj'], name='cliente_cnpj_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['data_criacao'], name='cliente_data_criacao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historicorenovacao',
+            index=models.Index(fields=['cliente', '-data_renovacao'], name='historico_cliente_data_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contratos', '0013_indices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicorenovacao',
+            name='ultima_alteracao',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última Alteração'),
+        ),
+        migrations.AddField(
+            model_name='sistema',
+            name='ultima_alteracao',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última Alteração'),
+        ),
+        migrations.AddField(
+            model_name='tecnico',
+            name='ultima_alteracao',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última Alteração'),
+        ),
+    ]
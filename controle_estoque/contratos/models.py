@@ -4,11 +4,15 @@ from django.conf import settings
 
 class Sistema(models.Model):
     nome = models.CharField(max_length=100, unique=True)
+    # O nome aparece nos relatórios: entra na versão do cache (contratos.relatorios)
+    ultima_alteracao = models.DateTimeField(auto_now=True, verbose_name="Última Alteração")
     def __str__(self):
         return self.nome
 
 class Tecnico(models.Model):
     nome = models.CharField(max_length=100, unique=True)
+    # O nome aparece nos relatórios: entra na versão do cache (contratos.relatorios)
+    ultima_alteracao = models.DateTimeField(auto_now=True, verbose_name="Última Alteração")
     def __str__(self):
         return self.nome
 
@@ -40,9 +44,22 @@ class Cliente(models.Model):
     
     bloqueado = models.BooleanField(default=False, verbose_name="Bloqueado")
     ativo = models.BooleanField(default=True, verbose_name="Ativo")
+    # Usado na versão dos relatórios em cache (inventario.cache_relatorios)
+    ultima_alteracao = models.DateTimeField(auto_now=True, verbose_name="Última Alteração")
 
     class Meta:
         ordering = ['empresa']
+        indexes = [
+            # Listagens: ativos/inativos por empresa
+            models.Index(fields=['ativo', 'empresa'], name='cliente_ativo_empresa_idx'),
+            # Vencidos e período de validade. A validade vem primeiro: o filtro de
+            # ativo é pouco seletivo e, no SQLite, "WHERE ativo" não usa índice
+            models.Index(fields=['validade', 'ativo'], name='cliente_validade_ativo_idx'),
+            # Conferência de CNPJ duplicado no cadastro
+            models.Index(fields=['cnpj'], name='cliente_cnpj_idx'),
+            # Relatório de contratos por data de cadastro
+            models.Index(fields=['data_criacao'], name='cliente_data_criacao_idx'),
+        ]
 
     def __str__(self):
         return self.empresa
@@ -62,9 +79,14 @@ class HistoricoRenovacao(models.Model):
     porcentagem_reajuste = models.DecimalField(max_digits=5, decimal_places=2, verbose_name="Reajuste Aplicado (%)")
     novo_valor = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Novo Valor")
     usuario_responsavel = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, verbose_name="Usuário Responsável")
+    # Usado na versão do relatório de renovação em cache (contratos.relatorios)
+    ultima_alteracao = models.DateTimeField(auto_now=True, verbose_name="Última Alteração")
 
     class Meta:
         ordering = ['-data_renovacao']
+        indexes = [
+            models.Index(fields=['cliente', '-data_renovacao'], name='historico_cliente_data_idx'),
+        ]
         verbose_name = "Histórico de Renovação"
         verbose_name_plural = "Históricos de Renovações"
 
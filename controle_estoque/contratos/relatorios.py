@@ -0,0 +1,195 @@
+"""
+Montagem dos relatórios em PDF de contratos.
+
+Cada relatório recebe os dados do formulário (um dict simples, que pode ser
+guardado numa TarefaRelatorio) e o usuário, e é usado tanto pelas views
+quanto pelo worker de relatórios (manage.py run_report_worker).
+"""
+from datetime import date, datetime, time
+
+from django.db.models import Count, Max, Prefetch, Sum
+from django.forms import ValidationError
+from django.utils import timezone
+
+from .forms import RelatorioContratosForm, RenovacaoListFilterForm
+from .models import Cliente, HistoricoRenovacao, Sistema, Tecnico
+
+
+def clientes_com_historico():
+    """Clientes com sistema, técnico e histórico de renovações (e quem renovou) carregados junto."""
+    return Cliente.objects.select_related('sistema', 'tecnico').prefetch_related(
+        Prefetch('historico_renovacoes', queryset=HistoricoRenovacao.objects.select_related('usuario_responsavel'))
+    )
+
+
+def _formulario_contratos(parametros):
+    form = RelatorioContratosForm(parametros)
+    if not form.is_valid():
+        raise ValidationError(form.errors.as_text())
+    return form
+
+
+def _clientes_contratos(form):
+    data_inicio = form.cleaned_data['data_inicio']
+    data_fim = form.cleaned_data['data_fim']
+    sistema_obj = form.cleaned_data['sistema']
+    tecnico_obj = form.cleaned_data['tecnico']
+
+    start_date = timezone.make_aware(datetime.combine(data_inicio, time.min))
+    end_date = timezone.make_aware(datetime.combine(data_fim, time.max))
+
+    # 1. Filtro base por data de cadastro
+    clientes = Cliente.objects.filter(
+        data_criacao__gte=start_date,
+        data_criacao__lte=end_date
+    )
+
+    # 2. Filtros de objeto
+    if sistema_obj:
+        clientes = clientes.filter(sistema=sistema_obj)
+    if tecnico_obj:
+        clientes = clientes.filter(tecnico=tecnico_obj)
+    return clientes
+
+
+def contar_contratos(parametros, usuario):
+    return _clientes_contratos(_formulario_contratos(parametros)).count()
+
+
+def _versao_cadastros():
+    """Última alteração de sistemas e técnicos, cujos nomes aparecem nos relatórios."""
+    return [
+        modelo.objects.aggregate(alteracao=Max('ultima_alteracao'))['alteracao']
+        for modelo in (Sistema, Tecnico)
+    ]
+
+
+def _versao_clientes(clientes):
+    versao = clientes.aggregate(total=Count('id'), maior_id=Max('id'), alteracao=Max('ultima_alteracao'))
+    # Renomear um sistema ou técnico muda o PDF sem tocar no cliente
+    versao['cadastros'] = _versao_cadastros()
+    # Vencidos e ativos dependem da data de hoje
+    versao['hoje'] = date.today().isoformat()
+    return versao
+
+
+def versao_contratos(parametros, usuario):
+    """Versão dos dados para o cache de relatórios."""
+    return _versao_clientes(_clientes_contratos(_formulario_contratos(parametros)))
+
+
+def montar_pdf_contratos(parametros, usuario):
+    """Retorna (template, contexto, nome do arquivo) do relatório de contratos."""
+    form = _formulario_contratos(parametros)
+    clientes = _clientes_contratos(form)
+    status = form.cleaned_data['status']
+
+    # 3. Lógica de filtro de status (para a tabela)
+    status_counts = None
+    if not status: # Se for "Todos os Status"
+        # Fazemos uma cópia do queryset para calcular os totais de status
+        clientes_filtrados_status = clientes
+        vencidos_count = clientes_filtrados_status.filter(ativo=True, bloqueado=False, validade__lt=date.today()).count()
+        status_counts = {
+            'ativos': clientes_filtrados_status.filter(ativo=True, bloqueado=False, validade__gte=date.today()).count(),
+            'inativos': clientes_filtrados_status.filter(ativo=False).count(),
+            'bloqueados': clientes_filtrados_status.filter(bloqueado=True).count(),
+            'vencidos': vencidos_count,
+        }
+    else:
+        # Se um status específico foi selecionado, filtramos o queryset principal
+        if status == 'ativos':
+            clientes = clientes.filter(ativo=True)
+        elif status == 'inativos':
+            clientes = clientes.filter(ativo=False)
+        elif status == 'bloqueados':
+            clientes = clientes.filter(bloqueado=True)
+        elif status == 'vencidos':
+            clientes = clientes.filter(validade__lt=date.today())
+
+    # --- INÍCIO DA CORREÇÃO DA SOMA FINANCEIRA ---
+    # Criamos um novo queryset para a soma que SEMPRE filtra por 'ativo=True'
+    # Isso garante que clientes Inativos nunca sejam somados.
+    clientes_para_soma = clientes.filter(ativo=True)
+
+    total_mensal = clientes_para_soma.filter(tipo_cobranca='M').aggregate(total=Sum('valor_mensal'))['total'] or 0
+    total_anual = clientes_para_soma.filter(tipo_cobranca='A').aggregate(total=Sum('valor_anual'))['total'] or 0
+    # --- FIM DA CORREÇÃO DA SOMA FINANCEIRA ---
+
+    resumo_por_sistema = clientes.values('sistema__nome').annotate(quantidade=Count('id')).order_by('-quantidade')
+    resumo_por_tecnico = clientes.exclude(tecnico__isnull=True).values('tecnico__nome').annotate(quantidade=Count('id')).order_by('-quantidade')
+
+    context = {
+        'clientes': clientes.select_related('sistema').order_by('data_criacao'),
+        'data_inicio': form.cleaned_data['data_inicio'],
+        'data_fim': form.cleaned_data['data_fim'],
+        'sistema_filtrado': form.cleaned_data['sistema'],
+        'tecnico_filtrado': form.cleaned_data['tecnico'],
+        'status_filtrado': dict(form.fields['status'].choices).get(status),
+        'data_geracao': timezone.now(),
+        'resumo_por_sistema': resumo_por_sistema,
+        'resumo_por_tecnico': resumo_por_tecnico,
+        'today': date.today(),
+        'status_counts': status_counts,
+        'total_mensal': total_mensal,
+        'total_anual': total_anual,
+    }
+    filename = f"relatorio_clientes_{timezone.now().strftime('%Y%m%d')}.pdf"
+    return 'contratos/relatorio/pdf_template.html', context, filename
+
+
+def _clientes_renovacao(parametros):
+    # Reutiliza o mesmo formulário e lógica de filtro da tela de renovação
+    filter_form = RenovacaoListFilterForm(parametros or None)
+
+    clientes = clientes_com_historico()
+
+    if filter_form.is_valid() and parametros:
+        cnpj = filter_form.cleaned_data.get('cnpj')
+        sistema = filter_form.cleaned_data.get('sistema')
+        tecnico = filter_form.cleaned_data.get('tecnico')
+        mostrar_inativos = filter_form.cleaned_data.get('mostrar_inativos')
+        if mostrar_inativos:
+            clientes = clientes.filter(ativo=False)
+        else:
+            clientes = clientes.filter(ativo=True)
+        if cnpj: clientes = clientes.filter(cnpj__icontains=cnpj)
+        if sistema: clientes = clientes.filter(sistema=sistema)
+        if tecnico: clientes = clientes.filter(tecnico=tecnico)
+        if filter_form.cleaned_data.get('mostrar_bloqueados'): clientes = clientes.filter(bloqueado=True)
+        if filter_form.cleaned_data.get('mostrar_vencidos'): clientes = clientes.filter(validade__lt=date.today())
+        if filter_form.cleaned_data.get('filtrar_por_data'):
+            data_inicio = filter_form.cleaned_data.get('data_inicio')
+            data_fim = filter_form.cleaned_data.get('data_fim')
+            if data_inicio and data_fim:
+                clientes = clientes.filter(validade__gte=data_inicio, validade__lte=data_fim)
+    else:
+        clientes = clientes.filter(ativo=True)
+
+    return clientes.order_by('empresa')
+
+
+def contar_renovacao(parametros, usuario):
+    return _clientes_renovacao(parametros).count()
+
+
+def versao_renovacao(parametros, usuario):
+    """Versão dos dados para o cache de relatórios, incluindo o histórico de renovações."""
+    clientes = _clientes_renovacao(parametros)
+    versao = _versao_clientes(clientes)
+    versao['historico'] = HistoricoRenovacao.objects.filter(cliente__in=clientes.values('id')).aggregate(
+        total=Count('id'), maior_id=Max('id'), alteracao=Max('ultima_alteracao')
+    )
+    return versao
+
+
+def montar_pdf_renovacao(parametros, usuario):
+    """Retorna (template, contexto, nome do arquivo) do relatório de renovação."""
+    context = {
+        'clientes': _clientes_renovacao(parametros),
+        'today': date.today(),
+        'data_geracao': timezone.now(),
+        'filtros_aplicados': parametros,
+    }
+    filename = f"relatorio_renovacao_{timezone.now().strftime('%Y%m%d')}.pdf"
+    return 'contratos/renovacao/renovacao_pdf.html', context, filename
@@ -0,0 +1,88 @@
+import os
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Cliente, HistoricoRenovacao, Sistema, Tecnico
+from .relatorios import versao_contratos, versao_renovacao
+
+
+class VersaoRelatoriosTests(TestCase):
+    """A versão dos relatórios em cache muda com tudo o que aparece no PDF."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('contratos', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        configuracao = override_settings(
+            RELATORIOS_DIR=diretorio.name,
+            RELATORIOS_CACHE_DIR=os.path.join(diretorio.name, 'cache'),
+            RELATORIO_LIMITE_SINCRONO=100,
+        )
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        self.sistema = Sistema.objects.create(nome='ERP')
+        self.tecnico = Tecnico.objects.create(nome='Ana')
+        hoje = timezone.localdate()
+        self.cliente = Cliente.objects.create(
+            empresa='Empresa', cnpj='00000000000100', sistema=self.sistema, tecnico=self.tecnico,
+            validade=hoje + timedelta(days=30),
+        )
+        self.historico = HistoricoRenovacao.objects.create(
+            cliente=self.cliente, validade_anterior=hoje, nova_validade=hoje + timedelta(days=30),
+            porcentagem_reajuste=5, usuario_responsavel=self.usuario,
+        )
+        self.periodo = {'data_inicio': hoje.isoformat(), 'data_fim': hoje.isoformat()}
+
+    def _renomear(self, cadastro):
+        cadastro.nome += ' (novo)'
+        cadastro.save()
+
+    def test_versao_contratos(self):
+        versao = versao_contratos(self.periodo, self.usuario)
+        self.assertEqual(versao_contratos(self.periodo, self.usuario), versao)
+
+        for cadastro in (self.sistema, self.tecnico):
+            self._renomear(cadastro)
+            nova = versao_contratos(self.periodo, self.usuario)
+            self.assertNotEqual(nova, versao, cadastro)
+            versao = nova
+
+    def test_versao_renovacao(self):
+        versao = versao_renovacao({}, self.usuario)
+
+        # Edição de uma renovação que já existia, sem mudar contagem nem maior id
+        self.historico.porcentagem_reajuste = 7
+        self.historico.save()
+        nova = versao_renovacao({}, self.usuario)
+        self.assertNotEqual(nova, versao)
+
+        self._renomear(self.tecnico)
+        self.assertNotEqual(versao_renovacao({}, self.usuario), nova)
+
+    def test_pdf_em_cache_refeito_ao_renomear(self):
+        primeira = self.client.post(reverse('relatorio_contratos'), self.periodo)
+        self.assertEqual(primeira['Content-Type'], 'application/pdf')
+        etag = primeira['ETag']
+        self.assertEqual(
+            self.client.post(reverse('relatorio_contratos'), self.periodo, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+        self._renomear(self.sistema)
+        resposta = self.client.post(reverse('relatorio_contratos'), self.periodo, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta['ETag'], etag)
+
+        # Renovação: editar o histórico refaz o PDF
+        etag = self.client.get(reverse('gerar_pdf_renovacao'))['ETag']
+        self.historico.nova_validade += timedelta(days=1)
+        self.historico.save()
+        resposta = self.client.get(reverse('gerar_pdf_renovacao'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta['ETag'], etag)
@@ -9,12 +9,10 @@ from datetime import date
 from django.db.models import ProtectedError
 from django.db.models import Count
 from .forms import RelatorioContratosForm
-from inventario.utils import render_to_pdf # Reutilizando a função de PDF do seu outro app
-from django.utils import timezone
+from .relatorios import clientes_com_historico
+from inventario.fila_relatorios import gerar_ou_enfileirar # Reutilizando a geração de PDF do seu outro app
 import calendar
-from django.http import HttpResponse
-from django.db.models import Count, Sum, Q
-from datetime import date, datetime, time
+from django.db.models import Count, Q
 from decimal import Decimal
 from dateutil.relativedelta import relativedelta
 from django.views.decorators.http import require_POST
@@ -167,8 +165,8 @@ def excluir_tecnico(request, pk):
 # --- Views de Cliente ---
 @login_required
 def listar_clientes(request):
-    # Usamos o prefetch_related que já estava no seu modal da lista de renovação
-    clientes = Cliente.objects.all().prefetch_related('historico_renovacoes')
+    # Sistema, técnico e histórico (modal) vêm junto: sem consultas por cliente no template
+    clientes = clientes_com_historico()
 
     # Lógica de filtro (a mesma que já funciona em 'renovacao_list')
     cnpj = request.GET.get('cnpj')
@@ -309,83 +307,10 @@ def relatorio_contratos(request):
     if request.method == 'POST':
         form = RelatorioContratosForm(request.POST)
         if form.is_valid():
-            data_inicio = form.cleaned_data['data_inicio']
-            data_fim = form.cleaned_data['data_fim']
-            sistema_obj = form.cleaned_data['sistema']
-            tecnico_obj = form.cleaned_data['tecnico']
-            status = form.cleaned_data['status']
-
-            start_date = timezone.make_aware(datetime.combine(data_inicio, time.min))
-            end_date = timezone.make_aware(datetime.combine(data_fim, time.max))
-            
-            # 1. Filtro base por data de cadastro
-            clientes = Cliente.objects.filter(
-                data_criacao__gte=start_date,
-                data_criacao__lte=end_date
-            )
-
-            # 2. Filtros de objeto
-            if sistema_obj:
-                clientes = clientes.filter(sistema=sistema_obj)
-            if tecnico_obj:
-                clientes = clientes.filter(tecnico=tecnico_obj)
-            
-            # 3. Lógica de filtro de status (para a tabela)
-            status_counts = None
-            if not status: # Se for "Todos os Status"
-                # Fazemos uma cópia do queryset para calcular os totais de status
-                clientes_filtrados_status = clientes
-                vencidos_count = clientes_filtrados_status.filter(ativo=True, bloqueado=False, validade__lt=date.today()).count()
-                status_counts = {
-                    'ativos': clientes_filtrados_status.filter(ativo=True, bloqueado=False, validade__gte=date.today()).count(),
-                    'inativos': clientes_filtrados_status.filter(ativo=False).count(),
-                    'bloqueados': clientes_filtrados_status.filter(bloqueado=True).count(),
-                    'vencidos': vencidos_count,
-                }
-            else:
-                # Se um status específico foi selecionado, filtramos o queryset principal
-                if status == 'ativos':
-                    clientes = clientes.filter(ativo=True)
-                elif status == 'inativos':
-                    clientes = clientes.filter(ativo=False)
-                elif status == 'bloqueados':
-                    clientes = clientes.filter(bloqueado=True)
-                elif status == 'vencidos':
-                    clientes = clientes.filter(validade__lt=date.today())
-            
-            # --- INÍCIO DA CORREÇÃO DA SOMA FINANCEIRA ---
-            # Criamos um novo queryset para a soma que SEMPRE filtra por 'ativo=True'
-            # Isso garante que clientes Inativos nunca sejam somados.
-            clientes_para_soma = clientes.filter(ativo=True)
-            
-            total_mensal = clientes_para_soma.filter(tipo_cobranca='M').aggregate(total=Sum('valor_mensal'))['total'] or 0
-            total_anual = clientes_para_soma.filter(tipo_cobranca='A').aggregate(total=Sum('valor_anual'))['total'] or 0
-            # --- FIM DA CORREÇÃO DA SOMA FINANCEIRA ---
-
-            resumo_por_sistema = clientes.values('sistema__nome').annotate(quantidade=Count('id')).order_by('-quantidade')
-            resumo_por_tecnico = clientes.exclude(tecnico__isnull=True).values('tecnico__nome').annotate(quantidade=Count('id')).order_by('-quantidade')
-
-            context = {
-                'clientes': clientes.order_by('data_criacao'),
-                'data_inicio': data_inicio,
-                'data_fim': data_fim,
-                'sistema_filtrado': sistema_obj,
-                'tecnico_filtrado': tecnico_obj,
-                'status_filtrado': dict(form.fields['status'].choices).get(status),
-                'data_geracao': timezone.now(),
-                'resumo_por_sistema': resumo_por_sistema,
-                'resumo_por_tecnico': resumo_por_tecnico,
-                'today': date.today(),
-                'status_counts': status_counts,
-                'total_mensal': total_mensal,
-                'total_anual': total_anual,
-            }
-            
-            pdf = render_to_pdf('contratos/relatorio/pdf_template.html', context)
-            if pdf:
-                response = HttpResponse(pdf, content_type='application/pdf')
-                filename = f"relatorio_clientes_{timezone.now().strftime('%Y%m%d')}.pdf"
-                response['Content-Disposition'] = f'inline; filename="{filename}"'
+            # Os filtros seguem como dados do formulário: o relatório pode ir para a fila
+            parametros = {campo: request.POST.get(campo, '') for campo in form.fields}
+            response = gerar_ou_enfileirar(request, 'contratos', parametros)
+            if response:
                 return response
             
             messages.error(request, "Ocorreu um erro ao gerar o PDF.")
@@ -400,7 +325,7 @@ def renovacao_list(request):
     # Usa o formulário de filtro para processar os dados da URL
     filter_form = RenovacaoListFilterForm(request.GET or None)
     
-    clientes = Cliente.objects.all().prefetch_related('historico_renovacoes')
+    clientes = clientes_com_historico()
 
     # Aplica os filtros se o formulário for válido e se houver dados na URL
     if filter_form.is_valid() and request.GET:
@@ -565,50 +490,9 @@ def excluir_historico_renovacao(request, pk):
 
 @login_required
 def gerar_pdf_renovacao(request):
-    # Reutiliza o mesmo formulário e lógica de filtro da tela de renovação
-    filter_form = RenovacaoListFilterForm(request.GET or None)
-    
-    clientes = Cliente.objects.all().prefetch_related('historico_renovacoes')
-
-    if filter_form.is_valid() and request.GET:
-        # ... (toda a sua lógica de filtro, que já está correta, permanece aqui) ...
-        cnpj = filter_form.cleaned_data.get('cnpj')
-        sistema = filter_form.cleaned_data.get('sistema')
-        tecnico = filter_form.cleaned_data.get('tecnico')
-        mostrar_inativos = filter_form.cleaned_data.get('mostrar_inativos')
-        if mostrar_inativos:
-            clientes = clientes.filter(ativo=False)
-        else:
-            clientes = clientes.filter(ativo=True)
-        if cnpj: clientes = clientes.filter(cnpj__icontains=cnpj)
-        if sistema: clientes = clientes.filter(sistema=sistema)
-        if tecnico: clientes = clientes.filter(tecnico=tecnico)
-        if filter_form.cleaned_data.get('mostrar_bloqueados'): clientes = clientes.filter(bloqueado=True)
-        if filter_form.cleaned_data.get('mostrar_vencidos'): clientes = clientes.filter(validade__lt=date.today())
-        if filter_form.cleaned_data.get('filtrar_por_data'):
-            data_inicio = filter_form.cleaned_data.get('data_inicio')
-            data_fim = filter_form.cleaned_data.get('data_fim')
-            if data_inicio and data_fim:
-                clientes = clientes.filter(validade__gte=data_inicio, validade__lte=data_fim)
-    else:
-        clientes = clientes.filter(ativo=True)
-
-    clientes = clientes.order_by('empresa')
-
-    context = {
-        'clientes': clientes,
-        'today': date.today(),
-        'data_geracao': timezone.now(),
-        'filtros_aplicados': request.GET,
-    }
-    
-    # --- CORREÇÃO DO CAMINHO APLICADA AQUI ---
-    pdf = render_to_pdf('contratos/renovacao/renovacao_pdf.html', context)
-    
-    if pdf:
-        response = HttpResponse(pdf, content_type='application/pdf')
-        filename = f"relatorio_renovacao_{timezone.now().strftime('%Y%m%d')}.pdf"
-        response['Content-Disposition'] = f'inline; filename="{filename}"'
+    # Filtros da tela de renovação; ver contratos.relatorios.montar_pdf_renovacao
+    response = gerar_ou_enfileirar(request, 'renovacao', request.GET.dict())
+    if response:
         return response
     
     messages.error(request, "Ocorreu um erro ao gerar o relatório PDF.")
@@ -45,6 +45,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primeiro da lista para medir os demais; desligado sem SERVER_TIMING
+    'inventario.instrumentacao.ServerTimingMiddleware',
+    # Contagem e duração por rota para /metrics; desligado sem METRICAS
+    'inventario.metricas.MetricasMiddleware',
+    # Buffer de consultas lentas; desligado com CONSULTAS_LENTAS_MS = 0
+    'inventario.consultas_lentas.ConsultasLentasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,7 +64,8 @@ ROOT_URLCONF = 'controle_estoque.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates com o tempo de renderização somado ao Server-Timing
+        'BACKEND': 'inventario.instrumentacao.DjangoTemplatesMedidos',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -169,3 +176,37 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+
+# RELATÓRIOS EM SEGUNDO PLANO (manage.py run_report_worker)
+# Acima deste número de linhas o relatório vai para a fila em vez de ser gerado na requisição
+RELATORIO_LIMITE_SINCRONO = int(os.getenv('RELATORIO_LIMITE_SINCRONO', 2000))
+# Tempo que um relatório pronto fica disponível para download
+RELATORIO_VALIDADE_HORAS = int(os.getenv('RELATORIO_VALIDADE_HORAS', 24))
+# Fora do MEDIA_ROOT: o download passa pela view, que confere o dono da tarefa
+RELATORIOS_DIR = BASE_DIR / 'relatorios_gerados'
+# Cache de relatórios em PDF (inventario.cache_relatorios), com poda LRU acima do limite
+RELATORIOS_CACHE_DIR = BASE_DIR / 'relatorios_cache'
+RELATORIOS_CACHE_MAX_MB = int(os.getenv('RELATORIOS_CACHE_MAX_MB', 200))
+
+
+# TEMPOS POR REQUISIÇÃO (inventario.instrumentacao)
+# Liga o cabeçalho Server-Timing e os percentis por view da página "Tempos por view"
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'False').lower() in ('1', 'true', 'sim')
+
+
+# MÉTRICAS PROMETHEUS (/metrics, inventario.metricas)
+METRICAS = os.getenv('METRICAS', 'False').lower() in ('1', 'true', 'sim')
+# Diretório compartilhado pelos workers do gunicorn e pelo run_report_worker: cada
+# processo grava o seu arquivo e /metrics soma todos. Esvaziar ao reiniciar o serviço
+METRICAS_DIR = os.getenv('METRICAS_DIR', str(BASE_DIR / 'metricas'))
+# Se definido, /metrics exige o cabeçalho "Authorization: Bearer <token>"
+METRICAS_TOKEN = os.getenv('METRICAS_TOKEN', '')
+# Validade dos indicadores de negócio (contratos, alertas, cache de relatórios) no cache
+METRICAS_CACHE_SEGUNDOS = int(os.getenv('METRICAS_CACHE_SEGUNDOS', 60))
+
+
+# CONSULTAS LENTAS (inventario.consultas_lentas)
+# Comandos SQL acima deste tempo (ms) vão para a página "Consultas lentas"; 0 desliga
+CONSULTAS_LENTAS_MS = float(os.getenv('CONSULTAS_LENTAS_MS', 0))
+# Quantidade de consultas guardadas por processo (as mais antigas saem primeiro)
+CONSULTAS_LENTAS_MAX = int(os.getenv('CONSULTAS_LENTAS_MAX', 200))
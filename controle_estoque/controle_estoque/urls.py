@@ -27,6 +27,9 @@ urlpatterns = [
     path('usuario/toggle-admin/<int:user_id>/', views.mudar_status_admin, name='mudar_status_admin'),
     path('usuario/toggle-ativo/<int:user_id>/', views.mudar_status_ativo, name='mudar_status_ativo'),
     path('usuario/excluir/<int:user_id>/', views.excluir_usuario, name='excluir_usuario'),
+    path('tempos/', views.tempos_por_view, name='tempos_por_view'),
+    path('consultas-lentas/', views.consultas_lentas, name='consultas_lentas'),
+    path('metrics', views.metricas_prometheus, name='metricas_prometheus'),
 
     # Seção de Contratos (agora inclui as URLs do novo app)
     path('contratos/', include('contratos.urls')),
@@ -38,14 +41,25 @@ urlpatterns = [
     path('produto/novo/', views.criar_produto, name='criar_produto'),
     path('produto/editar/<int:pk>/', views.editar_produto, name='editar_produto'),
     path('produto/excluir/<int:pk>/', views.excluir_produto, name='excluir_produto'),
+    path('produtos/alertas/', views.alertas_estoque, name='alertas_estoque'),
+    path('produtos/alertas/json/', views.alertas_estoque_json, name='alertas_estoque_json'),
+    path('produtos/autocompletar/', views.autocompletar_produtos, name='autocompletar_produtos'),
+    path('lotes/rastrear/', views.rastrear_lote_view, name='rastrear_lote'),
+    path('lotes/rastrear/json/', views.rastrear_lote_json, name='rastrear_lote_json'),
     path('categorias/', views.listar_categorias, name='listar_categorias'),
     path('categoria/nova/', views.criar_categoria, name='criar_categoria'),
     path('categoria/editar/<int:pk>/', views.editar_categoria, name='editar_categoria'),
     path('categoria/excluir/<int:pk>/', views.excluir_categoria, name='excluir_categoria'),
     path('transacoes/', views.listar_transacao, name='listar_transacao'),
+    path('transacoes/exportar/<str:formato>/', views.exportar_transacoes, name='exportar_transacoes'),
     path('transacao/nova/', views.criar_transacao, name='criar_transacao'),
     path('transacao/arquivar/<int:pk>/', views.arquivar_transacao, name='arquivar_transacao'),
+    path('importar/', views.importar_csv, name='importar_csv'),
     path('relatorios/', views.transacao_pdf_view, name='relatorio_transacoes'),
+    path('relatorios/gerados/', views.listar_relatorios, name='listar_relatorios'),
+    path('relatorios/gerados/<int:pk>/', views.status_relatorio, name='status_relatorio'),
+    path('relatorios/gerados/<int:pk>/json/', views.status_relatorio_json, name='status_relatorio_json'),
+    path('relatorios/gerados/<int:pk>/download/', views.download_relatorio, name='download_relatorio'),
 ]
 
 # --- BLOCO DE CÓDIGO ADICIONADO PARA SERVIR ARQUIVOS DE MÍDIA EM DESENVOLVIMENTO ---
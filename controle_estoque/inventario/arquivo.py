@@ -0,0 +1,107 @@
+"""
+Arquivamento do histórico: move para tabelas de arquivo as linhas que não
+participam mais da operação do dia a dia.
+
+* Item totalmente consumido (disponivel=False) cujo último consumo é anterior
+  ao corte vai para ItemArquivado, junto com os seus ConsumoLote.
+* Transacao marcada como arquivada (baixa) e anterior ao corte vai para
+  TransacaoArquivada, desde que nenhum Item ou ConsumoLote da tabela
+  principal ainda aponte para ela.
+
+As tabelas principais (listagem de transações, saída FIFO, saldo) ficam do
+tamanho do estoque em uso. Cada lote de `tamanho_lote` linhas é movido na sua
+própria transação, para não segurar bloqueios por muito tempo.
+"""
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef, Q
+
+from .models import ConsumoLote, ConsumoLoteArquivado, Item, ItemArquivado, Transacao, TransacaoArquivada
+
+TAMANHO_LOTE = 1000
+
+
+def itens_arquivaveis(corte):
+    return Item.objects.filter(disponivel=False).annotate(
+        ultimo_consumo=Max('consumos__transacao__data')
+    ).filter(
+        Q(ultimo_consumo__lt=corte) | Q(ultimo_consumo__isnull=True, data_criacao__lt=corte)
+    )
+
+
+def transacoes_arquivaveis(corte):
+    return Transacao.objects.filter(arquivada=True, data__lt=corte).exclude(
+        Exists(Item.objects.filter(transacao=OuterRef('pk')))
+    ).exclude(
+        Exists(ConsumoLote.objects.filter(transacao=OuterRef('pk')))
+    )
+
+
+def _arquivar_lote_itens(ids):
+    with transaction.atomic():
+        # Relê com bloqueio: só move o que continua consumido
+        itens = list(Item.objects.select_for_update().filter(id__in=ids, disponivel=False))
+        ids = [item.id for item in itens]
+        consumos = list(ConsumoLote.objects.filter(item_id__in=ids))
+
+        ItemArquivado.objects.bulk_create([
+            ItemArquivado(
+                id=item.id, produto_id=item.produto_id, lote=item.lote, transacao_id=item.transacao_id,
+                quantidade_inicial=item.quantidade_inicial, data_criacao=item.data_criacao,
+            )
+            for item in itens
+        ])
+        ConsumoLoteArquivado.objects.bulk_create([
+            ConsumoLoteArquivado(
+                id=consumo.id, item_id=consumo.item_id, transacao_id=consumo.transacao_id,
+                quantidade=consumo.quantidade,
+            )
+            for consumo in consumos
+        ])
+        ConsumoLote.objects.filter(id__in=[consumo.id for consumo in consumos]).delete()
+        Item.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def _arquivar_lote_transacoes(ids, corte):
+    with transaction.atomic():
+        transacoes = list(transacoes_arquivaveis(corte).select_for_update().filter(id__in=ids))
+        TransacaoArquivada.objects.bulk_create([
+            TransacaoArquivada(
+                id=t.id, tipo_transacao_id=t.tipo_transacao_id, usuario_id=t.usuario_id,
+                produto_id=t.produto_id, data=t.data, quantidade=t.quantidade,
+                observacoes=t.observacoes, ultima_alteracao=t.ultima_alteracao,
+            )
+            for t in transacoes
+        ])
+        Transacao.objects.filter(id__in=[t.id for t in transacoes]).delete()
+    return len(transacoes)
+
+
+def _em_lotes(queryset, tamanho_lote):
+    """Ids do queryset em lotes crescentes; cada lote é lido depois que o anterior foi movido."""
+    ultimo_id = 0
+    while True:
+        ids = list(queryset.filter(id__gt=ultimo_id).order_by('id').values_list('id', flat=True)[:tamanho_lote])
+        if not ids:
+            return
+        yield ids
+        ultimo_id = ids[-1]
+
+
+def arquivar_itens(corte, tamanho_lote=TAMANHO_LOTE, ao_mover=None):
+    total = 0
+    for ids in _em_lotes(itens_arquivaveis(corte), tamanho_lote):
+        total += _arquivar_lote_itens(ids)
+        if ao_mover:
+            ao_mover(total)
+    return total
+
+
+def arquivar_transacoes(corte, tamanho_lote=TAMANHO_LOTE, ao_mover=None):
+    # Os itens vêm antes: uma entrada só sai da tabela principal depois dos seus lotes
+    total = 0
+    for ids in _em_lotes(transacoes_arquivaveis(corte), tamanho_lote):
+        total += _arquivar_lote_transacoes(ids, corte)
+        if ao_mover:
+            ao_mover(total)
+    return total
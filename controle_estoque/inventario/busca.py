@@ -0,0 +1,313 @@
+"""
+Busca de produtos por nome, descrição, categoria e número de lote.
+
+O texto de cada produto fica normalizado em BuscaProduto: minúsculas, sem
+acentos, sem palavras vazias ("de", "com"...) e com o plural reduzido, de
+modo que "Parafusos de Aço" e "parafuso aco" batem. A consulta passa pela
+mesma normalização; cada termo casa como prefixo e todos são obrigatórios.
+
+* MySQL: índices FULLTEXT em (nome) e (nome, texto), consultados em
+  BOOLEAN MODE. Termos menores que o mínimo do FULLTEXT
+  (innodb_ft_min_token_size, 3) são filtrados com LIKE.
+* Outros bancos: índice invertido em memória, montado na primeira busca e
+  atualizado a cada busca com as linhas alteradas desde a anterior.
+
+A relevância pesa mais o nome do que o resto do texto. O índice é mantido
+pelas views e importações que alteram produtos, categorias e lotes
+(`indexar_produtos`); `manage.py reindexar_busca` o reconstrói inteiro.
+"""
+import bisect
+import threading
+import unicodedata
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import BuscaProduto, Categoria, Item, Produto
+
+LIMITE_RESULTADOS = 500
+PESO_NOME = 3
+PESO_TEXTO = 1
+# Tamanho mínimo de token do FULLTEXT do InnoDB (innodb_ft_min_token_size)
+MINIMO_FULLTEXT = 3
+# Linhas gravadas por transações lentas podem ter atualizado_em anterior à última leitura
+MARGEM_ATUALIZACAO = timedelta(seconds=30)
+
+PALAVRAS_VAZIAS = frozenset({
+    'a', 'o', 'as', 'os', 'e', 'de', 'da', 'do', 'das', 'dos', 'em', 'no', 'na', 'nos', 'nas',
+    'com', 'sem', 'para', 'por', 'um', 'uma', 'ou',
+})
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos e só com letras e dígitos separados por espaço."""
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ''.join(c if c.isalnum() else ' ' for c in sem_acentos.lower())
+
+
+def _singular(token):
+    """Redução simples de plural do português (parafusos -> parafuso, cabos -> cabo)."""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    for sufixo, troca in (('oes', 'ao'), ('aes', 'ao'), ('ais', 'al'), ('eis', 'el'), ('ns', 'm')):
+        if token.endswith(sufixo):
+            return token[:-len(sufixo)] + troca
+    if token.endswith(('res', 'zes', 'ses')):
+        return token[:-2]
+    if token.endswith('s') and not token.endswith(('is', 'us', 'ss')):
+        return token[:-1]
+    return token
+
+
+def tokens(texto):
+    return [_singular(token) for token in normalizar(texto).split() if token not in PALAVRAS_VAZIAS]
+
+
+def textos_busca(nome, descricao, categoria, lotes):
+    """Retorna (nome, texto) normalizados para gravar em BuscaProduto."""
+    texto = ' '.join(tokens(descricao) + tokens(categoria) + [t for lote in lotes for t in tokens(lote)])
+    return ' '.join(tokens(nome)), texto
+
+
+def indexar_produtos(ids):
+    """(Re)grava o texto de busca dos produtos indicados."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    lotes = defaultdict(list)
+    for produto_id, lote in Item.objects.filter(produto_id__in=ids).values_list('produto_id', 'lote').distinct():
+        if lote:
+            lotes[produto_id].append(lote)
+
+    registros = []
+    for produto_id, nome, descricao, categoria in Produto.objects.filter(id__in=ids).values_list(
+        'id', 'nome', 'descricao', 'categoria__nome'
+    ):
+        nome, texto = textos_busca(nome, descricao, categoria, sorted(lotes[produto_id]))
+        registros.append(BuscaProduto(produto_id=produto_id, nome=nome, texto=texto))
+
+    BuscaProduto.objects.bulk_create(
+        registros,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['produto'],
+        update_fields=['nome', 'texto', 'atualizado_em'],
+    )
+    return len(registros)
+
+
+def indexar_categoria(categoria):
+    return indexar_produtos(categoria.produto_set.values_list('id', flat=True))
+
+
+def sincronizar_indice(tamanho_bloco=1000):
+    """Indexa os produtos sem texto de busca ou alterados depois da última indexação."""
+    pendentes = Produto.objects.filter(
+        Q(busca__isnull=True) | Q(ultima_alteracao__gt=F('busca__atualizado_em'))
+    ).order_by('id').values_list('id', flat=True)
+    total = 0
+    ultimo_id = 0
+    while True:
+        ids = list(pendentes.filter(id__gt=ultimo_id)[:tamanho_bloco])
+        if not ids:
+            return total
+        total += indexar_produtos(ids)
+        ultimo_id = ids[-1]
+
+
+class IndiceInvertido:
+    """Termo -> {id: peso}, com os termos ordenados para a busca por prefixo."""
+
+    def __init__(self):
+        self.postagens = {}
+        self.termos_por_id = {}
+        self._termos = []
+        self._novos = []
+
+    def adicionar(self, id, campos):
+        """`campos` é uma lista de (tokens, peso); substitui o que havia para o id."""
+        self.remover(id)
+        pesos = {}
+        for lista, peso in campos:
+            for token in lista:
+                pesos[token] = max(pesos.get(token, 0), peso)
+        for token, peso in pesos.items():
+            postagem = self.postagens.get(token)
+            if postagem is None:
+                postagem = self.postagens[token] = {}
+                self._novos.append(token)
+            postagem[id] = peso
+        self.termos_por_id[id] = tuple(pesos)
+
+    def remover(self, id):
+        # Termos que ficam sem postagem continuam na lista ordenada: só não casam com nada
+        for token in self.termos_por_id.pop(id, ()):
+            self.postagens[token].pop(id, None)
+
+    def _ordenar(self):
+        if len(self._novos) > 100:
+            self._termos = sorted(self.postagens)
+        else:
+            for token in self._novos:
+                bisect.insort(self._termos, token)
+        self._novos = []
+
+    def _expandir(self, termo):
+        # Um caractere só casa inteiro: como prefixo, pegaria quase o índice todo
+        if len(termo) < 2:
+            return [termo] if termo in self.postagens else []
+        if self._novos:
+            self._ordenar()
+        inicio = bisect.bisect_left(self._termos, termo)
+        fim = bisect.bisect_left(self._termos, termo + '\uffff')
+        return self._termos[inicio:fim]
+
+    def _pontuar(self, termo, candidatos=None):
+        """Peso de cada id para o termo; com `candidatos`, só entre eles."""
+        encontrados = {}
+        for token in self._expandir(termo):
+            postagem = self.postagens[token]
+            fator = 2 if token == termo else 1
+            ids = postagem.keys() if candidatos is None else postagem.keys() & candidatos.keys()
+            if not encontrados:
+                encontrados = {id: postagem[id] * fator for id in ids}
+                continue
+            for id in ids:
+                peso = postagem[id] * fator
+                if peso > encontrados.get(id, 0):
+                    encontrados[id] = peso
+        return encontrados
+
+    def _frequencia(self, termo):
+        return sum(len(self.postagens[token]) for token in self._expandir(termo))
+
+    def buscar(self, termos, limite=LIMITE_RESULTADOS):
+        """Ids que casam com todos os termos, do mais para o menos relevante."""
+        if not termos:
+            return []
+        # Começa pelo termo mais raro: os seguintes só olham os candidatos que sobraram
+        pontuacao = None
+        for termo in sorted(set(termos), key=self._frequencia):
+            encontrados = self._pontuar(termo, pontuacao)
+            if pontuacao is None:
+                pontuacao = encontrados
+            else:
+                pontuacao = {id: pontos + encontrados[id] for id, pontos in pontuacao.items() if id in encontrados}
+            if not pontuacao:
+                return []
+        # Maior pontuação primeiro; no empate, menor id (a ordenação é estável)
+        ids = sorted(pontuacao)
+        ids.sort(key=pontuacao.__getitem__, reverse=True)
+        return ids[:limite]
+
+
+class _IndiceProdutos:
+    """
+    Índice em memória sobre BuscaProduto. A cada busca relê só as linhas
+    alteradas desde a leitura anterior (o maior atualizado_em sai do índice da
+    coluna). De tempos em tempos confere a quantidade de linhas e, se não
+    bater (produtos apagados, linha gravada tarde por uma transação lenta),
+    monta o índice de novo.
+    """
+
+    CAMPOS = ('produto_id', 'nome', 'texto', 'atualizado_em')
+    INTERVALO_CONFERENCIA = timedelta(minutes=1)
+
+    def __init__(self):
+        self.indice = None
+        self.lido_ate = None
+        self.conferido_em = None
+        self.trava = threading.Lock()
+
+    def _carregar(self, linhas):
+        for produto_id, nome, texto, atualizado_em in linhas:
+            self.indice.adicionar(produto_id, [(nome.split(), PESO_NOME), (texto.split(), PESO_TEXTO)])
+            if self.lido_ate is None or atualizado_em > self.lido_ate:
+                self.lido_ate = atualizado_em
+
+    def _montar(self):
+        self.indice = IndiceInvertido()
+        self.lido_ate = None
+        self.conferido_em = timezone.now()
+        self._carregar(BuscaProduto.objects.values_list(*self.CAMPOS).iterator(chunk_size=5000))
+
+    def atualizar(self):
+        with self.trava:
+            if self.indice is None:
+                self._montar()
+                return self.indice
+
+            ultima = BuscaProduto.objects.order_by('-atualizado_em').values_list('atualizado_em', flat=True).first()
+            if ultima and (self.lido_ate is None or ultima > self.lido_ate):
+                alteradas = BuscaProduto.objects.all()
+                if self.lido_ate is not None:
+                    alteradas = alteradas.filter(atualizado_em__gte=self.lido_ate - MARGEM_ATUALIZACAO)
+                self._carregar(alteradas.values_list(*self.CAMPOS))
+
+            if timezone.now() - self.conferido_em >= self.INTERVALO_CONFERENCIA:
+                self.conferido_em = timezone.now()
+                if BuscaProduto.objects.count() != len(self.indice.termos_por_id):
+                    self._montar()
+        return self.indice
+
+    def limpar(self):
+        with self.trava:
+            self.indice = None
+            self.lido_ate = None
+
+
+_indice_produtos = _IndiceProdutos()
+
+
+def _consulta_mysql(termos, limite):
+    longos = [termo for termo in termos if len(termo) >= MINIMO_FULLTEXT]
+    curtos = [termo for termo in termos if len(termo) < MINIMO_FULLTEXT]
+    condicoes, parametros_condicoes = [], []
+    relevancia, parametros_relevancia = '0', []
+    if longos:
+        obrigatorios = ' '.join(f'+{termo}*' for termo in longos)
+        qualquer = ' '.join(f'{termo}*' for termo in longos)
+        condicoes.append("MATCH(nome, texto) AGAINST (%s IN BOOLEAN MODE)")
+        parametros_condicoes.append(obrigatorios)
+        relevancia = (
+            "MATCH(nome, texto) AGAINST (%s IN BOOLEAN MODE) "
+            f"+ {PESO_NOME - 1} * MATCH(nome) AGAINST (%s IN BOOLEAN MODE)"
+        )
+        parametros_relevancia = [obrigatorios, qualquer]
+    for termo in curtos:
+        condicoes.append("CONCAT(' ', nome, ' ', texto) LIKE %s")
+        parametros_condicoes.append(f'% {termo}%')
+
+    sql = (
+        f"SELECT produto_id FROM {BuscaProduto._meta.db_table} "
+        f"WHERE {' AND '.join(condicoes)} "
+        f"ORDER BY {relevancia} DESC, produto_id LIMIT %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, parametros_condicoes + parametros_relevancia + [limite])
+        return [linha[0] for linha in cursor.fetchall()]
+
+
+def buscar_produtos(termo, limite=LIMITE_RESULTADOS):
+    """Ids dos produtos que casam com a busca, do mais para o menos relevante."""
+    termos = tokens(termo)
+    if not termos:
+        return []
+    if connection.vendor == 'mysql':
+        return _consulta_mysql(termos, limite)
+    return _indice_produtos.atualizar().buscar(termos, limite)
+
+
+def buscar_categorias(termo, limite=LIMITE_RESULTADOS):
+    """Ids das categorias por nome e descrição. A tabela é pequena: o índice é montado a cada busca."""
+    termos = tokens(termo)
+    if not termos:
+        return []
+    indice = IndiceInvertido()
+    for categoria_id, nome, descricao in Categoria.objects.values_list('id', 'nome', 'descricao'):
+        indice.adicionar(categoria_id, [(tokens(nome), PESO_NOME), (tokens(descricao), PESO_TEXTO)])
+    return indice.buscar(termos, limite)
@@ -0,0 +1,119 @@
+"""
+Cache em disco dos relatórios em PDF.
+
+A chave é (tipo do relatório, parâmetros, versão dos dados). A versão é
+calculada por uma função de cada relatório (ver fila_relatorios.RELATORIOS)
+com uma agregação barata sobre as linhas cobertas: quantidade, maior id e
+maior `ultima_alteracao`. Um lançamento retroativo, uma edição ou uma
+exclusão no período mudam a versão, e o relatório antigo simplesmente deixa
+de ser encontrado.
+
+Cada entrada é um diretório <chave>/ com o PDF dentro, gravado com o nome de
+download. O acesso atualiza o mtime; quando o total passa de
+settings.RELATORIOS_CACHE_MAX_MB, as entradas menos usadas recentemente são
+apagadas (LRU).
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+
+# Ao estourar o limite, libera até esta fração dele para não podar a cada gravação
+FRACAO_APOS_PODA = 0.8
+
+
+def chave(tipo, parametros, versao):
+    conteudo = json.dumps([tipo, parametros, versao], sort_keys=True, default=str)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+
+def etag(chave_relatorio):
+    return f'"{chave_relatorio[:40]}"'
+
+
+def _diretorio(chave_relatorio):
+    return os.path.join(settings.RELATORIOS_CACHE_DIR, chave_relatorio)
+
+
+def obter(chave_relatorio):
+    """Retorna o caminho do PDF em cache (marcando o acesso), ou None."""
+    diretorio = _diretorio(chave_relatorio)
+    try:
+        nomes = os.listdir(diretorio)
+    except FileNotFoundError:
+        return None
+    if not nomes:
+        return None
+
+    caminho = os.path.join(diretorio, nomes[0])
+    try:
+        os.utime(diretorio)
+    except FileNotFoundError:
+        # Removido por uma poda concorrente
+        return None
+    return caminho
+
+
+def guardar(chave_relatorio, nome_arquivo, pdf):
+    """Grava o PDF no cache e poda as entradas antigas se passar do limite."""
+    os.makedirs(settings.RELATORIOS_CACHE_DIR, exist_ok=True)
+    # Monta a entrada num diretório temporário e a publica com um rename atômico
+    temporario = tempfile.mkdtemp(dir=settings.RELATORIOS_CACHE_DIR, prefix='.tmp-')
+    with open(os.path.join(temporario, os.path.basename(nome_arquivo)), 'wb') as destino:
+        destino.write(pdf)
+    try:
+        os.rename(temporario, _diretorio(chave_relatorio))
+    except OSError:
+        # Outro processo gravou a mesma chave primeiro: o conteúdo é o mesmo
+        shutil.rmtree(temporario, ignore_errors=True)
+    podar()
+
+
+def _entradas():
+    entradas = []
+    with os.scandir(settings.RELATORIOS_CACHE_DIR) as itens:
+        for item in itens:
+            if item.name.startswith('.') or not item.is_dir():
+                continue
+            tamanho = 0
+            try:
+                with os.scandir(item.path) as arquivos:
+                    tamanho = sum(arquivo.stat().st_size for arquivo in arquivos)
+                entradas.append((item.stat().st_mtime, tamanho, item.path))
+            except FileNotFoundError:
+                continue
+    return entradas
+
+
+def ocupacao():
+    """(entradas, bytes) ocupados pelo cache."""
+    if not os.path.isdir(settings.RELATORIOS_CACHE_DIR):
+        return 0, 0
+    entradas = _entradas()
+    return len(entradas), sum(tamanho for _, tamanho, _ in entradas)
+
+
+def podar(limite_bytes=None):
+    """Apaga as entradas menos usadas até o cache caber no limite. Retorna quantas apagou."""
+    if limite_bytes is None:
+        limite_bytes = settings.RELATORIOS_CACHE_MAX_MB * 1024 * 1024
+    if not os.path.isdir(settings.RELATORIOS_CACHE_DIR):
+        return 0
+
+    entradas = _entradas()
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    if total <= limite_bytes:
+        return 0
+
+    removidas = 0
+    alvo = limite_bytes * FRACAO_APOS_PODA
+    for _, tamanho, caminho in sorted(entradas):
+        if total <= alvo:
+            break
+        shutil.rmtree(caminho, ignore_errors=True)
+        total -= tamanho
+        removidas += 1
+    return removidas
@@ -0,0 +1,259 @@
+"""
+Teste de carga por HTTP das jornadas principais (`manage.py teste_carga`).
+
+Cada sessão virtual é uma thread com o seu próprio cookie jar: faz login e
+repete os passos de PASSOS (listagens, lançamento de transação, renovação de
+contratos e as exportações em PDF, Excel e CSV) até acabar o tempo ou as
+iterações. Usa só a biblioteca padrão (urllib), contra um runserver ou
+gunicorn já rodando; as URLs vêm de reverse() e os ids usados nos
+formulários (produtos, clientes, tipo de entrada) são lidos do banco
+configurado, que deve ser o mesmo do servidor.
+
+Os redirecionamentos não são seguidos: cada requisição é medida sozinha e
+o status esperado faz parte do passo (um POST de formulário que volta 200
+com erros conta como erro, assim como um redirecionamento para o login).
+O resultado é um dicionário pronto para JSON, com vazão, percentis de
+latência e taxa de erro por requisição e no total.
+"""
+import http.client
+import http.cookiejar
+import random
+import threading
+import time
+import urllib.request
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .instrumentacao import percentil
+
+PERCENTIS = (50, 90, 95, 99)
+
+# nome: identifica a requisição no relatório; dados(contexto, aleatorio) monta o POST;
+# escrita: grava no banco (pulada com --somente-leitura); argumentos: da URL, para reverse()
+Requisicao = namedtuple(
+    'Requisicao', 'nome metodo rota dados esperado escrita argumentos', defaults=(None, (200,), False, ()),
+)
+
+
+def _periodo(contexto, aleatorio):
+    hoje = timezone.localdate()
+    return {'data_inicio': (hoje - timedelta(days=7)).isoformat(), 'data_fim': hoje.isoformat()}
+
+
+def _transacao(contexto, aleatorio):
+    return {
+        'produto': aleatorio.choice(contexto['produto_ids']),
+        'tipo_transacao': contexto['tipo_entrada_id'],
+        'quantidade': aleatorio.randint(1, 5),
+        'lote': f'CARGA-{aleatorio.randrange(10 ** 8):08d}',
+        'observacoes': 'teste de carga',
+    }
+
+
+def _selecao_renovacao(contexto, aleatorio):
+    return {'cliente_ids': [aleatorio.choice(contexto['cliente_ids'])]}
+
+
+def _renovacao(contexto, aleatorio):
+    return {
+        'cliente_ids': str(aleatorio.choice(contexto['cliente_ids'])),
+        'meses_a_adicionar': 12,
+        'porcentagem_reajuste': '0',
+    }
+
+
+LOGIN = (
+    Requisicao('login:form', 'GET', 'login'),
+    Requisicao('login', 'POST', 'login', lambda contexto, aleatorio: contexto['login'], (302,)),
+)
+
+PASSOS = {
+    'listar_produtos': (Requisicao('listar_produtos', 'GET', 'listar_produtos'),),
+    'criar_transacao': (
+        Requisicao('criar_transacao:form', 'GET', 'criar_transacao'),
+        Requisicao('criar_transacao', 'POST', 'criar_transacao', _transacao, (302,), True),
+    ),
+    'listar_clientes': (Requisicao('listar_clientes', 'GET', 'listar_clientes'),),
+    'renovacao_list': (Requisicao('renovacao_list', 'GET', 'renovacao_list'),),
+    'renovar_contratos': (
+        Requisicao('renovar_contratos:form', 'POST', 'renovar_contratos', _selecao_renovacao),
+        Requisicao('renovar_contratos', 'POST', 'renovar_contratos', _renovacao, (302,), True),
+    ),
+    # Relatórios grandes vão para a fila: o redirecionamento para o status também é sucesso
+    'relatorio_transacoes': (
+        Requisicao('relatorio_transacoes', 'POST', 'relatorio_transacoes', _periodo, (200, 302)),
+    ),
+    'relatorio_contratos': (
+        Requisicao('relatorio_contratos', 'POST', 'relatorio_contratos', _periodo, (200, 302)),
+    ),
+    'gerar_pdf_renovacao': (Requisicao('gerar_pdf_renovacao', 'GET', 'gerar_pdf_renovacao'),),
+    'gerar_pdf_pedidos': (Requisicao('gerar_pdf_pedidos', 'GET', 'pedido:gerar_pdf_pedidos'),),
+    'gerar_excel_pedidos': (Requisicao('gerar_excel_pedidos', 'GET', 'pedido:gerar_excel_pedidos'),),
+    'exportar_transacoes': (
+        Requisicao('exportar_transacoes', 'GET', 'exportar_transacoes', argumentos=('csv',)),
+    ),
+}
+
+
+class _SemRedirecionamento(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Sessao:
+    """Um navegador: cookies da sessão e do CSRF, sem seguir redirecionamentos."""
+
+    def __init__(self, url_base, timeout=60):
+        self.url_base = url_base.rstrip('/')
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _SemRedirecionamento,
+        )
+
+    def _csrf(self):
+        return next((cookie.value for cookie in self.cookies if cookie.name == settings.CSRF_COOKIE_NAME), '')
+
+    def requisitar(self, metodo, caminho, dados=None):
+        """Retorna (status, Location). O corpo é lido inteiro, inclusive em respostas em streaming."""
+        cabecalhos = {'Referer': f'{self.url_base}/'}
+        corpo = None
+        if metodo == 'POST':
+            token = self._csrf()
+            corpo = urlencode(dict(dados or {}, csrfmiddlewaretoken=token), doseq=True).encode()
+            cabecalhos.update({'X-CSRFToken': token, 'Content-Type': 'application/x-www-form-urlencoded'})
+        requisicao = urllib.request.Request(self.url_base + caminho, data=corpo, headers=cabecalhos, method=metodo)
+        try:
+            with self.opener.open(requisicao, timeout=self.timeout) as resposta:
+                resposta.read()
+                return resposta.status, None
+        except HTTPError as erro:
+            erro.read()
+            return erro.code, erro.headers.get('Location')
+
+
+class Resultados:
+    """Latência e desfecho de cada requisição, por nome. Compartilhado pelas threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._por_nome = {}
+
+    def registrar(self, nome, milissegundos, erro=None):
+        with self._lock:
+            self._por_nome.setdefault(nome, []).append((milissegundos, erro))
+
+    @staticmethod
+    def _resumo(amostras, duracao):
+        tempos = sorted(milissegundos for milissegundos, _ in amostras)
+        erros = Counter(erro for _, erro in amostras if erro)
+        total_erros = sum(erros.values())
+        return {
+            'requisicoes': len(amostras),
+            'erros': total_erros,
+            'taxa_erro': round(total_erros / len(amostras), 4) if amostras else 0.0,
+            'vazao_rps': round(len(amostras) / duracao, 2) if duracao else 0.0,
+            'latencia_ms': {
+                **{f'p{p}': round(percentil(tempos, p), 2) for p in PERCENTIS},
+                'media': round(sum(tempos) / len(tempos), 2),
+                'max': round(tempos[-1], 2),
+            } if tempos else {},
+            'erros_por_tipo': dict(erros.most_common()),
+        }
+
+    def relatorio(self, duracao):
+        with self._lock:
+            por_nome = {nome: list(amostras) for nome, amostras in self._por_nome.items()}
+        todas = [amostra for amostras in por_nome.values() for amostra in amostras]
+        return {
+            'duracao_s': round(duracao, 2),
+            'total': self._resumo(todas, duracao),
+            'requisicoes': {nome: self._resumo(amostras, duracao) for nome, amostras in sorted(por_nome.items())},
+        }
+
+
+def _executar(sessao, requisicao, contexto, aleatorio, resultados):
+    """Faz a requisição e registra o tempo; retorna False em erro."""
+    dados = requisicao.dados(contexto, aleatorio) if requisicao.dados else None
+    inicio = time.perf_counter()
+    try:
+        status, destino = sessao.requisitar(
+            requisicao.metodo, reverse(requisicao.rota, args=requisicao.argumentos), dados,
+        )
+    except (OSError, http.client.HTTPException) as excecao:
+        erro = f'{type(excecao).__name__}: {getattr(excecao, "reason", excecao)}'
+    else:
+        erro = None
+        if status not in requisicao.esperado:
+            erro = f'HTTP {status}'
+        elif destino and destino.split('?')[0].endswith(reverse('login')):
+            erro = 'redirecionado para o login'
+    resultados.registrar(requisicao.nome, (time.perf_counter() - inicio) * 1000, erro)
+    return erro is None
+
+
+def executar(url_base, contexto, sessoes=10, duracao=60.0, iteracoes=None, passos=None, escrita=True,
+             pausa=0.0, rampa=0.0, timeout=60, semente=42):
+    """
+    Roda `sessoes` sessões virtuais em paralelo por `duracao` segundos ou
+    `iteracoes` voltas pelos `passos` (o que acabar primeiro; None desliga
+    o limite). `contexto` tem login ({'username', 'password'}),
+    produto_ids, cliente_ids e tipo_entrada_id. Retorna o relatório.
+    """
+    passos = list(passos or PASSOS)
+    resultados = Resultados()
+    inicio = time.monotonic()
+    fim = inicio + duracao if duracao else None
+
+    def acabou(voltas):
+        return (iteracoes is not None and voltas >= iteracoes) or (fim is not None and time.monotonic() >= fim)
+
+    def sessao_virtual(indice):
+        if rampa:
+            time.sleep(rampa * indice / sessoes)
+        sessao = Sessao(url_base, timeout)
+        aleatorio = random.Random(f'{semente}-{indice}')
+        if not all(_executar(sessao, requisicao, contexto, aleatorio, resultados) for requisicao in LOGIN):
+            return
+        voltas = 0
+        while not acabou(voltas):
+            for passo in passos:
+                for requisicao in PASSOS[passo]:
+                    if requisicao.escrita and not escrita:
+                        continue
+                    if fim is not None and time.monotonic() >= fim:
+                        return
+                    _executar(sessao, requisicao, contexto, aleatorio, resultados)
+                    if pausa:
+                        time.sleep(pausa)
+            voltas += 1
+
+    with ThreadPoolExecutor(max_workers=sessoes) as executor:
+        list(executor.map(sessao_virtual, range(sessoes)))
+
+    relatorio = resultados.relatorio(time.monotonic() - inicio)
+    relatorio.update({'url': url_base, 'sessoes': sessoes, 'passos': passos, 'escrita': escrita})
+    return relatorio
+
+
+def comparar(anterior, atual):
+    """Linhas (nome, rps antes, rps agora, p95 antes, p95 agora, erro antes, erro agora) entre dois relatórios."""
+    linhas = []
+    nomes = ['total'] + sorted(set(anterior['requisicoes']) | set(atual['requisicoes']))
+    for nome in nomes:
+        antes = anterior['total'] if nome == 'total' else anterior['requisicoes'].get(nome, {})
+        agora = atual['total'] if nome == 'total' else atual['requisicoes'].get(nome, {})
+        linhas.append((
+            nome,
+            antes.get('vazao_rps'), agora.get('vazao_rps'),
+            antes.get('latencia_ms', {}).get('p95'), agora.get('latencia_ms', {}).get('p95'),
+            antes.get('taxa_erro'), agora.get('taxa_erro'),
+        ))
+    return linhas
@@ -0,0 +1,180 @@
+"""
+Registro das consultas SQL lentas, para saber qual comando pesou quando uma
+página (renovacao_list, listar_clientes...) fica lenta em produção.
+
+ConsultasLentasMiddleware instala um execute_wrapper em cada conexão durante
+a requisição. Os comandos que passam de settings.CONSULTAS_LENTAS_MS vão para
+um buffer circular na memória (as últimas CONSULTAS_LENTAS_MAX), com a view,
+os quadros da pilha que vêm do código do projeto e os parâmetros. O custo
+fica nas consultas lentas: as rápidas só pagam a medição do tempo.
+
+A página "Consultas lentas" (staff) agrupa o buffer pelo SQL normalizado
+(literais e listas de IN trocados por ?) e roda EXPLAIN sob demanda na
+amostra mais recente de um grupo. Com CONSULTAS_LENTAS_MS = 0 o middleware
+sai da pilha. Como em inventario.instrumentacao, o buffer é de cada processo.
+"""
+import functools
+import hashlib
+import itertools
+import os
+import re
+import sys
+import threading
+from collections import deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+# Quadros do código do projeto guardados como origem de cada consulta
+QUADROS_ORIGEM = 6
+# Tamanho máximo do repr dos parâmetros mostrado na página
+TAMANHO_PARAMETROS = 300
+
+_LISTA_PARAMETROS = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_NUMERO = re.compile(r'\b\d+(?:\.\d+)?\b')
+_ESPACOS = re.compile(r'\s+')
+
+_ARQUIVO = os.path.normcase(os.path.abspath(__file__))
+# Durante o EXPLAIN da própria página, para não registrá-lo
+_ignorar = ContextVar('consultas_lentas_ignorar', default=False)
+
+
+def normalizar(sql):
+    """SQL sem valores: listas de IN viram (...), literais e parâmetros viram ?."""
+    sql = _LISTA_PARAMETROS.sub('(...)', sql)
+    sql = _TEXTO.sub('?', sql)
+    sql = _NUMERO.sub('?', sql)
+    return _ESPACOS.sub(' ', sql.replace('%s', '?')).strip()
+
+
+def _origem():
+    """Quadros da pilha em arquivos do projeto, do mais externo ao mais interno."""
+    base = os.path.normcase(str(settings.BASE_DIR)) + os.sep
+    quadros = []
+    quadro = sys._getframe(1)
+    while quadro is not None and len(quadros) < QUADROS_ORIGEM:
+        arquivo = os.path.normcase(quadro.f_code.co_filename)
+        if arquivo.startswith(base) and arquivo != _ARQUIVO and 'site-packages' not in arquivo:
+            quadros.append(f'{os.path.relpath(arquivo, base)}:{quadro.f_lineno} em {quadro.f_code.co_name}')
+        quadro = quadro.f_back
+    return quadros[::-1]
+
+
+class RegistroConsultasLentas:
+    """Buffer circular das consultas lentas, protegido por lock."""
+
+    def __init__(self, tamanho=200):
+        self._lock = threading.Lock()
+        self._itens = deque(maxlen=tamanho)
+        self._ids = itertools.count(1)
+
+    def redimensionar(self, tamanho):
+        with self._lock:
+            if self._itens.maxlen != tamanho:
+                self._itens = deque(self._itens, maxlen=tamanho)
+
+    def registrar(self, sql, params, many, milissegundos, view, alias):
+        normalizado = normalizar(sql)
+        item = {
+            'id': next(self._ids),
+            'chave': hashlib.sha1(normalizado.encode('utf-8')).hexdigest()[:12],
+            'normalizado': normalizado,
+            'sql': sql,
+            # executemany não tem uma lista de parâmetros que sirva para o EXPLAIN
+            'params': None if many else params,
+            'params_texto': repr(params)[:TAMANHO_PARAMETROS],
+            'milissegundos': milissegundos,
+            'view': view,
+            'alias': alias,
+            'origem': _origem(),
+            'quando': timezone.now(),
+        }
+        with self._lock:
+            self._itens.append(item)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def itens(self):
+        with self._lock:
+            return list(self._itens)
+
+    def agrupar(self):
+        """Grupos pelo SQL normalizado, do maior tempo somado para o menor."""
+        grupos = {}
+        for item in self.itens():
+            grupo = grupos.get(item['chave'])
+            if grupo is None:
+                grupo = grupos[item['chave']] = {
+                    'chave': item['chave'], 'normalizado': item['normalizado'], 'execucoes': 0,
+                    'total_ms': 0.0, 'maximo_ms': 0.0, 'views': set(), 'amostra': item,
+                }
+            grupo['execucoes'] += 1
+            grupo['total_ms'] += item['milissegundos']
+            grupo['maximo_ms'] = max(grupo['maximo_ms'], item['milissegundos'])
+            grupo['views'].add(item['view'])
+            grupo['amostra'] = item  # a mais recente
+        for grupo in grupos.values():
+            grupo['media_ms'] = grupo['total_ms'] / grupo['execucoes']
+            grupo['views'] = sorted(grupo['views'])
+        return sorted(grupos.values(), key=lambda grupo: grupo['total_ms'], reverse=True)
+
+
+registro = RegistroConsultasLentas()
+
+
+def explicar(item):
+    """
+    Plano da consulta registrada em `item`: (colunas, linhas). Só roda para
+    SELECT (EXPLAIN simples não executa o comando). DatabaseError sobe.
+    """
+    if item['params'] is None and '%s' in item['sql']:
+        raise ValueError("Os parâmetros desta consulta não foram guardados (executemany).")
+    if not item['sql'].lstrip().upper().startswith('SELECT'):
+        raise ValueError("Só consultas SELECT podem ser explicadas.")
+
+    conexao = connections[item['alias']]
+    prefixo = 'EXPLAIN QUERY PLAN ' if conexao.vendor == 'sqlite' else 'EXPLAIN '
+    token = _ignorar.set(True)
+    try:
+        with conexao.cursor() as cursor:
+            cursor.execute(prefixo + item['sql'], item['params'])
+            colunas = [coluna[0] for coluna in cursor.description]
+            return colunas, cursor.fetchall()
+    finally:
+        _ignorar.reset(token)
+
+
+def _monitorar(request, alias, limite_ms, execute, sql, params, many, context):
+    inicio = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        milissegundos = (perf_counter() - inicio) * 1000
+        if milissegundos >= limite_ms and not _ignorar.get():
+            match = getattr(request, 'resolver_match', None)
+            view = match.view_name if match is not None else request.path
+            registro.registrar(sql, params, many, milissegundos, view, alias)
+
+
+class ConsultasLentasMiddleware:
+    def __init__(self, get_response):
+        if not settings.CONSULTAS_LENTAS_MS:
+            raise MiddlewareNotUsed
+        registro.redimensionar(settings.CONSULTAS_LENTAS_MAX)
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with ExitStack() as pilha:
+            for conexao in connections.all():
+                pilha.enter_context(conexao.execute_wrapper(functools.partial(
+                    _monitorar, request, conexao.alias, settings.CONSULTAS_LENTAS_MS,
+                )))
+            return self.get_response(request)
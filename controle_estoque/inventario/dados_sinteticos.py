@@ -0,0 +1,284 @@
+"""
+Dados sintéticos em volume para benchmarks e testes de carga
+(`manage.py seed_bench`).
+
+Tudo é gravado com bulk_create em blocos, com as chaves primárias definidas
+aqui a partir do maior id de cada tabela: o bulk_create do MySQL não devolve
+os ids, e as transações, itens e consumos precisam se referenciar sem
+consultas no meio. Cada seção (produtos, movimentos, contratos, pedidos) tem
+o seu próprio gerador aleatório derivado da semente, então mudar o volume de
+uma seção não altera as outras, e a mesma semente e a mesma data final geram
+os mesmos dados num banco vazio.
+
+Os movimentos seguem o modelo de estoque: cada entrada cria um Item (lote)
+com a quantidade recebida; parte delas tem uma saída posterior que consome
+parte do lote (ConsumoLote). O SaldoEstoque é gravado no fim com a soma do
+que sobrou em cada produto, e o índice de busca é sincronizado.
+"""
+import random
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from contratos.models import Cliente, HistoricoRenovacao, Sistema, Tecnico
+from pedido.models import CategoriaPedido, ClientePedido
+
+from .busca import sincronizar_indice
+from .models import Categoria, ConsumoLote, Item, Produto, SaldoEstoque, TipoTransacao, Transacao
+
+TAMANHO_BLOCO = 5000
+# Fração das entradas que têm uma saída consumindo parte do lote
+FRACAO_SAIDAS = 0.3
+# Fração dos produtos com alerta_estoque_minimo configurado
+FRACAO_ALERTA = 0.2
+RENOVACOES_MAXIMAS = 3
+SISTEMAS = 8
+TECNICOS = 12
+CATEGORIAS_PEDIDO = 6
+
+NOMES = (
+    'Parafuso', 'Porca', 'Arruela', 'Cabo', 'Conector', 'Disjuntor', 'Tomada', 'Interruptor',
+    'Lâmpada', 'Fita Isolante', 'Bucha', 'Abraçadeira', 'Eletroduto', 'Caixa de Passagem', 'Luva',
+)
+MATERIAIS = ('Aço', 'Inox', 'Latão', 'Alumínio', 'Nylon', 'PVC', 'Cobre', 'Galvanizado')
+MEDIDAS = ('3mm', '5mm', '8mm', '10mm', '1/2"', '3/4"', '2,5mm²', '4mm²', '16A', '20A', '32A')
+CIDADES = (
+    ('São Paulo', 'SP'), ('Campinas', 'SP'), ('Rio de Janeiro', 'RJ'), ('Belo Horizonte', 'MG'),
+    ('Curitiba', 'PR'), ('Porto Alegre', 'RS'), ('Salvador', 'BA'), ('Recife', 'PE'), ('Goiânia', 'GO'),
+)
+
+
+def _proximo_id(modelo):
+    return (modelo.objects.aggregate(maior=Max('pk'))['maior'] or 0) + 1
+
+
+@contextmanager
+def _datas_manuais(*campos):
+    """Desliga auto_now/auto_now_add dos campos para gravar datas espalhadas no passado."""
+    anteriores = [(campo, campo.auto_now, campo.auto_now_add) for campo in campos]
+    for campo in campos:
+        campo.auto_now = campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, auto_now, auto_now_add in anteriores:
+            campo.auto_now, campo.auto_now_add = auto_now, auto_now_add
+
+
+def _cnpj(aleatorio):
+    digitos = f'{aleatorio.randrange(10 ** 14):014d}'
+    return f'{digitos[:2]}.{digitos[2:5]}.{digitos[5:8]}/{digitos[8:12]}-{digitos[12:]}'
+
+
+class GeradorDados:
+    """
+    Gera os volumes pedidos com a `semente`, com datas nos `dias` anteriores
+    ao fim de `ate` (padrão: hoje). `ao_gravar(descricao, quantidade)` é
+    chamado a cada bloco gravado, para mostrar o andamento.
+    """
+
+    def __init__(self, semente=42, ate=None, dias=365, tamanho_bloco=TAMANHO_BLOCO, ao_gravar=None):
+        self.semente = semente
+        self.ate = ate or timezone.localdate()
+        self.fim = timezone.make_aware(datetime.combine(self.ate, time.max))
+        self.inicio = timezone.make_aware(datetime.combine(self.ate - timedelta(days=dias - 1), time.min))
+        self.segundos = int((self.fim - self.inicio).total_seconds())
+        self.tamanho_bloco = tamanho_bloco
+        self.ao_gravar = ao_gravar or (lambda descricao, quantidade: None)
+
+    def _aleatorio(self, secao):
+        return random.Random(f'{self.semente}-{secao}')
+
+    def _momento(self, aleatorio):
+        return self.inicio + timedelta(seconds=aleatorio.randrange(self.segundos))
+
+    def _blocos(self, total):
+        for inicio in range(0, total, self.tamanho_bloco):
+            yield inicio, min(inicio + self.tamanho_bloco, total)
+
+    def _gravar(self, modelo, objetos, **kwargs):
+        modelo.objects.bulk_create(objetos, batch_size=self.tamanho_bloco, **kwargs)
+        self.ao_gravar(modelo._meta.verbose_name_plural, len(objetos))
+
+    def _por_nome(self, modelo, nomes):
+        """Cria (se faltar) os registros de nome único e devolve os ids na ordem de `nomes`."""
+        modelo.objects.bulk_create([modelo(nome=nome) for nome in nomes], ignore_conflicts=True)
+        ids = dict(modelo.objects.filter(nome__in=nomes).values_list('nome', 'id'))
+        return [ids[nome] for nome in nomes]
+
+    def usuarios(self, quantidade):
+        ids = []
+        for indice in range(quantidade):
+            usuario, criado = User.objects.get_or_create(
+                username=f'bench{self.semente}-{indice}',
+                defaults={'email': f'bench{self.semente}-{indice}@example.com'},
+            )
+            if criado:
+                usuario.set_unusable_password()
+                usuario.save(update_fields=['password'])
+            ids.append(usuario.pk)
+        return ids
+
+    def produtos(self, quantidade, categorias, usuario_ids):
+        """Grava as categorias e os produtos; devolve [(id, alerta_estoque_minimo)]."""
+        aleatorio = self._aleatorio('produtos')
+        primeira_categoria = _proximo_id(Categoria)
+        self._gravar(Categoria, [
+            Categoria(id=primeira_categoria + indice, nome=f'Categoria {self.semente}-{indice}')
+            for indice in range(categorias)
+        ])
+        categoria_ids = list(range(primeira_categoria, primeira_categoria + categorias))
+
+        produtos = []
+        proximo = _proximo_id(Produto)
+        for inicio, fim in self._blocos(quantidade):
+            bloco = []
+            for indice in range(inicio, fim):
+                alerta = aleatorio.randint(5, 50) if aleatorio.random() < FRACAO_ALERTA else None
+                bloco.append(Produto(
+                    id=proximo + indice,
+                    nome=f'{aleatorio.choice(NOMES)} {aleatorio.choice(MATERIAIS)} {aleatorio.choice(MEDIDAS)} '
+                         f'#{self.semente}-{indice}',
+                    descricao=f'Código {indice}. {aleatorio.choice(MATERIAIS)} para uso geral',
+                    categoria_id=aleatorio.choice(categoria_ids) if categoria_ids else None,
+                    usuario_responsavel_id=aleatorio.choice(usuario_ids),
+                    data_criacao=self._momento(aleatorio),
+                    alerta_estoque_minimo=alerta,
+                ))
+                produtos.append((proximo + indice, alerta))
+            self._gravar(Produto, bloco)
+        return produtos
+
+    def movimentos(self, quantidade_itens, produtos, usuario_ids):
+        """Entradas com o seu Item e parte delas com saída; devolve o saldo restante por produto."""
+        aleatorio = self._aleatorio('movimentos')
+        entrada, _ = TipoTransacao.objects.get_or_create(nome='Compra', entrada=True)
+        saida, _ = TipoTransacao.objects.get_or_create(nome='Venda', entrada=False)
+        produto_ids = [produto_id for produto_id, _ in produtos]
+        saldos = Counter()
+
+        transacao_id = _proximo_id(Transacao)
+        item_id = _proximo_id(Item)
+        for inicio, fim in self._blocos(quantidade_itens if produto_ids else 0):
+            transacoes, itens, consumos = [], [], []
+            for indice in range(inicio, fim):
+                produto_id = aleatorio.choice(produto_ids)
+                recebida = aleatorio.randint(1, 50)
+                data = self._momento(aleatorio)
+                transacoes.append(Transacao(
+                    id=transacao_id, tipo_transacao_id=entrada.pk, usuario_id=aleatorio.choice(usuario_ids),
+                    produto_id=produto_id, quantidade=recebida, data=data,
+                ))
+                restante = recebida
+                if aleatorio.random() < FRACAO_SAIDAS:
+                    consumida = aleatorio.randint(1, recebida)
+                    transacoes.append(Transacao(
+                        id=transacao_id + 1, tipo_transacao_id=saida.pk, usuario_id=aleatorio.choice(usuario_ids),
+                        produto_id=produto_id, quantidade=consumida,
+                        data=min(data + timedelta(hours=aleatorio.randint(1, 720)), self.fim),
+                    ))
+                    consumos.append(ConsumoLote(item_id=item_id, transacao_id=transacao_id + 1, quantidade=consumida))
+                    restante -= consumida
+                itens.append(Item(
+                    id=item_id, produto_id=produto_id, lote=f'B{self.semente}-{indice:08d}',
+                    transacao_id=transacao_id, quantidade=restante, quantidade_inicial=recebida,
+                    disponivel=restante > 0, data_criacao=data,
+                ))
+                saldos[produto_id] += restante
+                transacao_id = transacoes[-1].id + 1
+                item_id += 1
+
+            with transaction.atomic():
+                self._gravar(Transacao, transacoes)
+                self._gravar(Item, itens)
+                self._gravar(ConsumoLote, consumos)
+        return saldos
+
+    def saldos(self, produtos, saldos):
+        """Um SaldoEstoque por produto gerado, com o alerta avaliado como em SaldoEstoque.avaliar_alerta."""
+        agora = timezone.now()
+        for inicio, fim in self._blocos(len(produtos)):
+            self._gravar(SaldoEstoque, [
+                SaldoEstoque(
+                    produto_id=produto_id, quantidade=saldos[produto_id], ultima_atualizacao=agora,
+                    em_alerta=alerta is not None and 0 < saldos[produto_id] <= alerta,
+                )
+                for produto_id, alerta in produtos[inicio:fim]
+            ])
+
+    def contratos(self, quantidade, usuario_ids):
+        aleatorio = self._aleatorio('contratos')
+        sistema_ids = self._por_nome(Sistema, [f'Sistema {self.semente}-{indice}' for indice in range(SISTEMAS)])
+        tecnico_ids = self._por_nome(Tecnico, [f'Técnico {self.semente}-{indice}' for indice in range(TECNICOS)])
+
+        proximo = _proximo_id(Cliente)
+        campos = (Cliente._meta.get_field('data_criacao'), HistoricoRenovacao._meta.get_field('data_renovacao'))
+        with _datas_manuais(*campos):
+            for inicio, fim in self._blocos(quantidade):
+                clientes, historicos = [], []
+                for indice in range(inicio, fim):
+                    valor_mensal = Decimal(aleatorio.randint(50, 2000))
+                    anual = aleatorio.random() < 0.3
+                    validade = self.ate + timedelta(days=aleatorio.randint(-180, 365))
+                    clientes.append(Cliente(
+                        id=proximo + indice, empresa=f'Empresa {self.semente}-{indice}', cnpj=_cnpj(aleatorio),
+                        sistema_id=aleatorio.choice(sistema_ids), tecnico_id=aleatorio.choice(tecnico_ids),
+                        validade=validade, data_criacao=self._momento(aleatorio),
+                        tipo_cobranca=Cliente.ANUAL if anual else Cliente.MENSAL,
+                        valor_mensal=valor_mensal, meses_contrato=12,
+                        valor_anual=valor_mensal * 12 if anual else None,
+                        bloqueado=aleatorio.random() < 0.03, ativo=aleatorio.random() < 0.9,
+                    ))
+                    for renovacao in range(aleatorio.randint(0, RENOVACOES_MAXIMAS)):
+                        nova_validade = validade - timedelta(days=365 * renovacao)
+                        reajuste = Decimal(aleatorio.randint(0, 1000)) / 100
+                        historicos.append(HistoricoRenovacao(
+                            cliente_id=proximo + indice,
+                            data_renovacao=min(
+                                timezone.make_aware(datetime.combine(nova_validade - timedelta(days=365), time(9))),
+                                self.fim,
+                            ),
+                            validade_anterior=nova_validade - timedelta(days=365), nova_validade=nova_validade,
+                            valor_anterior=valor_mensal, porcentagem_reajuste=reajuste,
+                            novo_valor=(valor_mensal * (1 + reajuste / 100)).quantize(Decimal('0.01')),
+                            usuario_responsavel_id=aleatorio.choice(usuario_ids),
+                        ))
+                with transaction.atomic():
+                    self._gravar(Cliente, clientes)
+                    self._gravar(HistoricoRenovacao, historicos)
+
+    def pedidos(self, quantidade, usuario_ids):
+        aleatorio = self._aleatorio('pedidos')
+        categoria_ids = self._por_nome(
+            CategoriaPedido, [f'Pedidos {self.semente}-{indice}' for indice in range(CATEGORIAS_PEDIDO)]
+        )
+        tecnico_ids = self._por_nome(Tecnico, [f'Técnico {self.semente}-{indice}' for indice in range(TECNICOS)])
+
+        proximo = _proximo_id(ClientePedido)
+        with _datas_manuais(ClientePedido._meta.get_field('data_criacao')):
+            for inicio, fim in self._blocos(quantidade):
+                bloco = []
+                for indice in range(inicio, fim):
+                    cidade, estado = aleatorio.choice(CIDADES)
+                    bloco.append(ClientePedido(
+                        id=proximo + indice, nome=f'Cliente {self.semente}-{indice}', cnpj=_cnpj(aleatorio),
+                        cidade=cidade, estado=estado, categoria_id=aleatorio.choice(categoria_ids),
+                        tecnico_id=aleatorio.choice(tecnico_ids), usuario_criador_id=aleatorio.choice(usuario_ids),
+                        valor_pedido=Decimal(aleatorio.randint(1000, 500000)) / 100,
+                        data_criacao=self._momento(aleatorio),
+                    ))
+                self._gravar(ClientePedido, bloco)
+
+    def gerar(self, usuarios=10, categorias=50, produtos=1000, itens=10000, clientes=500, pedidos=1000):
+        usuario_ids = self.usuarios(max(usuarios, 1))
+        gerados = self.produtos(produtos, categorias, usuario_ids)
+        self.saldos(gerados, self.movimentos(itens, gerados, usuario_ids))
+        sincronizar_indice()
+        self.contratos(clientes, usuario_ids)
+        self.pedidos(pedidos, usuario_ids)
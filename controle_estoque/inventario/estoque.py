@@ -0,0 +1,178 @@
+import random
+import time
+
+from django.db import OperationalError, connection
+from django.db.models import F, Sum
+from django.forms import ValidationError
+from django.utils import timezone
+
+from .models import ConsumoLote, Item, SaldoEstoque
+
+
+def obter_saldo(produto):
+    """Retorna o SaldoEstoque do produto, criando-o (zerado) se ainda não existir."""
+    saldo, _ = SaldoEstoque.objects.get_or_create(produto=produto)
+    saldo.produto = produto
+    produto.saldo = saldo
+    return saldo
+
+
+def bloquear_saldo(produto):
+    """
+    Lê o saldo do produto com SELECT ... FOR UPDATE.
+    Serializa as saídas do mesmo produto até o fim da transação corrente,
+    sem bloquear movimentações de outros produtos.
+    """
+    saldo = SaldoEstoque.objects.select_for_update().filter(produto=produto).first()
+    if saldo is None:
+        obter_saldo(produto)
+        saldo = SaldoEstoque.objects.select_for_update().get(produto=produto)
+    saldo.produto = produto
+    produto.saldo = saldo
+    return saldo
+
+
+# Deadlock (1213) e lock wait timeout (1205) do MySQL
+ERROS_DE_CONCORRENCIA = (1205, 1213)
+
+
+def _conflito_de_concorrencia(erro):
+    codigo = erro.args[0] if erro.args else None
+    return codigo in ERROS_DE_CONCORRENCIA or 'database is locked' in str(erro)
+
+
+def executar_com_retentativa(funcao, tentativas=5):
+    """
+    Executa `funcao` (que deve abrir o próprio transaction.atomic) e a repete
+    quando o banco aborta a transação por deadlock ou espera de lock.
+    Dentro de um atomic externo não há como repetir: o erro é propagado.
+    """
+    for tentativa in range(1, tentativas + 1):
+        try:
+            return funcao()
+        except OperationalError as erro:
+            if connection.in_atomic_block or tentativa == tentativas or not _conflito_de_concorrencia(erro):
+                raise
+            time.sleep(random.uniform(0.01, 0.05) * tentativa)
+
+
+def ajustar_saldo(produto, delta, saldo=None):
+    """
+    Soma `delta` ao saldo materializado do produto.
+    Deve ser chamada dentro da mesma transação que grava os itens.
+    Se `saldo` já foi obtido com bloquear_saldo, o valor em memória é exato
+    e a releitura é dispensada.
+    """
+    bloqueado = saldo is not None
+    if not bloqueado:
+        saldo = obter_saldo(produto)
+    agora = timezone.now()
+    SaldoEstoque.objects.filter(pk=saldo.pk).update(
+        quantidade=F('quantidade') + delta,
+        ultima_atualizacao=agora
+    )
+    # Mantém a instância em memória coerente com o banco
+    if bloqueado:
+        saldo.quantidade += delta
+        saldo.ultima_atualizacao = agora
+    else:
+        saldo.refresh_from_db(fields=['quantidade', 'ultima_atualizacao'])
+    sincronizar_alerta(saldo)
+    return saldo
+
+
+def sincronizar_alerta(saldo):
+    """Atualiza o índice de alertas (SaldoEstoque.em_alerta) apenas quando o estado muda."""
+    em_alerta = saldo.avaliar_alerta()
+    if em_alerta != saldo.em_alerta:
+        saldo.em_alerta = em_alerta
+        SaldoEstoque.objects.filter(pk=saldo.pk).update(em_alerta=em_alerta)
+    return em_alerta
+
+
+def registrar_entrada(produto, transacao, lote, quantidade):
+    """Cria o lote (um único Item com a quantidade recebida) e soma ao saldo."""
+    item = Item.objects.create(
+        produto=produto,
+        transacao=transacao,
+        lote=lote,
+        quantidade=quantidade,
+        quantidade_inicial=quantidade,
+        disponivel=True
+    )
+    ajustar_saldo(produto, quantidade)
+    return item
+
+
+def registrar_saida(produto, transacao, quantidade):
+    """
+    Baixa `quantidade` unidades do produto consumindo os lotes mais antigos
+    primeiro (FIFO, ordem data_criacao, id).
+
+    O saldo do produto é bloqueado (bloquear_saldo) antes da escolha dos
+    lotes, então saídas simultâneas do mesmo produto não disputam os mesmos
+    lotes. Lê apenas os lotes necessários para cobrir a quantidade; os lotes
+    esgotados são zerados com um único UPDATE, o lote consumido parcialmente
+    com outro, e cada consumo fica registrado em ConsumoLote.
+    Deve ser chamada dentro de transaction.atomic.
+    """
+    if quantidade <= 0:
+        raise ValidationError("Informe uma quantidade maior que zero")
+
+    # Revalida sob lock: a checagem de TransacaoForm.clean pode estar desatualizada
+    saldo = bloquear_saldo(produto)
+    if saldo.quantidade < quantidade:
+        raise ValidationError(
+            f"Estoque insuficiente. Disponível: {saldo.quantidade}, Requerido: {quantidade}"
+        )
+
+    # Leitura com lock para enxergar a versão mais recente dos lotes
+    lotes = Item.objects.select_for_update()\
+        .filter(produto=produto, disponivel=True)\
+        .order_by('data_criacao', 'id')\
+        .values_list('id', 'quantidade')
+
+    restante = quantidade
+    esgotados = []
+    consumos = []
+    parcial = None
+    for item_id, disponivel in lotes.iterator(chunk_size=100):
+        if disponivel <= restante:
+            esgotados.append(item_id)
+            consumos.append(ConsumoLote(item_id=item_id, transacao=transacao, quantidade=disponivel))
+            restante -= disponivel
+        else:
+            parcial = item_id
+            consumos.append(ConsumoLote(item_id=item_id, transacao=transacao, quantidade=restante))
+            restante = 0
+        if restante == 0:
+            break
+
+    if restante > 0:
+        raise ValidationError("Estoque insuficiente para completar a transação")
+
+    if esgotados:
+        baixados = Item.objects.filter(id__in=esgotados, disponivel=True)\
+            .update(quantidade=0, disponivel=False)
+        if baixados != len(esgotados):
+            # Outra saída consumiu o lote entre a leitura e o UPDATE
+            raise ValidationError("Estoque insuficiente para completar a transação")
+    if parcial is not None:
+        consumo_parcial = consumos[-1].quantidade
+        baixados = Item.objects.filter(id=parcial, quantidade__gt=consumo_parcial)\
+            .update(quantidade=F('quantidade') - consumo_parcial)
+        if baixados != 1:
+            raise ValidationError("Estoque insuficiente para completar a transação")
+
+    ConsumoLote.objects.bulk_create(consumos, batch_size=1000)
+    ajustar_saldo(produto, -quantidade, saldo=saldo)
+    return consumos
+
+
+def contar_itens_disponiveis():
+    """Retorna {produto_id: quantidade} somando os lotes disponíveis em uma única consulta."""
+    contagem = Item.objects.filter(disponivel=True)\
+        .values('produto')\
+        .annotate(total=Sum('quantidade'))\
+        .order_by()
+    return {linha['produto']: linha['total'] for linha in contagem}
@@ -0,0 +1,230 @@
+"""
+Fila de relatórios em PDF gerados fora da requisição.
+
+As views chamam `gerar_ou_enfileirar`: relatórios pequenos continuam sendo
+gerados na hora; acima de settings.RELATORIO_LIMITE_SINCRONO linhas é criada
+uma TarefaRelatorio e o usuário acompanha pela página de status. O comando
+`manage.py run_report_worker` processa a fila, grava o PDF em
+settings.RELATORIOS_DIR e apaga os arquivos vencidos.
+
+Cada tipo de relatório aponta para três funções que recebem
+(parametros, usuario): `contar`, que retorna o número de linhas, `montar`,
+que retorna (template, contexto, nome do arquivo), e `versao`, que resume
+os dados cobertos para o cache em disco (cache_relatorios). Os parâmetros
+são os dados do formulário em um dict simples, para poderem ser gravados
+na tarefa. A versão cobre também as tabelas cujos campos aparecem no PDF
+(nome do produto, do sistema, do técnico, da categoria): sem isso, renomear
+um cadastro deixaria o relatório antigo no cache.
+"""
+import logging
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib import messages
+from django.db import connection, transaction
+from django.db.models import F
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.shortcuts import redirect
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import cache_relatorios
+from .models import TarefaRelatorio
+from .utils import gerar_pdf
+
+logger = logging.getLogger(__name__)
+
+RELATORIOS = {
+    'transacoes': {
+        'titulo': "Relatório de Transações",
+        'contar': 'inventario.relatorios.contar_transacoes',
+        'montar': 'inventario.relatorios.montar_pdf_transacoes',
+        'versao': 'inventario.relatorios.versao_transacoes',
+    },
+    'contratos': {
+        'titulo': "Relatório de Contratos",
+        'contar': 'contratos.relatorios.contar_contratos',
+        'montar': 'contratos.relatorios.montar_pdf_contratos',
+        'versao': 'contratos.relatorios.versao_contratos',
+    },
+    'renovacao': {
+        'titulo': "Relatório de Renovação",
+        'contar': 'contratos.relatorios.contar_renovacao',
+        'montar': 'contratos.relatorios.montar_pdf_renovacao',
+        'versao': 'contratos.relatorios.versao_renovacao',
+    },
+    'pedidos': {
+        'titulo': "Relatório de Pedidos",
+        'contar': 'pedido.relatorios.contar_pedidos',
+        'montar': 'pedido.relatorios.montar_pdf_pedidos',
+        'versao': 'pedido.relatorios.versao_pedidos',
+    },
+}
+
+# Tarefas "Gerando" há mais tempo que isso são consideradas abandonadas (worker caiu)
+TEMPO_LIMITE_PROCESSAMENTO = timedelta(minutes=30)
+MAXIMO_TENTATIVAS = 3
+
+
+def titulo_relatorio(tipo):
+    return RELATORIOS.get(tipo, {}).get('titulo', tipo)
+
+
+def _resposta_pdf(conteudo, nome_arquivo, disposicao, chave_relatorio):
+    if isinstance(conteudo, str):
+        response = FileResponse(open(conteudo, 'rb'), content_type='application/pdf')
+    else:
+        response = HttpResponse(conteudo, content_type='application/pdf')
+    response['Content-Disposition'] = f'{disposicao}; filename="{nome_arquivo}"'
+    response['ETag'] = cache_relatorios.etag(chave_relatorio)
+    # O navegador pode guardar, mas deve revalidar (If-None-Match) a cada uso
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def gerar_ou_enfileirar(request, tipo, parametros, disposicao='inline'):
+    """
+    Devolve o PDF do cache quando os dados não mudaram; senão gera na hora
+    ou, se o relatório passar do limite de linhas, coloca-o na fila e
+    redireciona para a página de status.
+
+    Retorna None se a geração síncrona falhar, para a view tratar o erro.
+    """
+    definicao = RELATORIOS[tipo]
+    versao = import_string(definicao['versao'])(parametros, request.user)
+    chave_relatorio = cache_relatorios.chave(tipo, parametros, versao)
+
+    etag = cache_relatorios.etag(chave_relatorio)
+    if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    em_cache = cache_relatorios.obter(chave_relatorio)
+    if em_cache:
+        return _resposta_pdf(em_cache, os.path.basename(em_cache), disposicao, chave_relatorio)
+
+    linhas = import_string(definicao['contar'])(parametros, request.user)
+
+    if linhas > settings.RELATORIO_LIMITE_SINCRONO:
+        tarefa = enfileirar(tipo, parametros, request.user)
+        messages.info(
+            request,
+            f"O relatório tem {linhas} registros e será gerado em segundo plano. "
+            "Esta página mostra quando ele estiver pronto para download."
+        )
+        return redirect('status_relatorio', pk=tarefa.pk)
+
+    template, contexto, nome_arquivo = import_string(definicao['montar'])(parametros, request.user)
+    pdf = gerar_pdf(template, contexto)
+    if pdf is None:
+        return None
+    cache_relatorios.guardar(chave_relatorio, nome_arquivo, pdf)
+    return _resposta_pdf(pdf, nome_arquivo, disposicao, chave_relatorio)
+
+
+def enfileirar(tipo, parametros, usuario):
+    if tipo not in RELATORIOS:
+        raise ValueError(f"Tipo de relatório desconhecido: {tipo}")
+    return TarefaRelatorio.objects.create(tipo=tipo, parametros=parametros, usuario=usuario)
+
+
+def reservar_proxima():
+    """Marca a tarefa pendente mais antiga como em processamento e a retorna."""
+    with transaction.atomic():
+        pendentes = TarefaRelatorio.objects.filter(status=TarefaRelatorio.PENDENTE).order_by('data_criacao', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            # Vários workers podem rodar ao mesmo tempo sem disputar a mesma linha
+            pendentes = pendentes.select_for_update(skip_locked=True)
+        tarefa = pendentes.first()
+        if tarefa is None:
+            return None
+
+        reservada = TarefaRelatorio.objects.filter(pk=tarefa.pk, status=TarefaRelatorio.PENDENTE).update(
+            status=TarefaRelatorio.PROCESSANDO,
+            data_inicio=timezone.now(),
+            tentativas=F('tentativas') + 1,
+        )
+        if not reservada:
+            return None
+
+    tarefa.refresh_from_db()
+    return tarefa
+
+
+def caminho_arquivo(tarefa):
+    return os.path.join(settings.RELATORIOS_DIR, tarefa.arquivo)
+
+
+def executar(tarefa):
+    """Gera o PDF da tarefa e grava o resultado (arquivo ou mensagem de erro)."""
+    try:
+        definicao = RELATORIOS[tarefa.tipo]
+        # A versão é lida antes de montar: se os dados mudarem no meio, a entrada fica órfã
+        versao = import_string(definicao['versao'])(tarefa.parametros, tarefa.usuario)
+        template, contexto, nome_arquivo = import_string(definicao['montar'])(tarefa.parametros, tarefa.usuario)
+        pdf = gerar_pdf(template, contexto)
+        if pdf is None:
+            raise RuntimeError("Ocorreu um erro ao gerar o PDF.")
+        cache_relatorios.guardar(cache_relatorios.chave(tarefa.tipo, tarefa.parametros, versao), nome_arquivo, pdf)
+
+        os.makedirs(settings.RELATORIOS_DIR, exist_ok=True)
+        arquivo = f"{tarefa.pk}_{uuid.uuid4().hex}.pdf"
+        temporario = os.path.join(settings.RELATORIOS_DIR, arquivo + '.tmp')
+        with open(temporario, 'wb') as destino:
+            destino.write(pdf)
+        os.replace(temporario, os.path.join(settings.RELATORIOS_DIR, arquivo))
+    except Exception as erro:
+        logger.exception("Falha ao gerar o relatório da tarefa %s", tarefa.pk)
+        tarefa.status = TarefaRelatorio.ERRO
+        tarefa.mensagem_erro = str(erro) or erro.__class__.__name__
+        tarefa.data_conclusao = timezone.now()
+        tarefa.save(update_fields=['status', 'mensagem_erro', 'data_conclusao'])
+        return tarefa
+
+    agora = timezone.now()
+    tarefa.status = TarefaRelatorio.CONCLUIDA
+    tarefa.arquivo = arquivo
+    tarefa.nome_arquivo = nome_arquivo
+    tarefa.data_conclusao = agora
+    tarefa.expira_em = agora + timedelta(hours=settings.RELATORIO_VALIDADE_HORAS)
+    tarefa.save(update_fields=['status', 'arquivo', 'nome_arquivo', 'data_conclusao', 'expira_em'])
+    return tarefa
+
+
+def liberar_abandonadas():
+    """Devolve à fila as tarefas presas em processamento; desiste após MAXIMO_TENTATIVAS."""
+    limite = timezone.now() - TEMPO_LIMITE_PROCESSAMENTO
+    abandonadas = TarefaRelatorio.objects.filter(status=TarefaRelatorio.PROCESSANDO, data_inicio__lt=limite)
+    devolvidas = abandonadas.filter(tentativas__lt=MAXIMO_TENTATIVAS).update(status=TarefaRelatorio.PENDENTE)
+    abandonadas.update(
+        status=TarefaRelatorio.ERRO,
+        mensagem_erro="O relatório não foi concluído após várias tentativas.",
+        data_conclusao=timezone.now(),
+    )
+    return devolvidas
+
+
+def remover_expiradas():
+    """Apaga os arquivos vencidos e as tarefas correspondentes. Retorna quantas foram removidas."""
+    agora = timezone.now()
+    expiradas = TarefaRelatorio.objects.filter(expira_em__lt=agora)
+    # Tarefas com erro não têm arquivo: somem junto com as concluídas do mesmo período
+    com_erro = TarefaRelatorio.objects.filter(
+        status=TarefaRelatorio.ERRO,
+        data_conclusao__lt=agora - timedelta(hours=settings.RELATORIO_VALIDADE_HORAS),
+    )
+
+    removidas = 0
+    for tarefa in expiradas.only('id', 'arquivo'):
+        if tarefa.arquivo:
+            try:
+                os.remove(caminho_arquivo(tarefa))
+            except FileNotFoundError:
+                pass
+        tarefa.delete()
+        removidas += 1
+    removidas += com_erro.delete()[0]
+    return removidas
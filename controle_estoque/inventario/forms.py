@@ -2,7 +2,11 @@ from django import forms
 from django.forms import ValidationError
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
-from .models import Produto, Categoria, TipoTransacao, Transacao, Item
+from .models import Produto, Categoria, TipoTransacao, Transacao
+from .busca import indexar_produtos
+from .widgets import AutocompleteProduto
+from .estoque import executar_com_retentativa, registrar_entrada, registrar_saida
+from django.db import transaction
 from django.utils import timezone
 
 # ALTERADO: O formulário de filtro de data foi completamente modificado
@@ -16,6 +20,22 @@ class DateFilterForm(forms.Form):
         widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
     )
 
+class ImportacaoCSVForm(forms.Form):
+    TIPO_CHOICES = (
+        ('produtos', 'Produtos'),
+        ('movimentos', 'Movimentações de estoque'),
+    )
+
+    tipo = forms.ChoiceField(
+        label="Conteúdo do arquivo",
+        choices=TIPO_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    arquivo = forms.FileField(
+        label="Arquivo CSV",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv'})
+    )
+
 class CadastroUsuarioForm(UserCreationForm):
     email = forms.EmailField(required=True)
     first_name = forms.CharField(max_length=30, required=True, label="Nome")
@@ -76,8 +96,9 @@ class CategoriaForm(forms.ModelForm):
 
 class TransacaoForm(forms.ModelForm):
     produto = forms.ModelChoiceField(
-        queryset=Produto.objects.filter(ativo=0),
-        label="Produto"
+        queryset=Produto.objects.filter(ativo=0).select_related('saldo'),
+        label="Produto",
+        widget=AutocompleteProduto(attrs={'placeholder': 'Digite o nome do produto...'}),
     )
 
     lote = forms.CharField(
@@ -115,6 +136,11 @@ class TransacaoForm(forms.ModelForm):
         quantidade = cleaned_data.get('quantidade')
         lote = cleaned_data.get('lote')
         
+        if quantidade is not None and quantidade <= 0:
+            raise ValidationError({
+                'quantidade': "Informe uma quantidade maior que zero"
+            })
+        
         if tipo_transacao and tipo_transacao.entrada:
             if not lote:
                 raise ValidationError({
@@ -136,8 +162,18 @@ class TransacaoForm(forms.ModelForm):
         transacao.produto = self.cleaned_data['produto']
         
         if commit:
-            transacao.save()
-            self.processar_itens(transacao)
+            def gravar():
+                # Transação, itens e saldo são gravados juntos ou nenhum deles.
+                # Numa nova tentativa o INSERT anterior já foi desfeito.
+                transacao.pk = None
+                with transaction.atomic():
+                    transacao.save()
+                    self.processar_itens(transacao)
+
+            executar_com_retentativa(gravar)
+            if transacao.tipo_transacao.entrada:
+                # Lote novo: passa a ser encontrado na busca de produtos
+                indexar_produtos([transacao.produto_id])
         
         return transacao
     
@@ -147,26 +183,6 @@ class TransacaoForm(forms.ModelForm):
         quantidade = self.cleaned_data['quantidade']
         
         if transacao.tipo_transacao.entrada:
-            itens = [
-                Item(
-                    produto=produto,
-                    transacao=transacao,
-                    lote=lote,
-                    disponivel=True
-                )
-                for _ in range(quantidade)
-            ]
-            Item.objects.bulk_create(itens)
+            registrar_entrada(produto, transacao, lote, quantidade)
         else:
-            itens = Item.objects.filter(
-                produto=produto,
-                disponivel=True
-            ).order_by('data_criacao')[:quantidade]
-            
-            if itens.count() < quantidade:
-                raise ValidationError("Estoque insuficiente para completar a transação")
-            
-            for item in itens:
-                item.disponivel = False
-                item.transacao = transacao
-                item.save()
\ No newline at end of file
+            registrar_saida(produto, transacao, quantidade)
\ No newline at end of file
@@ -0,0 +1,136 @@
+"""
+Gráficos vetoriais (SVG) para os relatórios em PDF.
+
+Gera o SVG como texto, sem matplotlib: o xhtml2pdf converte a imagem
+(via svglib) direto em desenho do reportlab, então não há rasterização
+nem PNG intermediário. As funções recebem o mesmo formato usado nos
+relatórios: uma sequência de dicts com 'produto__nome' e 'total_quantidade'.
+"""
+import base64
+import math
+from xml.sax.saxutils import escape
+
+LARGURA = 600
+ALTURA = 375
+FONTE = 'Helvetica'
+
+# Paleta "tab10", a mesma usada por padrão pelo matplotlib
+CORES = (
+    '#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+    '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf',
+)
+
+# Fatias além deste limite são agrupadas em "Outros" para manter a legenda legível
+MAXIMO_FATIAS = 10
+
+
+def _valores(data):
+    itens = [
+        (str(item['produto__nome']), item['total_quantidade'] or 0)
+        for item in data
+    ]
+    return [(rotulo, valor) for rotulo, valor in itens if valor > 0]
+
+
+def _agrupar_excedente(itens):
+    if len(itens) <= MAXIMO_FATIAS:
+        return itens
+    itens = sorted(itens, key=lambda item: -item[1])
+    principais = itens[:MAXIMO_FATIAS - 1]
+    outros = sum(valor for _, valor in itens[MAXIMO_FATIAS - 1:])
+    return principais + [('Outros', outros)]
+
+
+def _texto(x, y, conteudo, tamanho=11, ancora='start', cor='#333333', negrito=False):
+    peso = ' font-weight="bold"' if negrito else ''
+    return (
+        f'<text x="{x:.1f}" y="{y:.1f}" font-family="{FONTE}" font-size="{tamanho}" '
+        f'text-anchor="{ancora}" fill="{cor}"{peso}>{escape(conteudo)}</text>'
+    )
+
+
+def _documento(elementos):
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{LARGURA}" height="{ALTURA}" '
+        f'viewBox="0 0 {LARGURA} {ALTURA}">' + ''.join(elementos) + '</svg>'
+    )
+
+
+def _truncar(rotulo, limite=28):
+    return rotulo if len(rotulo) <= limite else rotulo[:limite - 1] + '…'
+
+
+def pie_svg(data, title):
+    """Retorna o SVG (texto) de um gráfico de pizza, ou None se não houver dados."""
+    itens = _agrupar_excedente(_valores(data))
+    if not itens:
+        return None
+
+    total = sum(valor for _, valor in itens)
+    cx, cy, raio = 190, 205, 140
+    elementos = [_texto(LARGURA / 2, 28, title, tamanho=16, ancora='middle', negrito=True)]
+
+    angulo = -math.pi / 2  # começa em 12 horas, como startangle=90 no matplotlib
+    for indice, (rotulo, valor) in enumerate(itens):
+        cor = CORES[indice % len(CORES)]
+        fracao = valor / total
+        if fracao >= 1:
+            elementos.append(f'<circle cx="{cx}" cy="{cy}" r="{raio}" fill="{cor}"/>')
+        else:
+            fim = angulo + fracao * 2 * math.pi
+            x1, y1 = cx + raio * math.cos(angulo), cy + raio * math.sin(angulo)
+            x2, y2 = cx + raio * math.cos(fim), cy + raio * math.sin(fim)
+            arco_maior = 1 if fracao > 0.5 else 0
+            elementos.append(
+                f'<path d="M{cx},{cy} L{x1:.2f},{y1:.2f} '
+                f'A{raio},{raio} 0 {arco_maior} 1 {x2:.2f},{y2:.2f} Z" '
+                f'fill="{cor}" stroke="#ffffff" stroke-width="1"/>'
+            )
+
+        # Percentual dentro da fatia, quando couber
+        if fracao >= 0.04:
+            meio = angulo + fracao * math.pi
+            elementos.append(_texto(
+                cx + raio * 0.62 * math.cos(meio), cy + raio * 0.62 * math.sin(meio) + 4,
+                f'{fracao * 100:.1f}%', tamanho=10, ancora='middle', cor='#ffffff', negrito=True
+            ))
+        angulo += fracao * 2 * math.pi
+
+        # Legenda à direita
+        y = 80 + indice * 24
+        elementos.append(f'<rect x="360" y="{y - 11}" width="14" height="14" fill="{cor}"/>')
+        elementos.append(_texto(382, y, f'{_truncar(rotulo)} ({valor})', tamanho=11))
+
+    return _documento(elementos)
+
+
+def bar_svg(data, title):
+    """Retorna o SVG (texto) de um gráfico de barras horizontais, ou None se não houver dados."""
+    itens = _agrupar_excedente(sorted(_valores(data), key=lambda item: -item[1]))
+    if not itens:
+        return None
+
+    maior = max(valor for _, valor in itens)
+    esquerda, direita, topo = 180, LARGURA - 60, 55
+    altura_barra = min(26, (ALTURA - topo - 20) / len(itens) - 6)
+    elementos = [_texto(LARGURA / 2, 28, title, tamanho=16, ancora='middle', negrito=True)]
+
+    for indice, (rotulo, valor) in enumerate(itens):
+        y = topo + indice * (altura_barra + 6)
+        largura = (direita - esquerda) * valor / maior
+        elementos.append(
+            f'<rect x="{esquerda}" y="{y:.1f}" width="{largura:.1f}" height="{altura_barra:.1f}" '
+            f'fill="{CORES[indice % len(CORES)]}"/>'
+        )
+        meio = y + altura_barra / 2 + 4
+        elementos.append(_texto(esquerda - 8, meio, _truncar(rotulo, 24), tamanho=11, ancora='end'))
+        elementos.append(_texto(esquerda + largura + 6, meio, str(valor), tamanho=11))
+
+    return _documento(elementos)
+
+
+def para_base64(svg):
+    """Codifica o SVG para uso em <img src="data:image/svg+xml;base64,...">."""
+    if svg is None:
+        return None
+    return base64.b64encode(svg.encode('utf-8')).decode('ascii')
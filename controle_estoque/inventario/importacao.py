@@ -0,0 +1,273 @@
+"""
+Importação em lote de produtos e movimentações a partir de CSV.
+
+O arquivo é lido linha a linha e processado em blocos de `tamanho_bloco`
+linhas, cada bloco em sua própria transação. Assim a memória usada não
+depende do tamanho do arquivo e um erro de banco afeta só o bloco corrente.
+Linhas inválidas são registradas em `ResultadoImportacao.erros` e puladas.
+Um arquivo com a estrutura quebrada (aspas sem fechar, campo grande demais)
+interrompe a leitura: o que veio antes é gravado e o motivo fica em
+`ResultadoImportacao.erro_arquivo`.
+
+Colunas aceitas (cabeçalho obrigatório, separador "," ou ";"):
+
+* produtos: nome, descricao, categoria, alerta_estoque_minimo
+* movimentos: produto, tipo, quantidade, lote, data, observacoes
+
+Em movimentos, `produto` é o id ou o nome do produto ativo e `tipo` é o
+id ou o nome de um TipoTransacao.
+"""
+import csv
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from django.db import transaction
+from django.forms import ValidationError
+from django.utils import timezone
+
+from .busca import indexar_produtos, sincronizar_indice
+from .estoque import ajustar_saldo, registrar_saida
+from .models import ATIVO, Categoria, Item, Produto, TipoTransacao, Transacao
+
+TAMANHO_BLOCO = 500
+# Quantidade máxima de erros guardados para exibição (todos são contados)
+LIMITE_ERROS = 1000
+# Maior valor de IntegerField/PositiveIntegerField aceito por todos os bancos
+MAXIMO_INTEIRO = 2147483647
+# Textos acima do tamanho da coluna viram erro da linha em vez de serem cortados
+TAMANHO_NOME = Produto._meta.get_field('nome').max_length
+TAMANHO_CATEGORIA = Categoria._meta.get_field('nome').max_length
+TAMANHO_LOTE = Item._meta.get_field('lote').max_length
+
+
+class ResultadoImportacao:
+    def __init__(self):
+        self.linhas = 0
+        self.importadas = 0
+        self.total_erros = 0
+        self.erros = []
+        self.erro_arquivo = None
+        self.inicio = time.perf_counter()
+        self.duracao = 0.0
+
+    def adicionar_erro(self, linha, mensagem):
+        self.total_erros += 1
+        if len(self.erros) < LIMITE_ERROS:
+            self.erros.append((linha, mensagem))
+
+    def finalizar(self):
+        self.duracao = time.perf_counter() - self.inicio
+        return self
+
+    @property
+    def linhas_por_segundo(self):
+        return self.linhas / self.duracao if self.duracao else 0.0
+
+
+def _leitor(arquivo):
+    """Cria um DictReader detectando o separador pela linha de cabeçalho."""
+    cabecalho = arquivo.readline()
+    delimitador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+    campos = [campo.strip().lower() for campo in next(csv.reader([cabecalho], delimiter=delimitador))]
+    # strict: aspas malformadas são erro, em vez de juntar as linhas seguintes num campo só
+    return csv.DictReader(arquivo, fieldnames=campos, delimiter=delimitador, strict=True)
+
+
+def _blocos(arquivo, tamanho_bloco, resultado):
+    bloco = []
+    leitor = None
+    try:
+        leitor = _leitor(arquivo)
+        for linha in leitor:
+            # O cabeçalho foi lido à parte: line_num + 1 é a linha física no arquivo
+            bloco.append((leitor.line_num + 1, linha))
+            if len(bloco) == tamanho_bloco:
+                yield bloco
+                bloco = []
+    except csv.Error as erro:
+        # O leitor não tem como continuar depois do erro: grava o que já foi lido
+        linha = leitor.line_num + 1 if leitor else 1
+        resultado.erro_arquivo = f"Arquivo CSV inválido na linha {linha}: {erro}"
+    if bloco:
+        yield bloco
+
+
+def _texto(linha, campo):
+    return (linha.get(campo) or '').strip()
+
+
+def _inteiro(valor, campo, obrigatorio=True):
+    if not valor:
+        if obrigatorio:
+            raise ValidationError(f"Campo '{campo}' é obrigatório")
+        return None
+    try:
+        numero = int(valor)
+    except ValueError:
+        raise ValidationError(f"Campo '{campo}' deve ser um número inteiro")
+    if numero < 0 or (obrigatorio and numero == 0):
+        raise ValidationError(f"Campo '{campo}' deve ser maior que zero")
+    # Acima disso o banco recusa o valor e derrubaria o bloco inteiro
+    if numero > MAXIMO_INTEIRO:
+        raise ValidationError(f"Campo '{campo}' deve ser no máximo {MAXIMO_INTEIRO}")
+    return numero
+
+
+def _limitado(valor, campo, tamanho):
+    if len(valor) > tamanho:
+        raise ValidationError(f"Campo '{campo}' deve ter no máximo {tamanho} caracteres")
+    return valor
+
+
+def _data(valor):
+    if not valor:
+        return timezone.now()
+    for formato in ('%Y-%m-%d %H:%M', '%Y-%m-%d', '%d/%m/%Y %H:%M', '%d/%m/%Y'):
+        try:
+            return timezone.make_aware(datetime.strptime(valor, formato))
+        except ValueError:
+            continue
+    raise ValidationError("Campo 'data' deve estar no formato AAAA-MM-DD ou DD/MM/AAAA")
+
+
+def importar_produtos(arquivo, usuario, tamanho_bloco=TAMANHO_BLOCO):
+    resultado = ResultadoImportacao()
+    categorias = dict(Categoria.objects.values_list('nome', 'id'))
+
+    for bloco in _blocos(arquivo, tamanho_bloco, resultado):
+        resultado.linhas += len(bloco)
+        novas_categorias = {
+            _texto(linha, 'categoria') for _, linha in bloco
+            if len(_texto(linha, 'categoria')) <= TAMANHO_CATEGORIA
+        } - set(categorias) - {''}
+
+        produtos = []
+        with transaction.atomic():
+            if novas_categorias:
+                Categoria.objects.bulk_create([Categoria(nome=nome) for nome in novas_categorias])
+                categorias.update(
+                    Categoria.objects.filter(nome__in=novas_categorias).values_list('nome', 'id')
+                )
+
+            for numero, linha in bloco:
+                try:
+                    nome = _texto(linha, 'nome')
+                    if not nome:
+                        raise ValidationError("Campo 'nome' é obrigatório")
+                    categoria = _limitado(_texto(linha, 'categoria'), 'categoria', TAMANHO_CATEGORIA)
+                    produtos.append(Produto(
+                        nome=_limitado(nome, 'nome', TAMANHO_NOME),
+                        descricao=_texto(linha, 'descricao') or None,
+                        categoria_id=categorias.get(categoria),
+                        alerta_estoque_minimo=_inteiro(
+                            _texto(linha, 'alerta_estoque_minimo'), 'alerta_estoque_minimo', obrigatorio=False
+                        ),
+                        usuario_responsavel=usuario,
+                    ))
+                except ValidationError as erro:
+                    resultado.adicionar_erro(numero, erro.messages[0])
+
+            # O SaldoEstoque é criado sob demanda na primeira movimentação
+            Produto.objects.bulk_create(produtos)
+        resultado.importadas += len(produtos)
+
+    # O bulk_create do MySQL não devolve os ids: indexa o que ainda não está na busca
+    sincronizar_indice()
+    return resultado.finalizar()
+
+
+class _CacheBusca:
+    """Resolve id ou nome para o registro, consultando o banco uma vez por bloco."""
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+        self.ids = {}
+
+    def carregar(self, valores):
+        faltando = {valor for valor in valores if valor and valor not in self.ids}
+        if not faltando:
+            return
+        numeros = {int(valor) for valor in faltando if valor.isdigit()}
+        for registro in self.queryset.filter(id__in=numeros):
+            self.ids[str(registro.id)] = registro
+        for registro in self.queryset.filter(nome__in=faltando - set(self.ids)).order_by('id'):
+            self.ids.setdefault(registro.nome, registro)
+
+    def __getitem__(self, valor):
+        return self.ids.get(valor)
+
+
+def importar_movimentos(arquivo, usuario, tamanho_bloco=TAMANHO_BLOCO):
+    resultado = ResultadoImportacao()
+    produtos = _CacheBusca(Produto.objects.filter(ativo=ATIVO))
+    tipos = _CacheBusca(TipoTransacao.objects.all())
+    # Produtos que receberam lotes: o texto de busca inclui os números de lote
+    com_entrada = set()
+
+    for bloco in _blocos(arquivo, tamanho_bloco, resultado):
+        resultado.linhas += len(bloco)
+        produtos.carregar(_texto(linha, 'produto') for _, linha in bloco)
+        tipos.carregar(_texto(linha, 'tipo') for _, linha in bloco)
+
+        with transaction.atomic():
+            # Entradas pendentes por produto: gravadas com bulk_create no fim do
+            # bloco, ou antes de uma saída do mesmo produto (que depende delas)
+            pendentes = defaultdict(list)
+
+            def gravar_entradas(produto_id=None):
+                ids = [produto_id] if produto_id is not None else list(pendentes)
+                for pid in ids:
+                    itens = pendentes.pop(pid, [])
+                    if itens:
+                        Item.objects.bulk_create(itens)
+                        ajustar_saldo(itens[0].produto, sum(item.quantidade for item in itens))
+
+            for numero, linha in bloco:
+                try:
+                    produto = produtos[_texto(linha, 'produto')]
+                    if produto is None:
+                        raise ValidationError(f"Produto '{_texto(linha, 'produto')}' não encontrado")
+                    tipo = tipos[_texto(linha, 'tipo')]
+                    if tipo is None:
+                        raise ValidationError(f"Tipo de transação '{_texto(linha, 'tipo')}' não encontrado")
+                    quantidade = _inteiro(_texto(linha, 'quantidade'), 'quantidade')
+                    lote = _limitado(_texto(linha, 'lote'), 'lote', TAMANHO_LOTE)
+                    if tipo.entrada and not lote:
+                        raise ValidationError("Informe o número do lote para entrada de estoque")
+                    data = _data(_texto(linha, 'data'))
+
+                    if tipo.entrada:
+                        transacao = Transacao.objects.create(
+                            tipo_transacao=tipo, usuario=usuario, produto=produto, data=data,
+                            quantidade=quantidade, observacoes=_texto(linha, 'observacoes') or None,
+                        )
+                        com_entrada.add(produto.id)
+                        pendentes[produto.id].append(Item(
+                            produto=produto, transacao=transacao, lote=lote,
+                            quantidade=quantidade, quantidade_inicial=quantidade,
+                            data_criacao=data,
+                        ))
+                    else:
+                        gravar_entradas(produto.id)
+                        with transaction.atomic():
+                            transacao = Transacao.objects.create(
+                                tipo_transacao=tipo, usuario=usuario, produto=produto, data=data,
+                                quantidade=quantidade, observacoes=_texto(linha, 'observacoes') or None,
+                            )
+                            registrar_saida(produto, transacao, quantidade)
+                except ValidationError as erro:
+                    resultado.adicionar_erro(numero, erro.messages[0])
+                else:
+                    resultado.importadas += 1
+
+            gravar_entradas()
+
+    indexar_produtos(com_entrada)
+    return resultado.finalizar()
+
+
+IMPORTADORES = {
+    'produtos': importar_produtos,
+    'movimentos': importar_movimentos,
+}
@@ -0,0 +1,219 @@
+"""
+Tempo gasto em cada requisição, por etapa: SQL (tempo e número de consultas),
+renderização de templates, geração de PDF e de gráficos.
+
+ServerTimingMiddleware abre uma Medicao por requisição, devolve as etapas no
+cabeçalho `Server-Timing` (visível na aba de rede do navegador) e guarda os
+tempos por view em `estatisticas`, com p50/p95/p99 das últimas AMOSTRAS
+requisições de cada view (página "Tempos por view", só para staff).
+
+As etapas são somadas por `cronometro(nome)` / `@cronometrar(nome)`, que não
+fazem nada fora de uma requisição medida. Com SERVER_TIMING desligado o
+middleware sai da pilha (MiddlewareNotUsed) e o custo que sobra é uma
+leitura de ContextVar por template, PDF ou gráfico (ver `manage.py
+benchmark_instrumentacao`).
+
+Os tempos ficam na memória de cada processo: com vários workers, cada um
+mostra as suas próprias requisições.
+"""
+import functools
+import threading
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+# Etapas medidas, na ordem do cabeçalho e da página
+ETAPAS = ('sql', 'template', 'pdf', 'grafico')
+# Requisições guardadas por view para os percentis
+AMOSTRAS = 500
+
+_medicao_atual = ContextVar('medicao_atual', default=None)
+
+
+class Medicao:
+    """Tempos (em segundos) de uma requisição."""
+
+    __slots__ = ('tempos', 'consultas', '_ativas')
+
+    def __init__(self):
+        self.tempos = dict.fromkeys(ETAPAS, 0.0)
+        self.consultas = 0
+        self._ativas = set()
+
+    def executar_sql(self, execute, sql, params, many, context):
+        """Wrapper de connection.execute_wrapper()."""
+        inicio = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempos['sql'] += perf_counter() - inicio
+            self.consultas += 1
+
+
+@contextmanager
+def cronometro(nome):
+    """Soma a duração do bloco à etapa `nome` da requisição medida, se houver."""
+    medicao = _medicao_atual.get()
+    # Etapas aninhadas em si mesmas (um template que renderiza outro) contam uma vez só
+    if medicao is None or nome in medicao._ativas:
+        yield
+        return
+    medicao._ativas.add(nome)
+    inicio = perf_counter()
+    try:
+        yield
+    finally:
+        medicao.tempos[nome] += perf_counter() - inicio
+        medicao._ativas.discard(nome)
+
+
+def cronometrar(nome):
+    """Decorador equivalente a `with cronometro(nome)` em volta da função."""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def _wrapped(*args, **kwargs):
+            if _medicao_atual.get() is None:
+                return funcao(*args, **kwargs)
+            with cronometro(nome):
+                return funcao(*args, **kwargs)
+        return _wrapped
+    return decorador
+
+
+def medicao_atual():
+    """Medicao da requisição em andamento, ou None."""
+    return _medicao_atual.get()
+
+
+@contextmanager
+def medir_requisicao():
+    """Abre uma Medicao para o bloco, com o SQL de todas as conexões contado nela."""
+    medicao = Medicao()
+    token = _medicao_atual.set(medicao)
+    try:
+        with ExitStack() as pilha:
+            for conexao in connections.all():
+                pilha.enter_context(conexao.execute_wrapper(medicao.executar_sql))
+            yield medicao
+    finally:
+        _medicao_atual.reset(token)
+
+
+class _TemplateMedido(Template):
+    def render(self, context=None, request=None):
+        if _medicao_atual.get() is None:
+            return super().render(context, request)
+        with cronometro('template'):
+            return super().render(context, request)
+
+
+class DjangoTemplatesMedidos(DjangoTemplates):
+    """Backend DjangoTemplates que soma o tempo de renderização na etapa 'template'."""
+
+    def from_string(self, template_code):
+        return _TemplateMedido(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return _TemplateMedido(template.template, self)
+
+
+def percentil(valores_ordenados, p):
+    """Percentil `p` (0-100) pelo método do posto mais próximo."""
+    if not valores_ordenados:
+        return None
+    posicao = max(0, -(-len(valores_ordenados) * p // 100) - 1)
+    return valores_ordenados[int(posicao)]
+
+
+class EstatisticasPorView:
+    """Janela das últimas `amostras` requisições de cada view, protegida por lock."""
+
+    def __init__(self, amostras=AMOSTRAS):
+        self.amostras = amostras
+        self._lock = threading.Lock()
+        self._por_view = {}
+
+    def registrar(self, view, total, medicao):
+        """Guarda a requisição: tempo total e de cada etapa em ms, e número de consultas."""
+        linha = (total * 1000, medicao.consultas, *(medicao.tempos[etapa] * 1000 for etapa in ETAPAS))
+        with self._lock:
+            janela = self._por_view.get(view)
+            if janela is None:
+                janela = self._por_view[view] = deque(maxlen=self.amostras)
+            janela.append(linha)
+
+    def limpar(self):
+        with self._lock:
+            self._por_view.clear()
+
+    def resumo(self):
+        """
+        Uma linha por view, da mais lenta (p95 do total) para a mais rápida:
+        requisições na janela, p50/p95/p99 do total e p95 de cada etapa.
+        """
+        with self._lock:
+            janelas = {view: list(janela) for view, janela in self._por_view.items()}
+
+        linhas = []
+        for view, janela in janelas.items():
+            colunas = [sorted(coluna) for coluna in zip(*janela)]
+            totais, consultas = colunas[0], colunas[1]
+            linha = {
+                'view': view,
+                'requisicoes': len(janela),
+                'p50': percentil(totais, 50),
+                'p95': percentil(totais, 95),
+                'p99': percentil(totais, 99),
+                'consultas_p95': percentil(consultas, 95),
+                # Na ordem de ETAPAS
+                'etapas_p95': [percentil(valores, 95) for valores in colunas[2:]],
+            }
+            linhas.append(linha)
+        linhas.sort(key=lambda linha: linha['p95'], reverse=True)
+        return linhas
+
+
+estatisticas = EstatisticasPorView()
+
+
+def cabecalho_server_timing(medicao, total):
+    """Valor do cabeçalho Server-Timing; PDF e gráfico só aparecem quando usados."""
+    partes = [f'sql;dur={medicao.tempos["sql"] * 1000:.1f};desc="{medicao.consultas} consultas"']
+    for etapa in ETAPAS[1:]:
+        duracao = medicao.tempos[etapa]
+        if duracao or etapa == 'template':
+            partes.append(f'{etapa};dur={duracao * 1000:.1f}')
+    partes.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(partes)
+
+
+class ServerTimingMiddleware:
+    """
+    Mede cada requisição e grava o cabeçalho Server-Timing. Fica no início de
+    MIDDLEWARE para que o total inclua os outros middlewares. Em respostas
+    em streaming só entra o que acontece antes do primeiro byte.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        inicio = perf_counter()
+        with medir_requisicao() as medicao:
+            response = self.get_response(request)
+        total = perf_counter() - inicio
+
+        response['Server-Timing'] = cabecalho_server_timing(medicao, total)
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            estatisticas.registrar(match.view_name, total, medicao)
+        return response
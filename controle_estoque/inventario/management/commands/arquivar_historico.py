@@ -0,0 +1,128 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from inventario.arquivo import (
+    TAMANHO_LOTE, arquivar_itens, arquivar_transacoes, itens_arquivaveis, transacoes_arquivaveis,
+)
+from inventario.estoque import contar_itens_disponiveis
+from inventario.models import (
+    ConsumoLote, ConsumoLoteArquivado, Item, ItemArquivado, Produto, Transacao, TransacaoArquivada,
+)
+
+TABELAS = (Transacao, Item, ConsumoLote, TransacaoArquivada, ItemArquivado, ConsumoLoteArquivado)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move para as tabelas de arquivo as transações arquivadas e os lotes consumidos há mais de N dias, "
+        "em lotes. Mostra o tamanho das tabelas e a latência das consultas principais antes e depois."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=180,
+            help="Idade mínima, em dias, das linhas movidas (padrão: 180).",
+        )
+        parser.add_argument(
+            '--tamanho-lote',
+            type=int,
+            default=TAMANHO_LOTE,
+            help=f"Linhas movidas por transação (padrão: {TAMANHO_LOTE}).",
+        )
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help="Apenas informa quantas linhas seriam movidas.",
+        )
+
+    def _tamanhos(self):
+        """Linhas e, no MySQL, bytes (dados + índices) de cada tabela."""
+        bytes_por_tabela = {}
+        if connection.vendor == 'mysql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT table_name, data_length + index_length FROM information_schema.tables "
+                    "WHERE table_schema = DATABASE()"
+                )
+                bytes_por_tabela = {nome.lower(): tamanho for nome, tamanho in cursor.fetchall()}
+        return {
+            modelo._meta.db_table: (
+                modelo.objects.count(),
+                bytes_por_tabela.get(modelo._meta.db_table.lower()),
+            )
+            for modelo in TABELAS
+        }
+
+    def _latencias(self, repeticoes=5):
+        """Mediana (ms) das consultas que dependem do tamanho das tabelas principais."""
+        produto_id = Produto.objects.order_by('id').values_list('id', flat=True).first()
+        consultas = {
+            'listar_transacao (1ª página)': lambda: list(
+                Transacao.objects.filter(arquivada=False).select_related(
+                    'tipo_transacao', 'usuario', 'produto'
+                ).order_by('-data')[:10]
+            ),
+            'lotes FIFO de um produto': lambda: list(
+                Item.objects.filter(produto_id=produto_id, disponivel=True).order_by('data_criacao', 'id')[:50]
+            ),
+            'itens disponíveis por produto': contar_itens_disponiveis,
+        }
+        resultado = {}
+        for nome, consulta in consultas.items():
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                consulta()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            resultado[nome] = statistics.median(tempos)
+        return resultado
+
+    def _formatar_bytes(self, valor):
+        return '-' if valor is None else f"{valor / 1024 / 1024:.1f} MB"
+
+    def handle(self, *args, **options):
+        if options['dias'] < 0 or options['tamanho_lote'] <= 0:
+            raise CommandError("--dias não pode ser negativo e --tamanho-lote deve ser maior que zero.")
+        corte = timezone.now() - timedelta(days=options['dias'])
+        self.stdout.write(f"Corte: linhas anteriores a {timezone.localtime(corte):%d/%m/%Y %H:%M}")
+
+        if options['simular']:
+            self.stdout.write(f"Lotes consumidos a mover: {itens_arquivaveis(corte).count()}")
+            self.stdout.write(
+                f"Transações arquivadas a mover (sem contar as liberadas pelos lotes): "
+                f"{transacoes_arquivaveis(corte).count()}"
+            )
+            return
+
+        tamanhos_antes = self._tamanhos()
+        latencias_antes = self._latencias()
+
+        inicio = time.perf_counter()
+        itens = arquivar_itens(corte, options['tamanho_lote'])
+        transacoes = arquivar_transacoes(corte, options['tamanho_lote'])
+        duracao = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"{itens} lote(s) e {transacoes} transação(ões) movidos em {duracao:.1f}s."
+        ))
+
+        tamanhos_depois = self._tamanhos()
+        latencias_depois = self._latencias()
+
+        self.stdout.write(f"\n{'Tabela':<34} {'Linhas antes':>13} {'Linhas depois':>14} {'Antes':>10} {'Depois':>10}")
+        for tabela, (linhas, tamanho) in tamanhos_antes.items():
+            linhas_depois, tamanho_depois = tamanhos_depois[tabela]
+            self.stdout.write(
+                f"{tabela:<34} {linhas:>13} {linhas_depois:>14} "
+                f"{self._formatar_bytes(tamanho):>10} {self._formatar_bytes(tamanho_depois):>10}"
+            )
+
+        self.stdout.write(f"\n{'Consulta':<34} {'Antes (ms)':>13} {'Depois (ms)':>14}")
+        for nome, antes in latencias_antes.items():
+            self.stdout.write(f"{nome:<34} {antes:>13.2f} {latencias_depois[nome]:>14.2f}")
@@ -0,0 +1,130 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from inventario.busca import _indice_produtos, buscar_produtos, indexar_produtos
+from inventario.models import Categoria, Item, Produto, TipoTransacao, Transacao
+
+PREFIXO = 'zbench'
+
+NOMES = (
+    'Parafuso', 'Porca', 'Arruela', 'Cabo', 'Conector', 'Disjuntor', 'Tomada', 'Interruptor',
+    'Lâmpada', 'Fita Isolante', 'Bucha', 'Abraçadeira', 'Eletroduto', 'Caixa de Passagem', 'Luva',
+)
+MATERIAIS = ('Aço', 'Inox', 'Latão', 'Alumínio', 'Nylon', 'PVC', 'Cobre', 'Galvanizado')
+MEDIDAS = ('3mm', '5mm', '8mm', '10mm', '1/2"', '3/4"', '2,5mm²', '4mm²', '16A', '20A', '32A')
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede a busca de produtos (inventario.busca) sobre um catálogo sintético. Os produtos são "
+        "gravados de verdade (o FULLTEXT do InnoDB só enxerga dados confirmados) e apagados no fim."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--produtos',
+            type=int,
+            default=100000,
+            help="Produtos no catálogo sintético (padrão: 100000).",
+        )
+        parser.add_argument(
+            '--consultas',
+            type=int,
+            default=200,
+            help="Buscas medidas (padrão: 200).",
+        )
+
+    def _popular(self, quantidade):
+        aleatorio = random.Random(42)
+        categorias = [
+            Categoria.objects.create(nome=f"{PREFIXO} {nome}") for nome in ('Fixação', 'Elétrica', 'Hidráulica')
+        ]
+        for inicio in range(0, quantidade, 5000):
+            Produto.objects.bulk_create([
+                Produto(
+                    nome=f"{aleatorio.choice(NOMES)} {aleatorio.choice(MATERIAIS)} {aleatorio.choice(MEDIDAS)} "
+                         f"{PREFIXO}{indice}",
+                    descricao=f"Código {indice}. {aleatorio.choice(MATERIAIS)} para uso geral",
+                    categoria=aleatorio.choice(categorias),
+                )
+                for indice in range(inicio, min(inicio + 5000, quantidade))
+            ])
+        ids = list(Produto.objects.filter(nome__contains=PREFIXO).order_by('id').values_list('id', flat=True))
+
+        # Um lote em cada décimo produto, para a busca por número de lote
+        usuario_id = User.objects.order_by('id').values_list('id', flat=True).first()
+        if usuario_id is not None:
+            tipo = TipoTransacao.objects.create(nome=f"{PREFIXO} entrada", entrada=True)
+            with transaction.atomic():
+                for produto_id in ids[::10]:
+                    transacao = Transacao.objects.create(
+                        tipo_transacao=tipo, usuario_id=usuario_id, produto_id=produto_id, quantidade=1,
+                    )
+                    Item.objects.create(
+                        produto_id=produto_id, transacao=transacao, lote=f"L{produto_id:07d}",
+                        quantidade=1, quantidade_inicial=1,
+                    )
+        for inicio in range(0, len(ids), 5000):
+            indexar_produtos(ids[inicio:inicio + 5000])
+        return ids
+
+    def _limpar(self):
+        Item.objects.filter(transacao__tipo_transacao__nome=f"{PREFIXO} entrada").delete()
+        Transacao.objects.filter(tipo_transacao__nome=f"{PREFIXO} entrada").delete()
+        TipoTransacao.objects.filter(nome=f"{PREFIXO} entrada").delete()
+        Produto.objects.filter(nome__contains=PREFIXO).delete()
+        Categoria.objects.filter(nome__startswith=PREFIXO).delete()
+
+    def handle(self, *args, **options):
+        self._limpar()
+        self.stdout.write(f"Criando {options['produtos']} produtos...")
+        inicio = time.perf_counter()
+        ids = self._popular(options['produtos'])
+        self.stdout.write(f"Catálogo e índice gravados em {time.perf_counter() - inicio:.1f}s.")
+
+        try:
+            aleatorio = random.Random(7)
+            consultas = [
+                f"{aleatorio.choice(NOMES)} {aleatorio.choice(MATERIAIS)}".lower() for _ in range(options['consultas'])
+            ]
+            # Variações sem acento, no plural, por prefixo e por lote
+            consultas += ['lampadas aluminio', 'abracadeira inox', 'parafusos aco 10mm', 'conect', 'eletrica']
+            consultas += [f"L{produto_id:07d}" for produto_id in ids[:50:10]]
+
+            if connection.vendor != 'mysql':
+                _indice_produtos.limpar()
+                inicio = time.perf_counter()
+                buscar_produtos(consultas[0])
+                self.stdout.write(f"Montagem do índice em memória: {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+            tempos = []
+            resultados = []
+            for consulta in consultas:
+                inicio = time.perf_counter()
+                encontrados = buscar_produtos(consulta)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+                resultados.append(len(encontrados))
+
+            tempos.sort()
+            self.stdout.write(
+                f"Backend: {connection.vendor} | {len(consultas)} buscas | "
+                f"mediana {statistics.median(tempos):.2f} ms | "
+                f"p95 {tempos[int(len(tempos) * 0.95) - 1]:.2f} ms | máximo {tempos[-1]:.2f} ms | "
+                f"média de {statistics.mean(resultados):.0f} resultado(s)"
+            )
+
+            # Referência: a busca anterior (LIKE '%x%' só no nome)
+            tempos_like = []
+            for consulta in consultas[:50]:
+                inicio = time.perf_counter()
+                list(Produto.objects.filter(nome__icontains=consulta).values_list('id', flat=True)[:500])
+                tempos_like.append((time.perf_counter() - inicio) * 1000)
+            self.stdout.write(f"nome__icontains (referência): mediana {statistics.median(tempos_like):.2f} ms")
+        finally:
+            self._limpar()
+            _indice_produtos.limpar()
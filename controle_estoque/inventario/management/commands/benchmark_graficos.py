@@ -0,0 +1,108 @@
+import base64
+import resource
+import statistics
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+
+from inventario.utils import generate_bar_chart, generate_pie_chart
+
+
+def _matplotlib(data, title, desenhar):
+    """Implementação anterior, com matplotlib (PNG em base64), usada como referência."""
+    if not data:
+        return None
+
+    # Força o matplotlib a usar um modo "não-visual" para evitar erros no servidor
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    labels = [item['produto__nome'] for item in data]
+    sizes = [item['total_quantidade'] for item in data]
+
+    fig, ax = plt.subplots(figsize=(6, 4))
+    desenhar(ax, labels, sizes)
+    plt.title(title, fontsize=12)
+
+    buf = BytesIO()
+    plt.savefig(buf, format='png', bbox_inches='tight')
+    plt.close(fig)
+    return base64.b64encode(buf.getvalue()).decode('utf-8')
+
+
+def _pizza(ax, labels, sizes):
+    ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90, textprops={'fontsize': 8})
+    ax.axis('equal')
+
+
+def _barras(ax, labels, sizes):
+    ax.barh(labels, sizes)
+    ax.invert_yaxis()
+
+
+def pizza_matplotlib(data, title):
+    return _matplotlib(data, title, _pizza)
+
+
+def barras_matplotlib(data, title):
+    return _matplotlib(data, title, _barras)
+
+
+# (nome, implementação em SVG, referência em matplotlib)
+GRAFICOS = (
+    ('pizza', generate_pie_chart, pizza_matplotlib),
+    ('barras', generate_bar_chart, barras_matplotlib),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara os gráficos em SVG (pizza e barras) com as implementações em matplotlib: "
+        "tempo por gráfico, tamanho do base64 gerado e aumento do pico de memória do processo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--produtos',
+            type=int,
+            default=12,
+            help="Quantidade de fatias (produtos) no gráfico (padrão: 12).",
+        )
+        parser.add_argument(
+            '--repeticoes',
+            type=int,
+            default=20,
+            help="Gráficos gerados por implementação (padrão: 20).",
+        )
+
+    def _medir(self, funcao, dados, repeticoes):
+        rss_antes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            resultado = funcao(dados, "Entradas por Produto")
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        rss_depois = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss é em KB no Linux; o primeiro gráfico inclui o custo de importação/aquecimento
+        return tempos, len(resultado or ''), (rss_depois - rss_antes) / 1024
+
+    def handle(self, *args, **options):
+        dados = [
+            {'produto__nome': f"Produto {indice}", 'total_quantidade': (indice * 37) % 90 + 10}
+            for indice in range(options['produtos'])
+        ]
+
+        self.stdout.write(
+            f"{'Implementação':<20} {'1º (ms)':>10} {'Mediana (ms)':>14} "
+            f"{'Base64 (bytes)':>16} {'Pico RSS (+MB)':>16}"
+        )
+        # Os SVGs são medidos primeiro para que o pico de memória do matplotlib não os mascare
+        medicoes = [(f'SVG {nome}', svg) for nome, svg, _ in GRAFICOS]
+        medicoes += [(f'matplotlib {nome}', referencia) for nome, _, referencia in GRAFICOS]
+        for nome, funcao in medicoes:
+            tempos, tamanho, rss = self._medir(funcao, dados, options['repeticoes'])
+            self.stdout.write(
+                f"{nome:<20} {tempos[0]:>10.1f} {statistics.median(tempos):>14.2f} {tamanho:>16} {rss:>16.1f}"
+            )
@@ -0,0 +1,114 @@
+import statistics
+import tempfile
+import time
+import timeit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from inventario.busca import _indice_produtos
+from inventario.instrumentacao import cronometrar
+from inventario.medicao_paginas import popular
+
+MIDDLEWARE_INSTRUMENTACAO = 'inventario.instrumentacao.ServerTimingMiddleware'
+
+
+def _configuracoes():
+    """(nome, settings) comparados: sem instrumentação, desligada e ligada."""
+    sem_instrumentacao = {
+        'MIDDLEWARE': [nome for nome in settings.MIDDLEWARE if nome != MIDDLEWARE_INSTRUMENTACAO],
+        'TEMPLATES': [
+            {**engine, 'BACKEND': 'django.template.backends.django.DjangoTemplates'} for engine in settings.TEMPLATES
+        ],
+        'SERVER_TIMING': False,
+    }
+    return (
+        ('sem instrumentação', sem_instrumentacao),
+        ('desligada', {'SERVER_TIMING': False}),
+        ('ligada', {'SERVER_TIMING': True}),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede o custo do Server-Timing (inventario.instrumentacao): tempo mediano de algumas páginas "
+        "sem a instrumentação, com ela desligada e com ela ligada. Os dados de medição são gravados "
+        "numa transação desfeita no fim."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rotas',
+            nargs='+',
+            default=['listar_produtos', 'listar_transacao', 'listar_categorias'],
+            help="Rotas sem argumentos visitadas (padrão: listar_produtos listar_transacao listar_categorias).",
+        )
+        parser.add_argument(
+            '--repeticoes',
+            type=int,
+            default=200,
+            help="Requisições por rota e configuração (padrão: 200).",
+        )
+        parser.add_argument(
+            '--rodadas',
+            type=int,
+            default=5,
+            help="As configurações se alternam em rodadas para diluir variações da máquina (padrão: 5).",
+        )
+
+    def _medir(self, sobrescritas, usuario, urls, repeticoes):
+        tempos = {url: [] for url in urls}
+        with override_settings(**sobrescritas):
+            client = Client()
+            client.force_login(usuario)
+            for url in urls:
+                client.get(url)  # aquecimento: carga dos middlewares e templates
+                for _ in range(repeticoes):
+                    inicio = time.perf_counter()
+                    client.get(url)
+                    tempos[url].append((time.perf_counter() - inicio) * 1000)
+        return tempos
+
+    def handle(self, *args, **options):
+        urls = [reverse(rota) for rota in options['rotas']]
+        repeticoes = max(1, options['repeticoes'] // options['rodadas'])
+        configuracoes = _configuracoes()
+        tempos = {nome: {url: [] for url in urls} for nome, _ in configuracoes}
+
+        setup_test_environment()
+        try:
+            with tempfile.TemporaryDirectory() as diretorio, override_settings(
+                RELATORIOS_DIR=diretorio, RELATORIOS_CACHE_DIR=f'{diretorio}/cache',
+            ), transaction.atomic():
+                usuario = popular(5)['usuario']
+                _indice_produtos.limpar()
+                for _ in range(options['rodadas']):
+                    for nome, sobrescritas in configuracoes:
+                        for url, medidas in self._medir(sobrescritas, usuario, urls, repeticoes).items():
+                            tempos[nome][url] += medidas
+                transaction.set_rollback(True)
+        finally:
+            _indice_produtos.limpar()
+            teardown_test_environment()
+
+        largura = max(len(url) for url in urls)
+        self.stdout.write(f"{'Página':<{largura}}  " + '  '.join(f"{nome:>20}" for nome, _ in configuracoes))
+        for url in urls:
+            base = statistics.median(tempos['sem instrumentação'][url])
+            colunas = []
+            for nome, _ in configuracoes:
+                mediana = statistics.median(tempos[nome][url])
+                colunas.append(f"{mediana:>9.2f} ms ({(mediana / base - 1) * 100:+5.1f}%)")
+            self.stdout.write(f"{url:<{largura}}  " + '  '.join(colunas))
+
+        # Custo fixo que fica no código com a medição desligada: uma função decorada fora de requisição medida
+        def funcao():
+            pass
+
+        chamadas = 100000
+        custo = timeit.timeit(cronometrar('grafico')(funcao), number=chamadas) - timeit.timeit(funcao, number=chamadas)
+        self.stdout.write(f"@cronometrar sem medição ativa: {custo / chamadas * 1e6:.3f} µs por chamada")
@@ -0,0 +1,54 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from inventario.estoque import registrar_entrada, registrar_saida
+from inventario.models import Produto, TipoTransacao, Transacao
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede comandos SQL e latência da saída FIFO para diferentes quantidades. "
+        "Os dados de teste são criados numa transação desfeita ao final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamanhos',
+            nargs='+',
+            type=int,
+            default=[10, 1000, 100000],
+            help="Quantidades de saída a medir (padrão: 10 1000 100000).",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'Quantidade':>12} {'Comandos SQL':>14} {'Latência (ms)':>15}")
+
+        with transaction.atomic():
+            usuario = User.objects.create(username=f"benchmark_{timezone.now().timestamp()}")
+            entrada = TipoTransacao.objects.create(nome="Benchmark", entrada=True)
+            saida = TipoTransacao.objects.create(nome="Benchmark", entrada=False)
+
+            for tamanho in options['tamanhos']:
+                produto = Produto.objects.create(nome=f"Benchmark {tamanho}")
+                transacao_entrada = Transacao.objects.create(
+                    tipo_transacao=entrada, usuario=usuario, produto=produto, quantidade=tamanho
+                )
+                registrar_entrada(produto, transacao_entrada, "BENCH", tamanho)
+
+                transacao_saida = Transacao.objects.create(
+                    tipo_transacao=saida, usuario=usuario, produto=produto, quantidade=tamanho
+                )
+                with CaptureQueriesContext(connection) as consultas:
+                    inicio = time.perf_counter()
+                    with transaction.atomic():
+                        registrar_saida(produto, transacao_saida, tamanho)
+                    duracao = (time.perf_counter() - inicio) * 1000
+
+                self.stdout.write(f"{tamanho:>12} {len(consultas):>14} {duracao:>15.1f}")
+
+            transaction.set_rollback(True)
@@ -0,0 +1,70 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventario.models import FechamentoSaldoDiario
+from inventario.saldos_diarios import (
+    fechar_dias, inicio_do_dia, primeiro_dia_alterado, primeiro_dia_com_transacao,
+)
+
+
+def _data(valor):
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise CommandError(f"Data inválida: {valor} (use AAAA-MM-DD).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Grava o saldo diário de cada produto (SaldoDiario) a partir do último dia fechado. "
+        "Transações lançadas ou alteradas com data retroativa desde a execução anterior fazem "
+        "o fechamento recomeçar no dia delas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ate',
+            type=_data,
+            help="Último dia a fechar, AAAA-MM-DD (padrão: ontem).",
+        )
+        parser.add_argument(
+            '--desde',
+            type=_data,
+            help="Refaz os saldos a partir deste dia, AAAA-MM-DD, ignorando os fechamentos anteriores.",
+        )
+
+    def handle(self, *args, **options):
+        executado_em = timezone.now()
+        ate = options['ate'] or timezone.localdate(executado_em) - timedelta(days=1)
+        ultimo = FechamentoSaldoDiario.objects.first()
+
+        if options['desde']:
+            inicio = options['desde']
+        elif ultimo is not None:
+            inicio = ultimo.dia + timedelta(days=1)
+            retroativo = primeiro_dia_alterado(ultimo.executado_em, inicio_do_dia(inicio))
+            if retroativo is not None:
+                self.stdout.write(self.style.WARNING(
+                    f"Transações retroativas desde a última execução: refazendo a partir de {retroativo:%d/%m/%Y}."
+                ))
+                inicio = retroativo
+        else:
+            inicio = primeiro_dia_com_transacao()
+
+        if inicio is None or inicio > ate:
+            self.stdout.write("Nenhum dia a fechar.")
+            return
+
+        def ao_fechar_dia(dia, gravados):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{dia:%d/%m/%Y}: {gravados} saldo(s)")
+
+        dias, gravados = fechar_dias(inicio, ate, ao_fechar_dia)
+        FechamentoSaldoDiario.objects.create(
+            dia=ate, executado_em=executado_em, dias_processados=dias, saldos_gravados=gravados,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Saldos fechados de {inicio:%d/%m/%Y} a {ate:%d/%m/%Y}: {dias} dia(s), {gravados} saldo(s) gravado(s)."
+        ))
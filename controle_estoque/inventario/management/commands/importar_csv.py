@@ -0,0 +1,43 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.importacao import IMPORTADORES, TAMANHO_BLOCO
+
+
+class Command(BaseCommand):
+    help = "Importa produtos ou movimentações de estoque de um arquivo CSV, em blocos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=sorted(IMPORTADORES))
+        parser.add_argument('arquivo', help="Caminho do arquivo CSV (UTF-8).")
+        parser.add_argument(
+            '--usuario',
+            required=True,
+            help="Usuário registrado como responsável pelos produtos e transações.",
+        )
+        parser.add_argument('--tamanho-bloco', type=int, default=TAMANHO_BLOCO)
+
+    def handle(self, *args, **options):
+        try:
+            usuario = User.objects.get(username=options['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f"Usuário '{options['usuario']}' não encontrado.")
+
+        importar = IMPORTADORES[options['tipo']]
+        with open(options['arquivo'], encoding='utf-8-sig', newline='') as arquivo:
+            resultado = importar(arquivo, usuario, tamanho_bloco=options['tamanho_bloco'])
+
+        for linha, mensagem in resultado.erros:
+            self.stdout.write(self.style.WARNING(f"Linha {linha}: {mensagem}"))
+        if resultado.total_erros > len(resultado.erros):
+            self.stdout.write(self.style.WARNING(
+                f"... e mais {resultado.total_erros - len(resultado.erros)} erro(s)."
+            ))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado.importadas} de {resultado.linhas} linha(s) importada(s) em "
+            f"{resultado.duracao:.1f}s ({resultado.linhas_por_segundo:.0f} linhas/s), "
+            f"{resultado.total_erros} erro(s)."
+        ))
+        if resultado.erro_arquivo:
+            raise CommandError(resultado.erro_arquivo)
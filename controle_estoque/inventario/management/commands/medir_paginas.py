@@ -0,0 +1,77 @@
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from inventario.busca import _indice_produtos
+from inventario.medicao_paginas import ROTAS, STATUS_ESPERADO, configuracoes, medir, popular
+
+
+class Command(BaseCommand):
+    help = (
+        "Visita todas as páginas do projeto com dois volumes de dados e mostra consultas SQL e tempo "
+        "de cada uma. Os dados de medição são gravados numa transação desfeita no fim."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escala',
+            type=int,
+            default=1,
+            help="Volume da primeira medição (padrão: 1).",
+        )
+        parser.add_argument(
+            '--fator',
+            type=int,
+            default=3,
+            help="Volume acrescentado antes da segunda medição, em múltiplos da escala (padrão: 3).",
+        )
+
+    def handle(self, *args, **options):
+        escala = options['escala']
+        setup_test_environment()
+        try:
+            with tempfile.TemporaryDirectory() as diretorio, override_settings(
+                **configuracoes(diretorio)
+            ), transaction.atomic():
+                client = Client()
+                contexto = popular(escala)
+                client.force_login(contexto['usuario'])
+                _indice_produtos.limpar()
+                antes = medir(client, contexto)
+
+                popular(escala * options['fator'])
+                _indice_produtos.limpar()
+                depois = medir(client, contexto)
+                transaction.set_rollback(True)
+        finally:
+            _indice_produtos.limpar()
+            teardown_test_environment()
+
+        largura = max(len(rota) for rota in ROTAS)
+        self.stdout.write(f"{'Rota':<{largura}}  Status  Consultas        Tempo (ms)")
+        crescimento = []
+        status_inesperado = []
+        for rota in ROTAS:
+            consultas, tempo, status = antes[rota]
+            consultas_depois, tempo_depois, status_depois = depois[rota]
+            linha = (
+                f"{rota:<{largura}}  {status:>6}  {consultas:>4} -> {consultas_depois:<4}  "
+                f"{tempo:>7.1f} -> {tempo_depois:.1f}"
+            )
+            if consultas_depois > consultas:
+                crescimento.append(rota)
+                linha = self.style.WARNING(linha)
+            esperado = STATUS_ESPERADO.get(rota, 200)
+            if status != esperado or status_depois != esperado:
+                status_inesperado.append(f"{rota} ({status}/{status_depois}, esperado {esperado})")
+                linha = self.style.ERROR(linha)
+            self.stdout.write(linha)
+
+        if status_inesperado:
+            raise CommandError(f"Status inesperado em: {', '.join(status_inesperado)}")
+        if crescimento:
+            raise CommandError(f"Consultas crescem com os dados em: {', '.join(crescimento)}")
+        self.stdout.write(self.style.SUCCESS(f"{len(ROTAS)} página(s) com consultas constantes."))
@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from inventario.estoque import contar_itens_disponiveis
+from inventario.models import Produto, SaldoEstoque
+
+
+class Command(BaseCommand):
+    help = "Reconstrói (ou apenas verifica) a tabela SaldoEstoque a partir dos itens disponíveis."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help="Apenas compara os saldos com a contagem de itens, sem alterar nada.",
+        )
+
+    def handle(self, *args, **options):
+        verificar = options['verificar']
+
+        with transaction.atomic():
+            contagem = contar_itens_disponiveis()
+            saldos = {s.produto_id: s for s in SaldoEstoque.objects.select_for_update()}
+
+            divergentes = []
+            novos = []
+            corrigidos = []
+            agora = timezone.now()
+            produtos = Produto.objects.only('id', 'ativo', 'alerta_estoque_minimo')
+            for produto in produtos.iterator():
+                esperado = contagem.get(produto.id, 0)
+                saldo = saldos.get(produto.id)
+                if saldo is None:
+                    saldo = SaldoEstoque(produto=produto, quantidade=esperado, ultima_atualizacao=agora)
+                    saldo.em_alerta = saldo.avaliar_alerta()
+                    novos.append(saldo)
+                    if esperado:
+                        divergentes.append((produto.id, 0, esperado))
+                    continue
+
+                saldo.produto = produto
+                alterado = False
+                if saldo.quantidade != esperado:
+                    divergentes.append((produto.id, saldo.quantidade, esperado))
+                    saldo.quantidade = esperado
+                    saldo.ultima_atualizacao = agora
+                    alterado = True
+                em_alerta = saldo.avaliar_alerta()
+                if saldo.em_alerta != em_alerta:
+                    saldo.em_alerta = em_alerta
+                    alterado = True
+                if alterado:
+                    corrigidos.append(saldo)
+
+            for produto_id, atual, esperado in divergentes:
+                self.stdout.write(
+                    self.style.WARNING(f"Produto {produto_id}: saldo {atual}, itens disponíveis {esperado}")
+                )
+
+            if verificar:
+                if divergentes:
+                    raise CommandError(f"{len(divergentes)} saldo(s) divergente(s) encontrados.")
+                self.stdout.write(self.style.SUCCESS("Todos os saldos conferem com os itens disponíveis."))
+                return
+
+            SaldoEstoque.objects.bulk_create(novos, batch_size=1000)
+            SaldoEstoque.objects.bulk_update(
+                corrigidos, ['quantidade', 'ultima_atualizacao', 'em_alerta'], batch_size=1000
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Saldos reconstruídos: {len(novos)} criado(s), {len(corrigidos)} corrigido(s)."
+        ))
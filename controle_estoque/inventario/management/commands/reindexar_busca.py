@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from inventario.busca import indexar_produtos, sincronizar_indice
+from inventario.models import Produto
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o texto de busca (BuscaProduto) de todos os produtos, ou só dos pendentes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pendentes',
+            action='store_true',
+            help="Indexa apenas os produtos sem texto de busca ou alterados depois da última indexação.",
+        )
+        parser.add_argument(
+            '--tamanho-bloco',
+            type=int,
+            default=1000,
+            help="Produtos indexados por vez (padrão: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        tamanho_bloco = options['tamanho_bloco']
+        if options['pendentes']:
+            total = sincronizar_indice(tamanho_bloco)
+        else:
+            total = 0
+            ultimo_id = 0
+            ids = Produto.objects.order_by('id').values_list('id', flat=True)
+            while True:
+                bloco = list(ids.filter(id__gt=ultimo_id)[:tamanho_bloco])
+                if not bloco:
+                    break
+                total += indexar_produtos(bloco)
+                ultimo_id = bloco[-1]
+        self.stdout.write(self.style.SUCCESS(f"{total} produto(s) indexado(s)."))
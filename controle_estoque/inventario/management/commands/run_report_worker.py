@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from inventario import metricas
+from inventario.fila_relatorios import executar, liberar_abandonadas, remover_expiradas, reservar_proxima
+from inventario.models import TarefaRelatorio
+
+
+class Command(BaseCommand):
+    help = (
+        "Processa a fila de relatórios em PDF (TarefaRelatorio) e apaga os arquivos vencidos. "
+        "Pode haver mais de um worker rodando ao mesmo tempo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=2.0,
+            help="Segundos de espera quando a fila está vazia (padrão: 2).",
+        )
+        parser.add_argument(
+            '--uma-vez',
+            action='store_true',
+            help="Processa as tarefas pendentes e encerra, em vez de ficar aguardando.",
+        )
+
+    def _manutencao(self):
+        devolvidas = liberar_abandonadas()
+        if devolvidas:
+            self.stdout.write(f"{devolvidas} tarefa(s) abandonada(s) devolvida(s) à fila.")
+        removidas = remover_expiradas()
+        if removidas:
+            self.stdout.write(f"{removidas} relatório(s) vencido(s) removido(s).")
+
+    def handle(self, *args, **options):
+        intervalo = options['intervalo']
+        self.stdout.write("Worker de relatórios iniciado.")
+        self._manutencao()
+        ultima_manutencao = time.monotonic()
+
+        try:
+            while True:
+                # O processo é longo: descarta conexões que o banco já fechou
+                close_old_connections()
+
+                if time.monotonic() - ultima_manutencao > 60:
+                    self._manutencao()
+                    ultima_manutencao = time.monotonic()
+
+                tarefa = reservar_proxima()
+                if tarefa is None:
+                    if options['uma_vez']:
+                        break
+                    time.sleep(intervalo)
+                    continue
+
+                inicio = time.perf_counter()
+                tarefa = executar(tarefa)
+                duracao = time.perf_counter() - inicio
+                if tarefa.status == TarefaRelatorio.CONCLUIDA:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Tarefa {tarefa.pk} ({tarefa.tipo}) concluída em {duracao:.1f}s."
+                    ))
+                else:
+                    self.stderr.write(f"Tarefa {tarefa.pk} ({tarefa.tipo}) falhou: {tarefa.mensagem_erro}")
+                # Duração do PDF para /metrics (com METRICAS ligado)
+                metricas.gravar(forcar=True)
+        except KeyboardInterrupt:
+            self.stdout.write("Worker de relatórios encerrado.")
+        finally:
+            metricas.gravar(forcar=True)
@@ -0,0 +1,72 @@
+import time
+from collections import Counter
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.dados_sinteticos import TAMANHO_BLOCO, GeradorDados
+
+
+def _data(valor):
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise CommandError(f"Data inválida: {valor} (use AAAA-MM-DD).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera dados sintéticos em volume (produtos, histórico de itens e transações, contratos com "
+        "renovações e pedidos) para benchmarks. A mesma semente e a mesma data final geram os mesmos "
+        "dados num banco vazio. Exemplo: --produtos 100000 --itens 10000000 --clientes 50000."
+    )
+
+    def add_arguments(self, parser):
+        volumes = (
+            ('usuarios', 10, "Usuários que aparecem como responsáveis"),
+            ('categorias', 50, "Categorias de produto"),
+            ('produtos', 1000, "Produtos"),
+            ('itens', 10000, "Entradas (Transacao + Item); cerca de 30%% têm também uma saída"),
+            ('clientes', 500, "Contratos (Cliente), com até 3 renovações cada"),
+            ('pedidos', 1000, "Clientes de pedido (ClientePedido)"),
+        )
+        for nome, padrao, descricao in volumes:
+            parser.add_argument(f'--{nome}', type=int, default=padrao, help=f"{descricao} (padrão: {padrao}).")
+        parser.add_argument('--semente', type=int, default=42, help="Semente dos dados (padrão: 42).")
+        parser.add_argument(
+            '--ate',
+            type=_data,
+            help="Último dia das datas geradas, AAAA-MM-DD (padrão: hoje). Fixe para comparar execuções.",
+        )
+        parser.add_argument('--dias', type=int, default=365, help="Dias cobertos pelas datas (padrão: 365).")
+        parser.add_argument(
+            '--bloco',
+            type=int,
+            default=TAMANHO_BLOCO,
+            help=f"Linhas por bulk_create (padrão: {TAMANHO_BLOCO}).",
+        )
+
+    def handle(self, *args, **options):
+        totais = Counter()
+
+        def ao_gravar(descricao, quantidade):
+            totais[descricao] += quantidade
+            if options['verbosity'] > 1 and quantidade:
+                self.stdout.write(f"{descricao}: {totais[descricao]}")
+
+        gerador = GeradorDados(
+            semente=options['semente'], ate=options['ate'], dias=options['dias'],
+            tamanho_bloco=options['bloco'], ao_gravar=ao_gravar,
+        )
+        inicio = time.perf_counter()
+        gerador.gerar(**{
+            nome: options[nome] for nome in ('usuarios', 'categorias', 'produtos', 'itens', 'clientes', 'pedidos')
+        })
+        duracao = time.perf_counter() - inicio
+
+        for descricao, quantidade in totais.items():
+            self.stdout.write(f"{descricao}: {quantidade}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{sum(totais.values())} linha(s) gravada(s) em {duracao:.1f}s (semente {options['semente']}, "
+            f"até {gerador.ate:%d/%m/%Y})."
+        ))
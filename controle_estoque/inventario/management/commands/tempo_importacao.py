@@ -0,0 +1,104 @@
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Linha gerada por "python -X importtime": "import time: self [us] | cumulative | modulo"
+LINHA_IMPORTTIME = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+# Carrega o Django e importa o URLconf (e, por ele, todas as views), como um worker faz
+SCRIPT_CARGA = (
+    "import django; django.setup(); "
+    "from django.conf import settings; from importlib import import_module; "
+    "import_module(settings.ROOT_URLCONF)"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede o tempo de importação de cada módulo ao carregar o projeto "
+        "(django.setup() + URLconf) num processo novo, usando python -X importtime."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limite',
+            type=int,
+            default=25,
+            help="Quantidade de módulos exibidos, ordenados pelo tempo acumulado (padrão: 25).",
+        )
+        parser.add_argument(
+            '--projeto',
+            action='store_true',
+            help="Exibe apenas os módulos do próprio projeto.",
+        )
+        parser.add_argument(
+            '--maximo-ms',
+            type=float,
+            help="Falha se o tempo total de importação passar deste valor (em ms).",
+        )
+        parser.add_argument(
+            '--proibir',
+            nargs='+',
+            default=[],
+            metavar='MODULO',
+            help="Falha se algum destes módulos for importado na carga (ex.: matplotlib xhtml2pdf).",
+        )
+
+    def _medir(self):
+        # O subprocesso herda o ambiente, inclusive o DJANGO_SETTINGS_MODULE em uso
+        processo = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', SCRIPT_CARGA],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+        )
+        if processo.returncode != 0:
+            raise CommandError(f"Falha ao carregar o projeto:\n{processo.stderr[-2000:]}")
+
+        modulos = []
+        for linha in processo.stderr.splitlines():
+            encontrado = LINHA_IMPORTTIME.match(linha)
+            if encontrado:
+                proprio, acumulado, recuo, nome = encontrado.groups()
+                modulos.append((nome, int(proprio), int(acumulado), len(recuo) // 2))
+        return modulos
+
+    def _do_projeto(self, nome):
+        raiz = nome.split('.')[0]
+        return os.path.isdir(os.path.join(settings.BASE_DIR, raiz))
+
+    def handle(self, *args, **options):
+        modulos = self._medir()
+        if not modulos:
+            raise CommandError("Nenhuma medição retornada por python -X importtime.")
+
+        # O total é a soma dos acumulados de nível superior (recuo zero)
+        total_ms = sum(acumulado for _, _, acumulado, nivel in modulos if nivel == 0) / 1000
+
+        exibidos = modulos
+        if options['projeto']:
+            exibidos = [modulo for modulo in modulos if self._do_projeto(modulo[0])]
+        exibidos = sorted(exibidos, key=lambda modulo: -modulo[2])[:options['limite']]
+
+        self.stdout.write(f"{'Acumulado (ms)':>15} {'Próprio (ms)':>13}  Módulo")
+        for nome, proprio, acumulado, _ in exibidos:
+            self.stdout.write(f"{acumulado / 1000:>15.1f} {proprio / 1000:>13.1f}  {nome}")
+        self.stdout.write(f"\n{len(modulos)} módulos importados, total {total_ms:.1f} ms")
+
+        importados = {nome for nome, _, _, _ in modulos}
+        proibidos = sorted(
+            modulo for modulo in options['proibir']
+            if any(nome == modulo or nome.startswith(modulo + '.') for nome in importados)
+        )
+        if proibidos:
+            raise CommandError(f"Módulos carregados na inicialização: {', '.join(proibidos)}")
+
+        maximo = options['maximo_ms']
+        if maximo is not None and total_ms > maximo:
+            raise CommandError(f"Tempo de importação {total_ms:.1f} ms acima do limite de {maximo:.1f} ms")
+
+        self.stdout.write(self.style.SUCCESS("Medição concluída."))
@@ -0,0 +1,134 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from contratos.models import Cliente
+from inventario.carga import PASSOS, comparar, executar
+from inventario.models import ATIVO, Produto, TipoTransacao
+
+# Ids sorteados nos formulários de transação e de renovação
+LIMITE_IDS = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Teste de carga por HTTP contra um servidor já rodando (runserver ou gunicorn): sessões "
+        "simultâneas fazem login e percorrem listagens, lançamento de transação, renovação de contratos "
+        "e as exportações em PDF, Excel e CSV. Gera JSON com vazão, percentis de latência e taxa de erro "
+        "por requisição. Os ids usados nos formulários vêm do banco configurado, que deve ser o do servidor."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='http://127.0.0.1:8000', help="Endereço do servidor (padrão: http://127.0.0.1:8000).",
+        )
+        parser.add_argument('--usuario', required=True, help="Usuário (staff) das sessões.")
+        parser.add_argument('--senha', help="Senha do usuário (padrão: variável de ambiente CARGA_SENHA).")
+        parser.add_argument('--sessoes', type=int, default=10, help="Sessões simultâneas (padrão: 10).")
+        parser.add_argument('--duracao', type=float, default=60.0, help="Duração em segundos (padrão: 60).")
+        parser.add_argument(
+            '--iteracoes',
+            type=int,
+            help="Voltas pelos passos em cada sessão; com ela o teste para no que acabar primeiro.",
+        )
+        parser.add_argument(
+            '--passos',
+            nargs='+',
+            choices=list(PASSOS),
+            help="Passos de cada volta, na ordem (padrão: todos).",
+        )
+        parser.add_argument(
+            '--somente-leitura',
+            action='store_true',
+            help="Não envia os POSTs que gravam (transação e renovação), para rodar contra dados reais.",
+        )
+        parser.add_argument('--pausa', type=float, default=0.0, help="Segundos entre requisições de uma sessão.")
+        parser.add_argument(
+            '--rampa',
+            type=float,
+            default=0.0,
+            help="Segundos para iniciar todas as sessões (padrão: todas de uma vez).",
+        )
+        parser.add_argument('--timeout', type=float, default=60.0, help="Timeout de cada requisição em segundos.")
+        parser.add_argument('--semente', type=int, default=42, help="Semente dos sorteios (padrão: 42).")
+        parser.add_argument('--saida', help="Arquivo onde gravar o JSON (padrão: saída padrão).")
+        parser.add_argument(
+            '--comparar',
+            metavar='ARQUIVO',
+            help="JSON de uma execução anterior; mostra a comparação de vazão, p95 e erros.",
+        )
+
+    def _contexto(self, options, escrita, passos):
+        senha = options['senha'] or os.environ.get('CARGA_SENHA')
+        if not senha:
+            raise CommandError("Informe a senha com --senha ou na variável de ambiente CARGA_SENHA.")
+        contexto = {
+            'login': {'username': options['usuario'], 'password': senha},
+            'produto_ids': list(
+                Produto.objects.filter(ativo=ATIVO).order_by('id').values_list('id', flat=True)[:LIMITE_IDS]
+            ),
+            'cliente_ids': list(
+                Cliente.objects.filter(ativo=True).order_by('id').values_list('id', flat=True)[:LIMITE_IDS]
+            ),
+            'tipo_entrada_id': TipoTransacao.objects.filter(entrada=True).values_list('id', flat=True).first(),
+        }
+        if 'criar_transacao' in passos and escrita and not (contexto['produto_ids'] and contexto['tipo_entrada_id']):
+            raise CommandError(
+                "O passo criar_transacao precisa de um produto ativo e de um tipo de transação de entrada."
+            )
+        if 'renovar_contratos' in passos and not contexto['cliente_ids']:
+            raise CommandError("O passo renovar_contratos precisa de um cliente ativo.")
+        return contexto
+
+    def handle(self, *args, **options):
+        if options['sessoes'] < 1:
+            raise CommandError("--sessoes deve ser pelo menos 1.")
+        if not options['duracao'] and options['iteracoes'] is None:
+            raise CommandError("Informe --duracao maior que zero ou --iteracoes.")
+        anterior = None
+        if options['comparar']:
+            try:
+                with open(options['comparar']) as arquivo:
+                    anterior = json.load(arquivo)
+            except (OSError, ValueError) as erro:
+                raise CommandError(f"Não foi possível ler {options['comparar']}: {erro}")
+
+        passos = options['passos'] or list(PASSOS)
+        escrita = not options['somente_leitura']
+        relatorio = executar(
+            options['url'], self._contexto(options, escrita, passos),
+            sessoes=options['sessoes'], duracao=options['duracao'], iteracoes=options['iteracoes'],
+            passos=passos, escrita=escrita, pausa=options['pausa'], rampa=options['rampa'],
+            timeout=options['timeout'], semente=options['semente'],
+        )
+
+        conteudo = json.dumps(relatorio, indent=2, ensure_ascii=False)
+        if options['saida']:
+            with open(options['saida'], 'w') as arquivo:
+                arquivo.write(conteudo + '\n')
+        else:
+            self.stdout.write(conteudo)
+
+        total = relatorio['total']
+        resumo = (
+            f"{total['requisicoes']} requisição(ões) em {relatorio['duracao_s']:.1f}s: "
+            f"{total['vazao_rps']} req/s, p95 {total['latencia_ms'].get('p95', '-')} ms, {total['erros']} erro(s)."
+        )
+        self.stderr.write(resumo, style_func=self.style.ERROR if total['erros'] else self.style.SUCCESS)
+
+        if anterior is not None:
+            def valor(numero):
+                return '-' if numero is None else f'{numero:g}'
+
+            linhas = comparar(anterior, relatorio)
+            largura = max(len(linha[0]) for linha in linhas)
+            self.stderr.write(
+                f"{'Requisição':<{largura}}  {'req/s antes':>12} {'agora':>10}  {'p95 antes':>10} {'agora':>10}  "
+                f"{'erro antes':>10} {'agora':>8}"
+            )
+            for nome, rps_antes, rps, p95_antes, p95, erro_antes, erro in linhas:
+                self.stderr.write(
+                    f"{nome:<{largura}}  {valor(rps_antes):>12} {valor(rps):>10}  {valor(p95_antes):>10} "
+                    f"{valor(p95):>10}  {valor(erro_antes):>10} {valor(erro):>8}"
+                )
@@ -0,0 +1,300 @@
+"""
+Consultas SQL e tempo de cada página, para achar views cujo número de
+consultas cresce com os dados (N+1 em listagens, templates e PDFs).
+
+`popular(escala)` grava um conjunto de dados das três apps; chamado de novo,
+soma mais linhas às mesmas tabelas. `medir(client, contexto)` visita cada
+rota de ROTAS com o client de teste e devolve {rota: (consultas, ms, status)}.
+As rotas que só aceitam POST e alteram ou apagam um registro recebem um
+registro novo a cada visita, criado fora da contagem de consultas.
+Usado por `manage.py medir_paginas` e por ConsultasPorPaginaTests, com as
+settings de `configuracoes(diretorio)`.
+"""
+import itertools
+import os
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from contratos.models import Cliente, HistoricoRenovacao, Sistema, Tecnico
+from pedido.models import CategoriaPedido, ClientePedido
+
+from .busca import indexar_produtos
+from .estoque import registrar_entrada, registrar_saida
+from .models import Categoria, Produto, TarefaRelatorio, TipoTransacao, Transacao
+
+# Linhas criadas por unidade de escala. Ficam abaixo do tamanho das páginas
+# (10 a 20 linhas): com escala 1 as listagens paginadas mostram menos linhas
+# do que com escala maior, e uma consulta por linha aparece na comparação.
+PRODUTOS = 4
+TRANSACOES_POR_PRODUTO = 2
+CLIENTES = 4
+PEDIDOS = 6
+
+# Rotas que não são visitadas, com o motivo
+IGNORADAS = {
+    'logout': "encerra a sessão usada nas outras medições",
+}
+
+# Status de cada rota na medição, quando não é 200
+STATUS_ESPERADO = {
+    'root_redirect': 302,
+    'login': 302,  # já autenticado
+    'password_reset_confirm': 302,  # troca o token da URL pela sessão
+    'mudar_status_admin': 302,
+    'mudar_status_ativo': 302,
+    'excluir_usuario': 302,
+    'arquivar_transacao': 302,
+    'download_relatorio': 302,  # a tarefa de popular() terminou com erro
+    'toggle_bloqueado_cliente': 302,
+    'toggle_ativo_cliente': 302,
+    'excluir_historico_renovacao': 302,
+}
+
+_sequencia = itertools.count()
+
+
+@transaction.atomic
+def popular(escala=1):
+    """Grava `escala` vezes o conjunto base. Retorna o contexto usado pelas rotas."""
+    n = next(_sequencia)
+    agora = timezone.now()
+    usuario = User.objects.filter(username='medicao').first()
+    if usuario is None:
+        usuario = User.objects.create_superuser('medicao', 'medicao@example.com', 'senha-medicao-123')
+    outro = User.objects.create_user(f'medicao-{n}', f'medicao-{n}@example.com')
+
+    entrada, _ = TipoTransacao.objects.get_or_create(nome='Compra', entrada=True)
+    saida, _ = TipoTransacao.objects.get_or_create(nome='Venda', entrada=False)
+    categoria = Categoria.objects.create(nome=f'Categoria {n}')
+    sistema = Sistema.objects.create(nome=f'Sistema {n}')
+    tecnico = Tecnico.objects.create(nome=f'Técnico {n}')
+    categoria_pedido = CategoriaPedido.objects.create(nome=f'Categoria de pedido {n}')
+
+    produtos = []
+    for i in range(PRODUTOS * escala):
+        produto = Produto.objects.create(
+            nome=f'Produto {n}-{i}', categoria=categoria, usuario_responsavel=usuario,
+            alerta_estoque_minimo=5 if i % 4 == 0 else None,
+        )
+        for j in range(TRANSACOES_POR_PRODUTO):
+            transacao = Transacao.objects.create(
+                tipo_transacao=entrada, usuario=usuario, produto=produto, quantidade=3,
+                data=agora - timedelta(hours=j),
+            )
+            registrar_entrada(produto, transacao, f'L{n}-{i}-{j}', 3)
+        transacao = Transacao.objects.create(tipo_transacao=saida, usuario=outro, produto=produto, quantidade=4)
+        registrar_saida(produto, transacao, 4)
+        produtos.append(produto)
+    indexar_produtos([produto.pk for produto in produtos])
+
+    clientes = [
+        Cliente.objects.create(
+            empresa=f'Empresa {n}-{i}', cnpj=f'{n:04d}{i:010d}', sistema=sistema, tecnico=tecnico,
+            validade=timezone.localdate() + timedelta(days=i - 10), tipo_cobranca=Cliente.MENSAL,
+            valor_mensal=100, meses_contrato=12,
+        )
+        for i in range(CLIENTES * escala)
+    ]
+    HistoricoRenovacao.objects.bulk_create([
+        HistoricoRenovacao(
+            cliente=cliente, validade_anterior=cliente.validade, nova_validade=cliente.validade,
+            porcentagem_reajuste=5, usuario_responsavel=usuario,
+        )
+        for cliente in clientes
+    ])
+    for i in range(PEDIDOS * escala):
+        ClientePedido.objects.create(
+            nome=f'Pedido {n}-{i}', cnpj=f'{n:04d}{i:010d}', categoria=categoria_pedido, tecnico=tecnico,
+            usuario_criador=usuario if i % 2 else outro, valor_pedido=10,
+        )
+    TarefaRelatorio.objects.create(tipo='transacoes', usuario=usuario, status=TarefaRelatorio.ERRO)
+
+    return {
+        'usuario': usuario,
+        'produto': produtos[0],
+        'categoria': categoria,
+        'transacao': Transacao.objects.filter(produto=produtos[0]).first(),
+        'lote': f'L{n}-0-0',
+        'tarefa': TarefaRelatorio.objects.filter(usuario=usuario).first(),
+        'sistema': sistema,
+        'tecnico': tecnico,
+        'cliente': clientes[0],
+        'historico': clientes[0].historico_renovacoes.first(),
+        'categoria_pedido': categoria_pedido,
+        'pedido': ClientePedido.objects.filter(categoria=categoria_pedido).first(),
+    }
+
+
+def _periodo():
+    hoje = timezone.localdate()
+    return {'data_inicio': (hoje - timedelta(days=7)).isoformat(), 'data_fim': hoje.isoformat()}
+
+
+def configuracoes(diretorio):
+    """Settings da medição: relatórios em `diretorio`, sempre síncronos, e /metrics ligado e sem cache."""
+    return {
+        'RELATORIOS_DIR': diretorio,
+        'RELATORIOS_CACHE_DIR': os.path.join(diretorio, 'cache'),
+        'RELATORIO_LIMITE_SINCRONO': 10 ** 6,
+        'METRICAS': True,
+        'METRICAS_DIR': os.path.join(diretorio, 'metricas'),
+        'METRICAS_TOKEN': '',
+        'METRICAS_CACHE_SEGUNDOS': 0,
+    }
+
+
+def _usuario_novo(ctx):
+    n = next(_sequencia)
+    return [User.objects.create_user(f'medicao-alvo-{n}', f'medicao-alvo-{n}@example.com').pk]
+
+
+def _categoria_vazia(ctx):
+    return [Categoria.objects.create(nome=f'Categoria vazia {next(_sequencia)}').pk]
+
+
+def _cliente_novo(ctx):
+    cliente = ctx['cliente']
+    return [Cliente.objects.create(
+        empresa=f'Empresa alvo {next(_sequencia)}', cnpj=cliente.cnpj, sistema=cliente.sistema,
+        validade=cliente.validade,
+    ).pk]
+
+
+def _historico_novo(ctx):
+    cliente = ctx['cliente']
+    return [HistoricoRenovacao.objects.create(
+        cliente=cliente, validade_anterior=cliente.validade, nova_validade=cliente.validade,
+        porcentagem_reajuste=0, usuario_responsavel=ctx['usuario'],
+    ).pk]
+
+
+def _redefinir_senha(ctx):
+    usuario = ctx['usuario']
+    return {
+        'uidb64': urlsafe_base64_encode(force_bytes(usuario.pk)),
+        'token': default_token_generator.make_token(usuario),
+    }
+
+
+# rota: (método, argumentos da URL, dados); argumentos e dados recebem o contexto de popular()
+# e são montados antes da contagem de consultas
+ROTAS = {
+    'root_redirect': ('get', None, None),
+    'login': ('get', None, None),
+    'cadastro': ('get', None, None),
+    'dashboard': ('get', None, None),
+    'password_reset': ('get', None, None),
+    'password_reset_done': ('get', None, None),
+    'password_reset_confirm': ('get', _redefinir_senha, None),
+    'password_reset_complete': ('get', None, None),
+    'gerenciamento_usuario': ('get', None, None),
+    'mudar_status_admin': ('post', _usuario_novo, None),
+    'mudar_status_ativo': ('post', _usuario_novo, None),
+    'excluir_usuario': ('post', _usuario_novo, None),
+    'tempos_por_view': ('get', None, None),
+    'metricas_prometheus': ('get', None, None),
+    'consultas_lentas': ('get', None, None),
+
+    'listar_produtos': ('get', None, None),
+    'criar_produto': ('get', None, None),
+    'editar_produto': ('get', lambda ctx: [ctx['produto'].pk], None),
+    'excluir_produto': ('get', lambda ctx: [ctx['produto'].pk], None),
+    'alertas_estoque': ('get', None, None),
+    'alertas_estoque_json': ('get', None, None),
+    'autocompletar_produtos': ('get', None, lambda ctx: {'q': 'produto'}),
+    'rastrear_lote': ('get', None, lambda ctx: {'lote': ctx['lote']}),
+    'rastrear_lote_json': ('get', None, lambda ctx: {'lote': ctx['lote']}),
+    'listar_categorias': ('get', None, None),
+    'criar_categoria': ('get', None, None),
+    'editar_categoria': ('get', lambda ctx: [ctx['categoria'].pk], None),
+    'excluir_categoria': ('get', _categoria_vazia, None),
+    'listar_transacao': ('get', None, None),
+    'exportar_transacoes': ('get', lambda ctx: ['csv'], None),
+    'criar_transacao': ('get', None, None),
+    'arquivar_transacao': ('post', lambda ctx: [ctx['transacao'].pk], None),
+    'importar_csv': ('get', None, None),
+    'relatorio_transacoes': ('post', None, lambda ctx: _periodo()),
+    'listar_relatorios': ('get', None, None),
+    'status_relatorio': ('get', lambda ctx: [ctx['tarefa'].pk], None),
+    'status_relatorio_json': ('get', lambda ctx: [ctx['tarefa'].pk], None),
+    'download_relatorio': ('get', lambda ctx: [ctx['tarefa'].pk], None),
+
+    'listar_sistemas': ('get', None, None),
+    'criar_sistema': ('get', None, None),
+    'editar_sistema': ('get', lambda ctx: [ctx['sistema'].pk], None),
+    'excluir_sistema': ('get', lambda ctx: [ctx['sistema'].pk], None),
+    'listar_tecnicos': ('get', None, None),
+    'criar_tecnico': ('get', None, None),
+    'editar_tecnico': ('get', lambda ctx: [ctx['tecnico'].pk], None),
+    'excluir_tecnico': ('get', lambda ctx: [ctx['tecnico'].pk], None),
+    'listar_clientes': ('get', None, None),
+    'criar_cliente': ('get', None, None),
+    'editar_cliente': ('get', lambda ctx: [ctx['cliente'].pk], None),
+    'excluir_cliente': ('get', lambda ctx: [ctx['cliente'].pk], None),
+    'toggle_bloqueado_cliente': ('post', _cliente_novo, None),
+    'toggle_ativo_cliente': ('post', _cliente_novo, None),
+    'relatorio_contratos': ('post', None, lambda ctx: _periodo()),
+    'renovacao_list': ('get', None, None),
+    'renovar_contratos': ('post', None, lambda ctx: {'cliente_ids': [ctx['cliente'].pk]}),
+    'excluir_historico_renovacao': ('post', _historico_novo, None),
+    'gerar_pdf_renovacao': ('get', None, None),
+
+    'pedido:listar_pedidos': ('get', None, None),
+    'pedido:listar_categorias_pedido': ('get', None, None),
+    'pedido:criar_categoria_pedido': ('get', None, None),
+    'pedido:editar_categoria_pedido': ('get', lambda ctx: [ctx['categoria_pedido'].pk], None),
+    'pedido:excluir_categoria_pedido': ('get', lambda ctx: [ctx['categoria_pedido'].pk], None),
+    'pedido:listar_clientes_pedido': ('get', None, None),
+    'pedido:criar_cliente_pedido': ('get', None, None),
+    'pedido:editar_cliente_pedido': ('get', lambda ctx: [ctx['pedido'].pk], None),
+    'pedido:excluir_cliente_pedido': ('get', lambda ctx: [ctx['pedido'].pk], None),
+    'pedido:gerar_pdf_pedidos': ('get', None, None),
+    'pedido:gerar_excel_pedidos': ('get', None, None),
+}
+
+
+def rotas_do_projeto():
+    """Nomes de todas as rotas do projeto (com namespace), fora o admin."""
+    nomes = set()
+
+    def percorrer(padroes, prefixo):
+        for padrao in padroes:
+            if isinstance(padrao, URLResolver):
+                if padrao.app_name == 'admin':
+                    continue
+                namespace = f'{prefixo}{padrao.namespace}:' if padrao.namespace else prefixo
+                percorrer(padrao.url_patterns, namespace)
+            elif isinstance(padrao, URLPattern) and padrao.name:
+                nomes.add(prefixo + padrao.name)
+
+    percorrer(get_resolver().url_patterns, '')
+    return nomes
+
+
+def medir(client, contexto, rotas=None):
+    """Visita as rotas e devolve {rota: (consultas, milissegundos, status)}."""
+    resultado = {}
+    for nome in rotas or ROTAS:
+        metodo, argumentos, dados = ROTAS[nome]
+        if callable(argumentos):
+            argumentos = argumentos(contexto)
+        url = reverse(nome, **({'kwargs': argumentos} if isinstance(argumentos, dict) else {'args': argumentos}))
+        dados = dados(contexto) if dados else None
+
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            resposta = getattr(client, metodo)(url, dados)
+            if resposta.streaming:
+                b''.join(resposta.streaming_content)
+            milissegundos = (time.perf_counter() - inicio) * 1000
+        resultado[nome] = (len(consultas), milissegundos, resposta.status_code)
+    return resultado
@@ -0,0 +1,290 @@
+"""
+Métricas no formato texto do Prometheus, servidas em /metrics.
+
+Cada processo (workers do gunicorn, run_report_worker) acumula contadores e
+histogramas na memória e grava de tempos em tempos um arquivo <pid>.json em
+settings.METRICAS_DIR, com substituição atômica. A view soma os arquivos de
+todos os processos, de modo que a raspagem mostra o total do servidor seja
+qual for o worker que a atendeu. Os arquivos de processos encerrados
+continuam somando (os contadores não voltam para trás quando um worker é
+reciclado); o diretório deve ser esvaziado ao reiniciar o serviço.
+
+Os indicadores de negócio (contratos ativos e vencidos, produtos em alerta,
+tamanho do cache de relatórios) são calculados na raspagem, com poucas
+consultas agregadas, e guardados no cache do Django por
+settings.METRICAS_CACHE_SEGUNDOS.
+"""
+import atexit
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.models import Count, Q
+
+from contratos.models import Cliente
+
+from . import cache_relatorios
+from .instrumentacao import medicao_atual, medir_requisicao
+from .models import SaldoEstoque
+
+# Intervalo mínimo entre duas gravações do arquivo do processo
+INTERVALO_GRAVACAO = 1.0
+CHAVE_CACHE_INDICADORES = 'metricas:indicadores'
+
+_lock = threading.Lock()
+_metricas = {}
+_ultima_gravacao = 0.0
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_rotulos(nomes, valores, extra=None):
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.valores = {}
+        _metricas[nome] = self
+
+    def _chave(self, rotulos):
+        return tuple(str(rotulos[nome]) for nome in self.rotulos)
+
+
+class Contador(_Metrica):
+    tipo = 'counter'
+
+    def inc(self, valor=1, **rotulos):
+        chave = self._chave(rotulos)
+        with _lock:
+            self.valores[chave] = self.valores.get(chave, 0) + valor
+
+    def _copiar(self, valor):
+        return valor
+
+    def _somar(self, acumulado, valor):
+        return (acumulado or 0) + valor
+
+    def _linhas(self, valores):
+        for chave, valor in sorted(valores.items()):
+            yield f'{self.nome}{_formatar_rotulos(self.rotulos, chave)} {_numero(valor)}'
+
+
+class Histograma(_Metrica):
+    """Contagem por faixa (não acumulada), seguida da soma dos valores observados."""
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, limites, rotulos=()):
+        super().__init__(nome, ajuda, rotulos)
+        self.limites = tuple(limites)
+
+    def observar(self, valor, **rotulos):
+        chave = self._chave(rotulos)
+        faixa = bisect.bisect_left(self.limites, valor)
+        with _lock:
+            estado = self.valores.get(chave)
+            if estado is None:
+                estado = self.valores[chave] = [0] * (len(self.limites) + 1) + [0.0]
+            estado[faixa] += 1
+            estado[-1] += valor
+
+    @contextmanager
+    def medir(self, **rotulos):
+        """Observa a duração do bloco, em segundos."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **rotulos)
+
+    def _copiar(self, valor):
+        return list(valor)
+
+    def _somar(self, acumulado, valor):
+        if acumulado is None:
+            return list(valor)
+        return [a + b for a, b in zip(acumulado, valor)]
+
+    def _linhas(self, valores):
+        for chave, estado in sorted(valores.items()):
+            acumulado = 0
+            for limite, quantidade in zip(self.limites + (float('inf'),), estado[:-1]):
+                acumulado += quantidade
+                rotulos = _formatar_rotulos(self.rotulos, chave, f'le="{_numero(float(limite))}"')
+                yield f'{self.nome}_bucket{rotulos} {acumulado}'
+            rotulos = _formatar_rotulos(self.rotulos, chave)
+            yield f'{self.nome}_sum{rotulos} {_numero(estado[-1])}'
+            yield f'{self.nome}_count{rotulos} {acumulado}'
+
+
+REQUISICOES = Contador(
+    'http_requisicoes_total', "Requisições atendidas, por rota, método e status.", ('view', 'metodo', 'status'),
+)
+DURACAO_REQUISICAO = Histograma(
+    'http_requisicao_segundos', "Duração das requisições, por rota.",
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10), ('view',),
+)
+CONSULTAS_REQUISICAO = Histograma(
+    'http_requisicao_consultas_sql', "Consultas SQL por requisição, por rota.",
+    (1, 2, 5, 10, 20, 50, 100, 200, 500), ('view',),
+)
+DURACAO_PDF = Histograma(
+    'pdf_renderizacao_segundos', "Duração da geração de PDFs (gerar_pdf), por template.",
+    (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60), ('template',),
+)
+
+
+def _caminho_processo():
+    return os.path.join(settings.METRICAS_DIR, f'{os.getpid()}.json')
+
+
+def gravar(forcar=False):
+    """Grava o arquivo deste processo, no máximo a cada INTERVALO_GRAVACAO segundos."""
+    global _ultima_gravacao
+    if not settings.METRICAS:
+        return
+    agora = time.monotonic()
+    if not forcar and agora - _ultima_gravacao < INTERVALO_GRAVACAO:
+        return
+    _ultima_gravacao = agora
+
+    with _lock:
+        conteudo = {
+            nome: [[list(chave), metrica._copiar(valor)] for chave, valor in metrica.valores.items()]
+            for nome, metrica in _metricas.items()
+        }
+    os.makedirs(settings.METRICAS_DIR, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=settings.METRICAS_DIR, prefix='.tmp-')
+    with os.fdopen(descritor, 'w') as arquivo:
+        json.dump(conteudo, arquivo)
+    os.replace(temporario, _caminho_processo())
+
+
+def limpar():
+    """Zera os valores deste processo (o arquivo gravado só muda na próxima gravação)."""
+    with _lock:
+        for metrica in _metricas.values():
+            metrica.valores.clear()
+
+
+def _somar_processos():
+    """{nome: {rótulos: valor}} somando os arquivos de todos os processos."""
+    total = {nome: {} for nome in _metricas}
+    try:
+        arquivos = [
+            item.path for item in os.scandir(settings.METRICAS_DIR)
+            if item.name.endswith('.json') and not item.name.startswith('.')
+        ]
+    except FileNotFoundError:
+        return total
+
+    for caminho in arquivos:
+        try:
+            with open(caminho) as arquivo:
+                conteudo = json.load(arquivo)
+        except (OSError, ValueError):
+            continue
+        for nome, valores in conteudo.items():
+            metrica = _metricas.get(nome)
+            if metrica is None:
+                continue
+            for chave, valor in valores:
+                chave = tuple(chave)
+                total[nome][chave] = metrica._somar(total[nome].get(chave), valor)
+    return total
+
+
+def _calcular_indicadores():
+    hoje = date.today()
+    contratos = Cliente.objects.filter(ativo=True, bloqueado=False).aggregate(
+        ativos=Count('pk', filter=Q(validade__gte=hoje)),
+        vencidos=Count('pk', filter=Q(validade__lt=hoje)),
+    )
+    entradas, tamanho = cache_relatorios.ocupacao()
+    return [
+        ('contratos_ativos', "Contratos ativos, não bloqueados e dentro da validade.", contratos['ativos']),
+        ('contratos_vencidos', "Contratos ativos e não bloqueados com a validade vencida.", contratos['vencidos']),
+        ('produtos_abaixo_alerta', "Produtos com estoque no nível de alerta ou abaixo.",
+         SaldoEstoque.objects.filter(em_alerta=True).count()),
+        ('relatorios_cache_entradas', "Relatórios em PDF guardados no cache em disco.", entradas),
+        ('relatorios_cache_bytes', "Espaço ocupado pelo cache de relatórios em PDF.", tamanho),
+    ]
+
+
+def indicadores():
+    """Indicadores de negócio, guardados no cache por METRICAS_CACHE_SEGUNDOS."""
+    return cache.get_or_set(CHAVE_CACHE_INDICADORES, _calcular_indicadores, settings.METRICAS_CACHE_SEGUNDOS)
+
+
+def exposicao():
+    """Texto no formato de exposição do Prometheus (versão 0.0.4)."""
+    gravar(forcar=True)
+    linhas = []
+    for nome, valores in _somar_processos().items():
+        metrica = _metricas[nome]
+        linhas.append(f'# HELP {nome} {metrica.ajuda}')
+        linhas.append(f'# TYPE {nome} {metrica.tipo}')
+        linhas.extend(metrica._linhas(valores))
+    for nome, ajuda, valor in indicadores():
+        linhas.append(f'# HELP {nome} {ajuda}')
+        linhas.append(f'# TYPE {nome} gauge')
+        linhas.append(f'{nome} {_numero(valor)}')
+    return '\n'.join(linhas) + '\n'
+
+
+class MetricasMiddleware:
+    """
+    Conta e mede as requisições por rota. Aproveita a medição do
+    ServerTimingMiddleware quando ele está ligado; senão abre a sua.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        atexit.register(gravar, forcar=True)
+
+    def __call__(self, request):
+        inicio = time.perf_counter()
+        medicao = medicao_atual()
+        if medicao is None:
+            with medir_requisicao() as medicao:
+                response = self.get_response(request)
+            consultas = medicao.consultas
+        else:
+            consultas_antes = medicao.consultas
+            response = self.get_response(request)
+            consultas = medicao.consultas - consultas_antes
+        duracao = time.perf_counter() - inicio
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else 'nao_encontrada'
+        REQUISICOES.inc(view=view, metodo=request.method, status=response.status_code)
+        DURACAO_REQUISICAO.observar(duracao, view=view)
+        CONSULTAS_REQUISICAO.observar(consultas, view=view)
+        gravar()
+        return response
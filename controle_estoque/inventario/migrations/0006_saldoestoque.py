@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def popular_saldos(apps, schema_editor):
+    Produto = apps.get_model('inventario', 'Produto')
+    Item = apps.get_model('inventario', 'Item')
+    SaldoEstoque = apps.get_model('inventario', 'SaldoEstoque')
+
+    contagem = dict(
+        Item.objects.filter(disponivel=True)
+        .values('produto')
+        .annotate(total=Count('id'))
+        .order_by()
+        .values_list('produto', 'total')
+    )
+    SaldoEstoque.objects.bulk_create(
+        [
+            SaldoEstoque(produto_id=produto_id, quantidade=contagem.get(produto_id, 0))
+            for produto_id in Produto.objects.values_list('id', flat=True)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0005_transacao_arquivada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantidade', models.IntegerField(default=0)),
+                ('ultima_atualizacao', models.DateTimeField(default=django.utils.timezone.now)),
+                ('produto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='saldo', to='inventario.produto')),
+            ],
+            options={
+                'verbose_name': 'Saldo de Estoque',
+                'verbose_name_plural': 'Saldos de Estoque',
+            },
+        ),
+        migrations.RunPython(popular_saldos, migrations.RunPython.noop),
+    ]
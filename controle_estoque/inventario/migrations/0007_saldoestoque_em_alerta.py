@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:14
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def marcar_alertas(apps, schema_editor):
+    SaldoEstoque = apps.get_model('inventario', 'SaldoEstoque')
+    SaldoEstoque.objects.filter(
+        produto__ativo=0,
+        produto__alerta_estoque_minimo__isnull=False,
+        quantidade__gt=0,
+        quantidade__lte=F('produto__alerta_estoque_minimo'),
+    ).update(em_alerta=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0006_saldoestoque'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='saldoestoque',
+            name='em_alerta',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.RunPython(marcar_alertas, migrations.RunPython.noop),
+    ]
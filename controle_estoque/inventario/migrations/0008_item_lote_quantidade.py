@@ -0,0 +1,131 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:15
+
+import bisect
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+TAMANHO_BLOCO = 1000
+
+
+def _entrada_do_item(entradas, datas, lotes_das_entradas, lote, criado):
+    """
+    Entrada de origem de uma unidade já baixada: a última entrada do produto
+    gravada até a criação da unidade (as unidades eram criadas logo depois da
+    transação de entrada) cujo lote não seja sabidamente outro. Sem nenhuma
+    antes, a primeira compatível depois (data de transação editada).
+    """
+    posicao = bisect.bisect_right(datas, criado)
+    candidatas = list(reversed(entradas[:posicao])) + entradas[posicao:]
+    for entrada_id, _ in candidatas:
+        if lotes_das_entradas.get(entrada_id, lote) == lote:
+            return entrada_id
+    return None
+
+
+def colapsar_itens(apps, schema_editor):
+    """
+    Agrupa os itens unitários em uma linha por lote de entrada
+    (produto, lote, transação de entrada).
+
+    Itens disponíveis ainda apontam para a entrada que os criou. Nos já
+    baixados o modelo antigo sobrescreveu `transacao` com a saída: a entrada
+    de origem é recuperada por _entrada_do_item e a saída vira um ConsumoLote
+    do lote. Assim quantidade_inicial soma as unidades restantes e as
+    consumidas, e Item.transacao aponta sempre para a entrada. Só quando o
+    produto não tem nenhuma entrada compatível a unidade vira um lote esgotado
+    ligado à própria saída, como antes.
+    """
+    Item = apps.get_model('inventario', 'Item')
+    Transacao = apps.get_model('inventario', 'Transacao')
+    ConsumoLote = apps.get_model('inventario', 'ConsumoLote')
+
+    for produto_id in list(Item.objects.values_list('produto_id', flat=True).distinct().order_by()):
+        entradas = list(
+            Transacao.objects.filter(produto_id=produto_id, tipo_transacao__entrada=True)
+            .order_by('data', 'id').values_list('id', 'data')
+        )
+        datas = [data for _, data in entradas]
+        unidades = list(
+            Item.objects.filter(produto_id=produto_id).order_by('data_criacao', 'id')
+            .values_list('id', 'lote', 'transacao_id', 'disponivel', 'data_criacao')
+        )
+        lotes_das_entradas = {
+            transacao_id: lote for _, lote, transacao_id, disponivel, _ in unidades if disponivel
+        }
+
+        # (lote, entrada) -> unidades, restantes e consumo por saída
+        lotes = {}
+        for item_id, lote, transacao_id, disponivel, criado in unidades:
+            if disponivel:
+                entrada_id, saida_id = transacao_id, None
+            else:
+                entrada_id = _entrada_do_item(entradas, datas, lotes_das_entradas, lote, criado)
+                saida_id = transacao_id
+                if entrada_id is None:
+                    entrada_id = transacao_id
+                else:
+                    lotes_das_entradas.setdefault(entrada_id, lote)
+            grupo = lotes.setdefault((lote, entrada_id), {
+                'ids': [], 'criado': criado, 'restantes': 0, 'consumos': Counter(),
+            })
+            grupo['ids'].append(item_id)
+            if disponivel:
+                grupo['restantes'] += 1
+            else:
+                grupo['consumos'][saida_id] += 1
+
+        excluir = []
+        consumos = []
+        for (lote, entrada_id), grupo in lotes.items():
+            primeiro, *resto = grupo['ids']
+            excluir += resto
+            Item.objects.filter(pk=primeiro).update(
+                transacao_id=entrada_id,
+                quantidade=grupo['restantes'],
+                quantidade_inicial=grupo['restantes'] + sum(grupo['consumos'].values()),
+                disponivel=grupo['restantes'] > 0,
+                data_criacao=grupo['criado'],
+            )
+            consumos += [
+                ConsumoLote(item_id=primeiro, transacao_id=saida_id, quantidade=quantidade)
+                for saida_id, quantidade in grupo['consumos'].items()
+            ]
+        for inicio in range(0, len(excluir), TAMANHO_BLOCO):
+            Item.objects.filter(pk__in=excluir[inicio:inicio + TAMANHO_BLOCO]).delete()
+        ConsumoLote.objects.bulk_create(consumos, batch_size=TAMANHO_BLOCO)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0007_saldoestoque_em_alerta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='quantidade',
+            field=models.PositiveIntegerField(default=1, verbose_name='Quantidade Restante'),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='quantidade_inicial',
+            field=models.PositiveIntegerField(default=1, verbose_name='Quantidade Recebida'),
+        ),
+        migrations.CreateModel(
+            name='ConsumoLote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantidade', models.PositiveIntegerField()),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumos', to='inventario.item')),
+                ('transacao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumos', to='inventario.transacao')),
+            ],
+            options={
+                'verbose_name': 'Consumo de Lote',
+                'verbose_name_plural': 'Consumos de Lote',
+            },
+        ),
+        migrations.RunPython(colapsar_itens, migrations.RunPython.noop),
+    ]
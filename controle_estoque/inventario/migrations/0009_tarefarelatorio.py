@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0008_item_lote_quantidade'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TarefaRelatorio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=30)),
+                ('parametros', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('pendente', 'Na fila'), ('processando', 'Gerando'), ('concluida', 'Pronto'), ('erro', 'Erro')], db_index=True, default='pendente', max_length=15)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('arquivo', models.CharField(blank=True, max_length=255)),
+                ('nome_arquivo', models.CharField(blank=True, max_length=255)),
+                ('mensagem_erro', models.TextField(blank=True)),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+                ('data_inicio', models.DateTimeField(blank=True, null=True)),
+                ('data_conclusao', models.DateTimeField(blank=True, null=True)),
+                ('expira_em', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tarefas_relatorio', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Tarefa de Relatório',
+                'verbose_name_plural': 'Tarefas de Relatório',
+                'ordering': ['-data_criacao'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0009_tarefarelatorio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transacao',
+            name='ultima_alteracao',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='produto',
+            name='ultima_alteracao',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
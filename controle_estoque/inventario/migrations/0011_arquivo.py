@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0010_ultima_alteracao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsumoLoteArquivado',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('item_id', models.IntegerField(db_index=True)),
+                ('transacao_id', models.IntegerField(db_index=True)),
+                ('quantidade', models.PositiveIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Consumo de Lote Arquivado',
+                'verbose_name_plural': 'Consumos de Lote Arquivados',
+            },
+        ),
+        migrations.CreateModel(
+            name='ItemArquivado',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('lote', models.CharField(blank=True, max_length=100, null=True)),
+                ('transacao_id', models.IntegerField(db_index=True)),
+                ('quantidade_inicial', models.PositiveIntegerField(verbose_name='Quantidade Recebida')),
+                ('data_criacao', models.DateTimeField()),
+                ('data_arquivamento', models.DateTimeField(auto_now_add=True)),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventario.produto')),
+            ],
+            options={
+                'verbose_name': 'Item Arquivado',
+                'verbose_name_plural': 'Itens Arquivados',
+            },
+        ),
+        migrations.CreateModel(
+            name='TransacaoArquivada',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('data', models.DateTimeField(db_index=True)),
+                ('quantidade', models.IntegerField()),
+                ('observacoes', models.TextField(blank=True, null=True)),
+                ('ultima_alteracao', models.DateTimeField()),
+                ('data_arquivamento', models.DateTimeField(auto_now_add=True)),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='inventario.produto')),
+                ('tipo_transacao', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='inventario.tipotransacao')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Transação Arquivada',
+                'verbose_name_plural': 'Transações Arquivadas',
+                'ordering': ['-data'],
+            },
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:46
+
+import django.db.models.deletion
+import unicodedata
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+# Cópia congelada da normalização de inventario.busca na época desta migração:
+# mudanças posteriores na busca não alteram o que ela grava. Índices gravados
+# com outra normalização são refeitos com `manage.py reindexar_busca`.
+PALAVRAS_VAZIAS = frozenset({
+    'a', 'o', 'as', 'os', 'e', 'de', 'da', 'do', 'das', 'dos', 'em', 'no', 'na', 'nos', 'nas',
+    'com', 'sem', 'para', 'por', 'um', 'uma', 'ou',
+})
+
+
+def _normalizar(texto):
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ''.join(c if c.isalnum() else ' ' for c in sem_acentos.lower())
+
+
+def _singular(token):
+    if len(token) <= 3 or token.isdigit():
+        return token
+    for sufixo, troca in (('oes', 'ao'), ('aes', 'ao'), ('ais', 'al'), ('eis', 'el'), ('ns', 'm')):
+        if token.endswith(sufixo):
+            return token[:-len(sufixo)] + troca
+    if token.endswith(('res', 'zes', 'ses')):
+        return token[:-2]
+    if token.endswith('s') and not token.endswith(('is', 'us', 'ss')):
+        return token[:-1]
+    return token
+
+
+def _tokens(texto):
+    return [_singular(token) for token in _normalizar(texto).split() if token not in PALAVRAS_VAZIAS]
+
+
+def textos_busca(nome, descricao, categoria, lotes):
+    texto = ' '.join(_tokens(descricao) + _tokens(categoria) + [t for lote in lotes for t in _tokens(lote)])
+    return ' '.join(_tokens(nome)), texto
+
+
+def popular_busca(apps, schema_editor):
+    Produto = apps.get_model('inventario', 'Produto')
+    Item = apps.get_model('inventario', 'Item')
+    BuscaProduto = apps.get_model('inventario', 'BuscaProduto')
+
+    lotes = defaultdict(list)
+    for produto_id, lote in Item.objects.values_list('produto_id', 'lote').distinct():
+        if lote:
+            lotes[produto_id].append(lote)
+    registros = []
+    for produto_id, nome, descricao, categoria in Produto.objects.values_list(
+        'id', 'nome', 'descricao', 'categoria__nome'
+    ).iterator():
+        nome, texto = textos_busca(nome, descricao, categoria, sorted(lotes[produto_id]))
+        registros.append(BuscaProduto(produto_id=produto_id, nome=nome, texto=texto))
+    BuscaProduto.objects.bulk_create(registros, batch_size=1000)
+
+
+def criar_fulltext(apps, schema_editor):
+    # FULLTEXT não tem suporte no ORM; nos outros bancos a busca usa o índice em memória
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute("CREATE FULLTEXT INDEX inventario_busca_nome_ft ON inventario_buscaproduto (nome)")
+    schema_editor.execute(
+        "CREATE FULLTEXT INDEX inventario_busca_texto_ft ON inventario_buscaproduto (nome, texto)"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0011_arquivo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BuscaProduto',
+            fields=[
+                ('produto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='busca', serialize=False, to='inventario.produto')),
+                ('nome', models.TextField()),
+                ('texto', models.TextField(blank=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Índice de Busca de Produto',
+                'verbose_name_plural': 'Índice de Busca de Produtos',
+            },
+        ),
+        migrations.RunPython(popular_busca, migrations.RunPython.noop),
+        migrations.RunPython(criar_fulltext, migrations.RunPython.noop),
+    ]
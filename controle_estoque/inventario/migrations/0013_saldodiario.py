@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0012_buscaproduto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FechamentoSaldoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('executado_em', models.DateTimeField()),
+                ('dias_processados', models.PositiveIntegerField(default=0)),
+                ('saldos_gravados', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Fechamento de Saldos Diários',
+                'verbose_name_plural': 'Fechamentos de Saldos Diários',
+                'ordering': ['-executado_em'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SaldoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('quantidade', models.IntegerField()),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos_diarios', to='inventario.produto')),
+            ],
+            options={
+                'verbose_name': 'Saldo Diário',
+                'verbose_name_plural': 'Saldos Diários',
+                'ordering': ['-data'],
+                'constraints': [models.UniqueConstraint(fields=('produto', 'data'), name='saldo_diario_produto_data')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0013_saldodiario'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='item',
+            name='lote',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name='itemarquivado',
+            name='lote',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0014_item_lote_indice'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='categoria',
+            index=models.Index(fields=['nome', 'id'], name='categoria_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['produto', 'disponivel', 'data_criacao', 'id'], name='item_fifo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['ativo', '-data_criacao', '-id'], name='produto_ativo_criacao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['ultima_alteracao'], name='produto_alteracao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tarefarelatorio',
+            index=models.Index(fields=['usuario', '-data_criacao'], name='tarefa_usuario_criacao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transacao',
+            index=models.Index(fields=['arquivada', '-data', '-id'], name='transacao_arquivada_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transacao',
+            index=models.Index(fields=['data'], name='transacao_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transacao',
+            index=models.Index(fields=['produto', 'data'], name='transacao_produto_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transacaoarquivada',
+            index=models.Index(fields=['produto', 'data'], name='transacao_arq_produto_idx'),
+        ),
+    ]
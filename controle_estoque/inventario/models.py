@@ -17,6 +17,10 @@ class Categoria(models.Model):
     class Meta:
         verbose_name = "Categoria"
         verbose_name_plural = "Categorias"
+        indexes = [
+            # Listagem paginada por (nome, id)
+            models.Index(fields=['nome', 'id'], name='categoria_nome_idx'),
+        ]
     
     def __str__(self):
         return self.nome
@@ -39,7 +43,7 @@ class Produto(models.Model):
     descricao = models.TextField(blank=True, null=True)
     categoria = models.ForeignKey(Categoria, on_delete=models.SET_NULL, null=True, blank=True)
     data_criacao = models.DateTimeField(default=timezone.now)
-    ultima_alteracao = models.DateTimeField(default=timezone.now)
+    ultima_alteracao = models.DateTimeField(auto_now=True)
     usuario_responsavel = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     ativo = models.IntegerField(choices=ACTIVE_CHOICES, default=ATIVO)
     
@@ -52,13 +56,22 @@ class Produto(models.Model):
     
     @property
     def estoque_total(self):
-        """Calcula o estoque total somando todos os itens disponíveis"""
-        return self.item_set.filter(disponivel=True).count()
+        """Retorna o saldo materializado em SaldoEstoque (sem COUNT sobre Item)"""
+        try:
+            return self.saldo.quantidade
+        except SaldoEstoque.DoesNotExist:
+            return 0
     
     class Meta:
         verbose_name = "Produto"
         verbose_name_plural = "Produtos"
         ordering = ['nome']
+        indexes = [
+            # Listagem de ativos, paginada por (-data_criacao, -id)
+            models.Index(fields=['ativo', '-data_criacao', '-id'], name='produto_ativo_criacao_idx'),
+            # Max(ultima_alteracao) na versão dos relatórios em cache
+            models.Index(fields=['ultima_alteracao'], name='produto_alteracao_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nome} (Estoque: {self.estoque_total})"
@@ -74,26 +87,260 @@ class Transacao(models.Model):
     
     # NOVO: Campo para controlar se a transação foi arquivada
     arquivada = models.BooleanField(default=False)
+    # Usado na versão dos relatórios em cache (cache_relatorios)
+    ultima_alteracao = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Transação"
         verbose_name_plural = "Transações"
         ordering = ['-data']
+        indexes = [
+            # Listagem (não arquivadas, paginada por -data, -id) e arquivamento
+            models.Index(fields=['arquivada', '-data', '-id'], name='transacao_arquivada_data_idx'),
+            # Relatório e versão do cache por período
+            models.Index(fields=['data'], name='transacao_data_idx'),
+            # Filtro por produto e saldo em uma data (saldos_diarios)
+            models.Index(fields=['produto', 'data'], name='transacao_produto_data_idx'),
+        ]
     
     def __str__(self):
         return f"{self.tipo_transacao.nome} - {self.quantidade} itens - {self.data.strftime('%d/%m/%Y %H:%M')}"
 
 
 class Item(models.Model):
+    """Lote de um produto recebido em uma transação de entrada.
+
+    Cada entrada gera uma única linha com a quantidade recebida; as saídas
+    consomem `quantidade` em ordem FIFO e registram um ConsumoLote.
+    """
     produto = models.ForeignKey(Produto, on_delete=models.CASCADE)
-    lote = models.CharField(max_length=100, blank=True, null=True)
+    # Indexado para a rastreabilidade por lote (inventario.rastreabilidade)
+    lote = models.CharField(max_length=100, blank=True, null=True, db_index=True)
+    # Entrada que trouxe o lote; não muda na saída
     transacao = models.ForeignKey(Transacao, on_delete=models.CASCADE)
+    quantidade = models.PositiveIntegerField(default=1, verbose_name="Quantidade Restante")
+    quantidade_inicial = models.PositiveIntegerField(default=1, verbose_name="Quantidade Recebida")
     disponivel = models.BooleanField(default=True)
     data_criacao = models.DateTimeField(default=timezone.now)
     
     class Meta:
         verbose_name = "Item"
         verbose_name_plural = "Itens"
+        indexes = [
+            # Saída FIFO: lotes disponíveis do produto por (data_criacao, id)
+            models.Index(fields=['produto', 'disponivel', 'data_criacao', 'id'], name='item_fifo_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.produto.nome} - Lote: {self.lote}"
\ No newline at end of file
+        return f"{self.produto.nome} - Lote: {self.lote} ({self.quantidade}/{self.quantidade_inicial})"
+
+
+class ConsumoLote(models.Model):
+    """Quantidade de um lote (Item) baixada por uma transação de saída."""
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='consumos')
+    transacao = models.ForeignKey(Transacao, on_delete=models.CASCADE, related_name='consumos')
+    quantidade = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name = "Consumo de Lote"
+        verbose_name_plural = "Consumos de Lote"
+
+    def __str__(self):
+        return f"{self.item.lote} - {self.quantidade} itens - Transação {self.transacao_id}"
+
+
+class TransacaoArquivada(models.Model):
+    """Transação arquivada movida para fora da tabela principal (`manage.py arquivar_historico`).
+
+    Mantém o id original; os relatórios por período juntam as duas tabelas.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    tipo_transacao = models.ForeignKey(TipoTransacao, on_delete=models.PROTECT, related_name='+')
+    usuario = models.ForeignKey(User, on_delete=models.PROTECT, related_name='+')
+    produto = models.ForeignKey(Produto, on_delete=models.PROTECT, related_name='+')
+    data = models.DateTimeField(db_index=True)
+    quantidade = models.IntegerField()
+    observacoes = models.TextField(blank=True, null=True)
+    ultima_alteracao = models.DateTimeField()
+    data_arquivamento = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Transação Arquivada"
+        verbose_name_plural = "Transações Arquivadas"
+        ordering = ['-data']
+        indexes = [
+            models.Index(fields=['produto', 'data'], name='transacao_arq_produto_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo_transacao.nome} - {self.quantidade} itens - {self.data.strftime('%d/%m/%Y %H:%M')}"
+
+
+class ItemArquivado(models.Model):
+    """Lote totalmente consumido movido para fora da tabela Item.
+
+    `transacao_id` é o id da entrada, que pode estar em Transacao ou em TransacaoArquivada.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='+')
+    lote = models.CharField(max_length=100, blank=True, null=True, db_index=True)
+    transacao_id = models.BigIntegerField(db_index=True)
+    quantidade_inicial = models.PositiveIntegerField(verbose_name="Quantidade Recebida")
+    data_criacao = models.DateTimeField()
+    data_arquivamento = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Item Arquivado"
+        verbose_name_plural = "Itens Arquivados"
+
+    def __str__(self):
+        return f"{self.produto.nome} - Lote: {self.lote} (0/{self.quantidade_inicial})"
+
+
+class ConsumoLoteArquivado(models.Model):
+    """ConsumoLote de um lote arquivado; os ids apontam para as tabelas principais ou de arquivo."""
+    id = models.BigIntegerField(primary_key=True)
+    item_id = models.BigIntegerField(db_index=True)
+    transacao_id = models.BigIntegerField(db_index=True)
+    quantidade = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name = "Consumo de Lote Arquivado"
+        verbose_name_plural = "Consumos de Lote Arquivados"
+
+    def __str__(self):
+        return f"Item {self.item_id} - {self.quantidade} itens - Transação {self.transacao_id}"
+
+
+class SaldoEstoque(models.Model):
+    """Saldo disponível por produto, mantido junto com a gravação dos itens.
+
+    Pode ser reconstruído a partir de Item com `manage.py recalcular_saldos`.
+    """
+    produto = models.OneToOneField(Produto, on_delete=models.CASCADE, related_name='saldo')
+    quantidade = models.IntegerField(default=0)
+    ultima_atualizacao = models.DateTimeField(default=timezone.now)
+    # Produto ativo com saldo no nível de aviso (alerta_estoque_minimo)
+    em_alerta = models.BooleanField(default=False, db_index=True)
+
+    class Meta:
+        verbose_name = "Saldo de Estoque"
+        verbose_name_plural = "Saldos de Estoque"
+
+    def __str__(self):
+        return f"{self.produto.nome} - Saldo: {self.quantidade}"
+
+    def avaliar_alerta(self):
+        """Indica se o saldo atingiu o nível de aviso configurado no produto"""
+        limite = self.produto.alerta_estoque_minimo
+        return (
+            self.produto.ativo == ATIVO
+            and limite is not None
+            and 0 < self.quantidade <= limite
+        )
+
+
+class SaldoDiario(models.Model):
+    """Saldo do produto no fim de um dia em que ele teve movimentação.
+
+    Gerado por `manage.py fechar_saldos_diarios`; dias sem movimentação não têm
+    linha (o saldo é o da linha anterior). Consultas em inventario.saldos_diarios.
+    """
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='saldos_diarios')
+    data = models.DateField()
+    quantidade = models.IntegerField()
+
+    class Meta:
+        verbose_name = "Saldo Diário"
+        verbose_name_plural = "Saldos Diários"
+        ordering = ['-data']
+        constraints = [
+            models.UniqueConstraint(fields=['produto', 'data'], name='saldo_diario_produto_data'),
+        ]
+
+    def __str__(self):
+        return f"{self.produto.nome} - {self.data:%d/%m/%Y}: {self.quantidade}"
+
+
+class FechamentoSaldoDiario(models.Model):
+    """Execução do `manage.py fechar_saldos_diarios`: até que dia os saldos foram gerados."""
+    dia = models.DateField()
+    # Início da execução: transações alteradas depois disso são conferidas na próxima
+    executado_em = models.DateTimeField()
+    dias_processados = models.PositiveIntegerField(default=0)
+    saldos_gravados = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Fechamento de Saldos Diários"
+        verbose_name_plural = "Fechamentos de Saldos Diários"
+        ordering = ['-executado_em']
+
+    def __str__(self):
+        return f"Saldos até {self.dia:%d/%m/%Y} ({self.executado_em:%d/%m/%Y %H:%M})"
+
+
+class BuscaProduto(models.Model):
+    """Texto de busca do produto, normalizado (sem acentos, em minúsculas).
+
+    `nome` tem o nome do produto; `texto`, a descrição, a categoria e os lotes.
+    No MySQL as colunas têm índices FULLTEXT (migração 0012). Mantido por
+    inventario.busca e reconstruído com `manage.py reindexar_busca`.
+    """
+    produto = models.OneToOneField(Produto, on_delete=models.CASCADE, primary_key=True, related_name='busca')
+    nome = models.TextField()
+    texto = models.TextField(blank=True)
+    atualizado_em = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Índice de Busca de Produto"
+        verbose_name_plural = "Índice de Busca de Produtos"
+
+    def __str__(self):
+        return self.nome
+
+
+class TarefaRelatorio(models.Model):
+    """Relatório em PDF gerado fora da requisição pelo `manage.py run_report_worker`.
+
+    O arquivo pronto fica em disco (settings.RELATORIOS_DIR) até `expira_em`.
+    """
+    PENDENTE = 'pendente'
+    PROCESSANDO = 'processando'
+    CONCLUIDA = 'concluida'
+    ERRO = 'erro'
+
+    STATUS_CHOICES = (
+        (PENDENTE, 'Na fila'),
+        (PROCESSANDO, 'Gerando'),
+        (CONCLUIDA, 'Pronto'),
+        (ERRO, 'Erro'),
+    )
+
+    tipo = models.CharField(max_length=30)
+    parametros = models.JSONField(default=dict)
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tarefas_relatorio')
+    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default=PENDENTE, db_index=True)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    arquivo = models.CharField(max_length=255, blank=True)
+    nome_arquivo = models.CharField(max_length=255, blank=True)
+    mensagem_erro = models.TextField(blank=True)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    data_inicio = models.DateTimeField(null=True, blank=True)
+    data_conclusao = models.DateTimeField(null=True, blank=True)
+    expira_em = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Tarefa de Relatório"
+        verbose_name_plural = "Tarefas de Relatório"
+        ordering = ['-data_criacao']
+        indexes = [
+            # "Meus relatórios": tarefas do usuário, mais recentes primeiro
+            models.Index(fields=['usuario', '-data_criacao'], name='tarefa_usuario_criacao_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} #{self.id} - {self.get_status_display()}"
+
+    @property
+    def finalizada(self):
+        return self.status in (self.CONCLUIDA, self.ERRO)
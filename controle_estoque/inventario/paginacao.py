@@ -0,0 +1,188 @@
+"""
+Paginação por chave (keyset/seek) para as listagens grandes.
+
+O Paginator do Django faz COUNT(*) e depois OFFSET: as páginas do fim de uma
+tabela grande ficam proporcionalmente mais lentas. Aqui cada página guarda
+no cursor os valores da ordenação (ex.: data e id) da sua primeira e da sua
+última linha, e a página seguinte é lida com
+`WHERE (data, id) < (valores) ORDER BY data DESC, id DESC LIMIT n + 1`,
+que custa o mesmo em qualquer ponto da lista.
+
+A ordenação deve terminar num campo único (normalmente 'id') e os campos não
+podem ser nulos. O cursor é opaco para o usuário (JSON em base64); um cursor
+inválido volta para a primeira página. O total, quando pedido, é contado só
+até `total_maximo` linhas.
+"""
+import base64
+import binascii
+import json
+import math
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+# Limite usual do total exibido nas listagens ("mais de 1000")
+TOTAL_MAXIMO = 1000
+
+def _serializar(valor):
+    # O DjangoJSONEncoder corta os microssegundos, o que quebraria a comparação exata
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+def codificar_cursor(direcao, valores, numero):
+    dados = json.dumps([direcao, [_serializar(valor) for valor in valores], numero], separators=(',', ':'))
+    return base64.urlsafe_b64encode(dados.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Retorna (direcao, valores, numero) ou None se o cursor não for válido."""
+    try:
+        dados = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direcao, valores, numero = json.loads(dados)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        return None
+    if direcao not in ('p', 'a') or not isinstance(valores, list) or not isinstance(numero, int):
+        return None
+    return direcao, valores, max(numero, 1)
+
+
+class PaginaKeyset:
+    """Página de resultados; imita a interface de django.core.paginator.Page usada nos templates."""
+
+    keyset = True
+
+    def __init__(self, object_list, numero, paginador, cursor_anterior=None, cursor_proximo=None):
+        self.object_list = object_list
+        self.number = numero
+        self.paginator = paginador
+        self.cursor_anterior = cursor_anterior
+        self.cursor_proximo = cursor_proximo
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, indice):
+        return self.object_list[indice]
+
+    def has_next(self):
+        return self.cursor_proximo is not None
+
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class PaginadorKeyset:
+    def __init__(self, queryset, ordenacao, por_pagina, total_maximo=None):
+        self.queryset = queryset
+        self.ordenacao = tuple(ordenacao)
+        self.por_pagina = por_pagina
+        self.total_maximo = total_maximo
+        self._campos = [campo.lstrip('-') for campo in self.ordenacao]
+        self._decrescente = [campo.startswith('-') for campo in self.ordenacao]
+
+    def _filtro_apos(self, valores, decrescente):
+        """Linhas depois de `valores` na ordem dada: (a > x) OR (a = x AND b > y) ..."""
+        condicao = Q()
+        iguais = {}
+        for campo, valor, desc in zip(self._campos, valores, decrescente):
+            condicao |= Q(**iguais, **{f"{campo}__{'lt' if desc else 'gt'}": valor})
+            iguais[campo] = valor
+        # Limite redundante no primeiro campo: deixa o otimizador usar o índice como faixa
+        primeiro = f"{self._campos[0]}__{'lte' if decrescente[0] else 'gte'}"
+        return Q(**{primeiro: valores[0]}) & condicao
+
+    def _valores(self, objeto):
+        return [getattr(objeto, campo) for campo in self._campos]
+
+    def _converter(self, valores):
+        """Converte os valores do cursor para os tipos dos campos; None se não baterem."""
+        if len(valores) != len(self._campos):
+            return None
+        modelo = self.queryset.model
+        try:
+            return [
+                modelo._meta.get_field(campo).to_python(valor)
+                for campo, valor in zip(self._campos, valores)
+            ]
+        except (FieldDoesNotExist, ValidationError, TypeError, ValueError):
+            return None
+
+    def pagina(self, cursor=None):
+        decodificado = decodificar_cursor(cursor) if cursor else None
+        valores = self._converter(decodificado[1]) if decodificado else None
+        if valores is None:
+            direcao, numero = 'p', 1
+        else:
+            direcao, numero = decodificado[0], decodificado[2]
+
+        if direcao == 'p':
+            queryset = self.queryset.order_by(*self.ordenacao)
+            if valores is not None:
+                queryset = queryset.filter(self._filtro_apos(valores, self._decrescente))
+            linhas = list(queryset[:self.por_pagina + 1])
+            tem_proxima = len(linhas) > self.por_pagina
+            linhas = linhas[:self.por_pagina]
+            tem_anterior = valores is not None
+        else:
+            # Página anterior: lê na ordem inversa a partir da primeira linha da página atual
+            invertido = [not desc for desc in self._decrescente]
+            ordenacao = [('-' if desc else '') + campo for campo, desc in zip(self._campos, invertido)]
+            queryset = self.queryset.order_by(*ordenacao).filter(self._filtro_apos(valores, invertido))
+            linhas = list(queryset[:self.por_pagina + 1])
+            tem_anterior = len(linhas) > self.por_pagina
+            linhas = linhas[:self.por_pagina][::-1]
+            tem_proxima = True
+            if not tem_anterior:
+                numero = 1
+
+        cursor_anterior = cursor_proximo = None
+        if linhas and tem_anterior:
+            cursor_anterior = codificar_cursor('a', self._valores(linhas[0]), numero - 1)
+        if linhas and tem_proxima:
+            cursor_proximo = codificar_cursor('p', self._valores(linhas[-1]), numero + 1)
+        return PaginaKeyset(linhas, numero, self, cursor_anterior, cursor_proximo)
+
+    @property
+    def total(self):
+        """Total de linhas contado até total_maximo (None se não houver limite configurado)."""
+        if self.total_maximo is None:
+            return None
+        if not hasattr(self, '_total'):
+            self._total = self.queryset.order_by()[:self.total_maximo + 1].count()
+        return min(self._total, self.total_maximo)
+
+    @property
+    def total_excede(self):
+        return self.total is not None and self._total > self.total_maximo
+
+    @property
+    def num_paginas(self):
+        if self.total is None:
+            return None
+        return max(math.ceil(self.total / self.por_pagina), 1)
+
+
+def paginar_por_ids(queryset, ids, por_pagina, numero):
+    """
+    Pagina uma lista de ids já ordenada (ex.: resultado da busca por
+    relevância), mantendo só os que passam pelos filtros do queryset. A página
+    traz os objetos do queryset na ordem da lista.
+    """
+    validos = set(queryset.filter(id__in=ids).values_list('id', flat=True))
+    page_obj = Paginator([id for id in ids if id in validos], por_pagina).get_page(numero)
+    objetos = queryset.in_bulk(page_obj.object_list)
+    page_obj.object_list = [objetos[id] for id in page_obj.object_list]
+    return page_obj
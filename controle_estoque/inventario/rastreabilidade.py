@@ -0,0 +1,82 @@
+"""
+Rastreabilidade por lote: a entrada que trouxe cada lote e todas as saídas
+que o consumiram.
+
+Item.transacao guarda a entrada do lote e não muda na saída; cada saída
+registra ConsumoLote (item, transação, quantidade). Lotes consumidos e
+transações antigas podem estar nas tabelas de arquivo (inventario.arquivo),
+então cada passo lê a tabela principal e a de arquivo. Todas as leituras são
+por índice (Item.lote, ItemArquivado.lote, item_id dos consumos e chave
+primária das transações): no máximo seis consultas, qualquer que seja o
+tamanho das tabelas.
+"""
+from .models import ConsumoLote, ConsumoLoteArquivado, Item, ItemArquivado, Transacao, TransacaoArquivada
+
+
+def _transacoes(ids):
+    transacoes = {}
+    for modelo in (Transacao, TransacaoArquivada):
+        if ids:
+            queryset = modelo.objects.filter(pk__in=ids).select_related('tipo_transacao', 'usuario')
+            transacoes.update((transacao.pk, transacao) for transacao in queryset)
+    return transacoes
+
+
+def _movimento(transacao, quantidade):
+    return {
+        'transacao_id': transacao.pk,
+        'data': transacao.data,
+        'tipo': transacao.tipo_transacao.nome,
+        'entrada': transacao.tipo_transacao.entrada,
+        'quantidade': quantidade,
+        'usuario': transacao.usuario.username,
+        'arquivada': isinstance(transacao, TransacaoArquivada),
+    }
+
+
+def rastrear_lote(lote):
+    """
+    Lotes (Item, inclusive arquivados) com o código `lote`, cada um com os
+    seus movimentos em ordem de data: a entrada e as saídas que o consumiram.
+    """
+    lote = (lote or '').strip()
+    if not lote:
+        return []
+
+    itens = list(Item.objects.filter(lote=lote).select_related('produto'))
+    arquivados = list(ItemArquivado.objects.filter(lote=lote).select_related('produto'))
+    consumos = []
+    if itens:
+        consumos += ConsumoLote.objects.filter(item_id__in=[item.pk for item in itens]).values_list(
+            'item_id', 'transacao_id', 'quantidade'
+        )
+    if arquivados:
+        consumos += ConsumoLoteArquivado.objects.filter(item_id__in=[item.pk for item in arquivados]).values_list(
+            'item_id', 'transacao_id', 'quantidade'
+        )
+
+    transacoes = _transacoes(
+        {item.transacao_id for item in itens + arquivados} | {transacao_id for _, transacao_id, _ in consumos}
+    )
+    saidas = {}
+    for item_id, transacao_id, quantidade in consumos:
+        if transacao_id in transacoes:
+            saidas.setdefault(item_id, []).append(_movimento(transacoes[transacao_id], quantidade))
+
+    resultado = []
+    for item in sorted(itens + arquivados, key=lambda item: (item.data_criacao, item.pk)):
+        movimentos = saidas.get(item.pk, [])
+        if item.transacao_id in transacoes:
+            movimentos.append(_movimento(transacoes[item.transacao_id], item.quantidade_inicial))
+        movimentos.sort(key=lambda movimento: (movimento['data'], movimento['transacao_id']))
+        resultado.append({
+            'item_id': item.pk,
+            'lote': item.lote,
+            'produto_id': item.produto_id,
+            'produto': item.produto.nome,
+            'quantidade_inicial': item.quantidade_inicial,
+            'quantidade_restante': getattr(item, 'quantidade', 0),
+            'arquivado': isinstance(item, ItemArquivado),
+            'movimentos': movimentos,
+        })
+    return resultado
@@ -0,0 +1,131 @@
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from .models import Produto, Transacao, TransacaoArquivada
+from .saldos_diarios import saldos_em
+from .utils import generate_pie_chart
+
+
+def montar_relatorio_transacoes(start_date, end_date):
+    """
+    Reúne os dados do relatório de transações do período: uma agregação
+    agrupada por (produto, entrada/saída) em cada tabela (principal e de
+    arquivo), da qual saem os totais e as quebras por produto, e a lista de
+    transações já com tipo, produto e usuário carregados por JOIN. A lista do
+    arquivo só é lida quando a agregação encontrou linhas arquivadas no período.
+
+    Cada transação recebe `saldo_apos`, o estoque do produto logo depois
+    dela: o saldo do fim do dia anterior ao período (inventario.saldos_diarios)
+    somado às transações da lista.
+    """
+    filtro = {'data__gte': start_date, 'data__lte': end_date}
+    transacoes = Transacao.objects.filter(**filtro)
+    arquivadas = TransacaoArquivada.objects.filter(**filtro)
+
+    totais = {}
+    tem_arquivadas = False
+    for queryset in (transacoes, arquivadas):
+        agrupado = queryset.values('produto__nome', 'tipo_transacao__entrada')\
+            .annotate(total_quantidade=Sum('quantidade'))\
+            .order_by()
+        for linha in agrupado:
+            tem_arquivadas = tem_arquivadas or queryset is arquivadas
+            chave = (linha['produto__nome'], linha['tipo_transacao__entrada'])
+            totais[chave] = totais.get(chave, 0) + linha['total_quantidade']
+
+    entradas_por_produto = []
+    saidas_por_produto = []
+    for (produto, entrada), total_quantidade in totais.items():
+        destino = entradas_por_produto if entrada else saidas_por_produto
+        destino.append({
+            'produto__nome': produto,
+            'total_quantidade': total_quantidade,
+        })
+
+    entradas_por_produto.sort(key=lambda linha: -linha['total_quantidade'])
+    saidas_por_produto.sort(key=lambda linha: -linha['total_quantidade'])
+
+    total_entradas = sum(linha['total_quantidade'] for linha in entradas_por_produto)
+    total_saidas = sum(linha['total_quantidade'] for linha in saidas_por_produto)
+
+    linhas = list(
+        transacoes.select_related('tipo_transacao', 'produto', 'usuario').order_by('data', 'id')
+    )
+    if tem_arquivadas:
+        linhas.extend(arquivadas.select_related('tipo_transacao', 'produto', 'usuario'))
+        linhas.sort(key=lambda transacao: (transacao.data, transacao.pk))
+
+    if linhas:
+        dia_anterior = timezone.localdate(start_date) - timedelta(days=1)
+        saldos = saldos_em(dia_anterior, {transacao.produto_id for transacao in linhas})
+        for transacao in linhas:
+            movimento = transacao.quantidade if transacao.tipo_transacao.entrada else -transacao.quantidade
+            saldos[transacao.produto_id] += movimento
+            transacao.saldo_apos = saldos[transacao.produto_id]
+
+    return {
+        'transacoes': linhas,
+        'total_entradas': total_entradas,
+        'total_saidas': total_saidas,
+        'saldo': total_entradas - total_saidas,
+        'entradas_por_produto': entradas_por_produto,
+        'saidas_por_produto': saidas_por_produto,
+    }
+
+
+def _periodo_transacoes(parametros):
+    data_inicio = date.fromisoformat(parametros['data_inicio'])
+    data_fim = date.fromisoformat(parametros['data_fim'])
+    start_date = timezone.make_aware(datetime.combine(data_inicio, time.min))
+    end_date = timezone.make_aware(datetime.combine(data_fim, time.max))
+    return data_inicio, data_fim, start_date, end_date
+
+
+def contar_transacoes(parametros, usuario):
+    _, _, start_date, end_date = _periodo_transacoes(parametros)
+    return sum(
+        modelo.objects.filter(data__gte=start_date, data__lte=end_date).count()
+        for modelo in (Transacao, TransacaoArquivada)
+    )
+
+
+def versao_transacoes(parametros, usuario):
+    """
+    Versão dos dados do relatório para o cache (muda com inclusões, edições
+    e exclusões). A coluna de saldo depende de todo o histórico anterior ao
+    período, então a versão cobre as transações até o fim do período, e não
+    só as de dentro dele.
+    """
+    _, _, _, end_date = _periodo_transacoes(parametros)
+    versao = Transacao.objects.filter(data__lte=end_date).aggregate(
+        total=Count('id'), maior_id=Max('id'), alteracao=Max('ultima_alteracao')
+    )
+    # Arquivar move linhas entre as tabelas: a versão considera as duas
+    versao['arquivo'] = TransacaoArquivada.objects.filter(data__lte=end_date).aggregate(
+        total=Count('id'), maior_id=Max('id'), alteracao=Max('ultima_alteracao')
+    )
+    # O nome do produto aparece em cada linha do relatório
+    versao['produtos'] = Produto.objects.aggregate(alteracao=Max('ultima_alteracao'))['alteracao']
+    return versao
+
+
+def montar_pdf_transacoes(parametros, usuario):
+    """Retorna (template, contexto, nome do arquivo) do PDF de transações do período."""
+    data_inicio, data_fim, start_date, end_date = _periodo_transacoes(parametros)
+    dados = montar_relatorio_transacoes(start_date, end_date)
+
+    context = {
+        'transacoes': dados['transacoes'],
+        'data_inicio': data_inicio,
+        'data_fim': data_fim,
+        'total_entradas': dados['total_entradas'],
+        'total_saidas': dados['total_saidas'],
+        'saldo': dados['saldo'],
+        'data_geracao': timezone.now(),
+        'chart_entradas': generate_pie_chart(dados['entradas_por_produto'], "Entradas por Produto"),
+        'chart_saidas': generate_pie_chart(dados['saidas_por_produto'], "Saídas por Produto"),
+    }
+    filename = f"transacoes_{data_inicio.strftime('%Y%m%d')}_{data_fim.strftime('%Y%m%d')}.pdf"
+    return 'pdf_template.html', context, filename
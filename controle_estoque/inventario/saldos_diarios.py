@@ -0,0 +1,139 @@
+"""
+Saldo de estoque em uma data ("quanto havia do produto P em 30/06/2025").
+
+O saldo é a soma das entradas menos as saídas até o fim do dia, nas
+transações da tabela principal e do arquivo. Para não somar o histórico
+inteiro, `manage.py fechar_saldos_diarios` grava em SaldoDiario o saldo de
+cada produto no fim de cada dia em que ele teve movimentação; a consulta
+parte da linha mais recente até a data e soma só as transações posteriores
+a ela (normalmente as do período ainda não fechado).
+
+Os dias seguem o fuso do projeto (settings.TIME_ZONE), como os filtros de
+período dos relatórios.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, When
+from django.utils import timezone
+
+from .models import Produto, SaldoDiario, Transacao, TransacaoArquivada
+
+# Ids por consulta ao buscar os saldos de muitos produtos
+TAMANHO_BLOCO = 500
+
+MOVIMENTO = Sum(
+    Case(
+        When(tipo_transacao__entrada=True, then=F('quantidade')),
+        default=-F('quantidade'),
+        output_field=IntegerField(),
+    )
+)
+
+
+def inicio_do_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def fim_do_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.max))
+
+
+def movimento_por_produto(filtro):
+    """Entradas menos saídas por produto nas transações (principal e arquivo) que passam pelo filtro."""
+    movimento = defaultdict(int)
+    for modelo in (Transacao, TransacaoArquivada):
+        linhas = modelo.objects.filter(filtro).values('produto_id').annotate(movimento=MOVIMENTO).order_by()
+        for produto_id, quantidade in linhas.values_list('produto_id', 'movimento'):
+            movimento[produto_id] += quantidade
+    return movimento
+
+
+def _saldos_bloco(dia, ids):
+    anteriores = SaldoDiario.objects.filter(produto=OuterRef('pk'), data__lte=dia).order_by('-data')
+    bases = Produto.objects.filter(pk__in=ids).annotate(
+        base=Subquery(anteriores.values('quantidade')[:1]),
+        base_dia=Subquery(anteriores.values('data')[:1]),
+    ).values_list('pk', 'base', 'base_dia')
+
+    saldos = {}
+    por_dia = defaultdict(list)
+    for produto_id, base, base_dia in bases:
+        saldos[produto_id] = base or 0
+        por_dia[base_dia].append(produto_id)
+    if not saldos:
+        return saldos
+
+    # Cada produto soma só as transações depois da sua última linha de SaldoDiario
+    janelas = Q()
+    for base_dia, produto_ids in por_dia.items():
+        janela = Q(produto_id__in=produto_ids)
+        if base_dia is not None:
+            janela &= Q(data__gt=fim_do_dia(base_dia))
+        janelas |= janela
+    for produto_id, quantidade in movimento_por_produto(Q(data__lte=fim_do_dia(dia)) & janelas).items():
+        saldos[produto_id] += quantidade
+    return saldos
+
+
+def saldos_em(dia, produto_ids):
+    """Saldo de cada produto no fim de `dia`: {produto_id: quantidade}."""
+    produto_ids = list(produto_ids)
+    saldos = {}
+    for inicio in range(0, len(produto_ids), TAMANHO_BLOCO):
+        saldos.update(_saldos_bloco(dia, produto_ids[inicio:inicio + TAMANHO_BLOCO]))
+    return saldos
+
+
+def saldo_em(produto, dia):
+    return saldos_em(dia, [produto.pk]).get(produto.pk, 0)
+
+
+def primeiro_dia_com_transacao():
+    datas = [
+        modelo.objects.order_by('data').values_list('data', flat=True).first()
+        for modelo in (Transacao, TransacaoArquivada)
+    ]
+    datas = [data for data in datas if data is not None]
+    return timezone.localdate(min(datas)) if datas else None
+
+
+def primeiro_dia_alterado(desde, antes_de):
+    """Dia da transação mais antiga anterior a `antes_de` que foi gravada ou alterada depois de `desde`."""
+    datas = [
+        modelo.objects.filter(ultima_alteracao__gt=desde, data__lt=antes_de)
+        .order_by('data').values_list('data', flat=True).first()
+        for modelo in (Transacao, TransacaoArquivada)
+    ]
+    datas = [data for data in datas if data is not None]
+    return timezone.localdate(min(datas)) if datas else None
+
+
+def fechar_dias(inicio, fim, ao_fechar_dia=None):
+    """
+    Regrava SaldoDiario de `inicio` a `fim`. As linhas a partir de `inicio`
+    são apagadas antes; o saldo de abertura de cada produto vem de saldos_em.
+    Retorna (dias processados, linhas gravadas).
+    """
+    SaldoDiario.objects.filter(data__gte=inicio).delete()
+    saldos = {}
+    dias = gravados = 0
+    dia = inicio
+    while dia <= fim:
+        movimento = movimento_por_produto(Q(data__gte=inicio_do_dia(dia), data__lte=fim_do_dia(dia)))
+        novos = [produto_id for produto_id in movimento if produto_id not in saldos]
+        if novos:
+            saldos.update(saldos_em(dia - timedelta(days=1), novos))
+
+        linhas = []
+        for produto_id, quantidade in movimento.items():
+            saldos[produto_id] = saldos.get(produto_id, 0) + quantidade
+            linhas.append(SaldoDiario(produto_id=produto_id, data=dia, quantidade=saldos[produto_id]))
+        SaldoDiario.objects.bulk_create(linhas, batch_size=1000)
+
+        dias += 1
+        gravados += len(linhas)
+        if ao_fechar_dia:
+            ao_fechar_dia(dia, len(linhas))
+        dia += timedelta(days=1)
+    return dias, gravados
@@ -0,0 +1,96 @@
+// Campo de produto com busca por digitação (inventario.widgets.AutocompleteProduto)
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('.autocomplete-produto').forEach(function(campo) {
+        const oculto = campo.querySelector('input[type=hidden]');
+        const texto = campo.querySelector('input[type=text]');
+        const lista = campo.querySelector('.list-group');
+        let espera = null;
+        let requisicao = null;
+        let ativo = -1;
+
+        function fechar() {
+            lista.classList.add('d-none');
+            lista.innerHTML = '';
+            texto.setAttribute('aria-expanded', 'false');
+            ativo = -1;
+        }
+
+        function escolher(produto) {
+            oculto.value = produto.id;
+            texto.value = `${produto.nome} (Estoque: ${produto.estoque})`;
+            fechar();
+            oculto.dispatchEvent(new Event('change', { bubbles: true }));
+        }
+
+        function mostrar(produtos) {
+            lista.innerHTML = '';
+            if (!produtos.length) {
+                lista.innerHTML = '<span class="list-group-item text-muted">Nenhum produto encontrado</span>';
+            }
+            produtos.forEach(function(produto) {
+                const opcao = document.createElement('button');
+                opcao.type = 'button';
+                opcao.className = 'list-group-item list-group-item-action d-flex justify-content-between';
+                opcao.innerHTML = '<span></span><span class="badge bg-secondary"></span>';
+                opcao.children[0].textContent = produto.nome;
+                opcao.children[1].textContent = produto.estoque;
+                opcao.addEventListener('mousedown', function(e) {
+                    e.preventDefault();
+                    escolher(produto);
+                });
+                opcao.produto = produto;
+                lista.appendChild(opcao);
+            });
+            lista.classList.remove('d-none');
+            texto.setAttribute('aria-expanded', 'true');
+        }
+
+        function buscar() {
+            const termo = texto.value.trim();
+            if (termo.length < 2) {
+                fechar();
+                return;
+            }
+            if (requisicao) {
+                requisicao.abort();
+            }
+            requisicao = new AbortController();
+            const url = new URL(campo.dataset.url, window.location.origin);
+            url.searchParams.set('q', termo);
+            fetch(url, { signal: requisicao.signal, headers: { 'Accept': 'application/json' } })
+                .then(resposta => resposta.json())
+                .then(dados => mostrar(dados.resultados))
+                .catch(function(erro) {
+                    if (erro.name !== 'AbortError') {
+                        fechar();
+                    }
+                });
+        }
+
+        texto.addEventListener('input', function() {
+            // Texto alterado: a escolha anterior deixa de valer
+            oculto.value = '';
+            clearTimeout(espera);
+            espera = setTimeout(buscar, 200);
+        });
+
+        texto.addEventListener('keydown', function(e) {
+            const opcoes = lista.querySelectorAll('.list-group-item-action');
+            if (!opcoes.length) {
+                return;
+            }
+            if (e.key === 'ArrowDown' || e.key === 'ArrowUp') {
+                e.preventDefault();
+                ativo = (ativo + (e.key === 'ArrowDown' ? 1 : -1) + opcoes.length) % opcoes.length;
+                opcoes.forEach((opcao, indice) => opcao.classList.toggle('active', indice === ativo));
+            } else if (e.key === 'Enter' && ativo >= 0) {
+                e.preventDefault();
+                escolher(opcoes[ativo].produto);
+            } else if (e.key === 'Escape') {
+                fechar();
+            }
+        });
+
+        texto.addEventListener('blur', fechar);
+    });
+});
@@ -0,0 +1,9 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag
+def paginas_visiveis(page_obj, ao_redor=2, nas_pontas=1):
+    """Números de página ao redor da atual e nas pontas, com reticências no meio."""
+    return page_obj.paginator.get_elided_page_range(page_obj.number, on_each_side=ao_redor, on_ends=nas_pontas)
@@ -0,0 +1,1878 @@
+import base64
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F, Sum
+from django.forms import ValidationError
+from django.template.loader import render_to_string
+from django.test import (
+    Client, LiveServerTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import cache_relatorios, graficos
+from .estoque import obter_saldo, registrar_entrada, registrar_saida
+from .exportacao import linhas_transacoes
+from .arquivo import arquivar_itens, arquivar_transacoes
+from .carga import PASSOS, comparar
+from .busca import _indice_produtos, buscar_categorias, buscar_produtos, indexar_produtos
+from .fila_relatorios import executar, reservar_proxima
+from .importacao import (
+    MAXIMO_INTEIRO, TAMANHO_CATEGORIA, TAMANHO_LOTE, TAMANHO_NOME, importar_movimentos, importar_produtos,
+)
+from .paginacao import PaginadorKeyset
+from .forms import TransacaoForm
+from .instrumentacao import estatisticas, percentil
+from . import metricas
+from .consultas_lentas import normalizar, registro as registro_consultas
+from .models import (
+    ATIVO, INATIVO, Categoria, ConsumoLote, ConsumoLoteArquivado, FechamentoSaldoDiario, Item, ItemArquivado, Produto,
+    SaldoDiario, SaldoEstoque, TarefaRelatorio, TipoTransacao, Transacao, TransacaoArquivada,
+)
+from .medicao_paginas import IGNORADAS, ROTAS, STATUS_ESPERADO, medir, popular, rotas_do_projeto
+from .medicao_paginas import configuracoes as configuracoes_medicao
+from .rastreabilidade import rastrear_lote
+from .relatorios import montar_pdf_transacoes, montar_relatorio_transacoes, versao_transacoes
+from .saldos_diarios import fim_do_dia, inicio_do_dia, saldo_em, saldos_em
+from .utils import gerar_pdf, generate_bar_chart, generate_pie_chart
+from contratos.models import Cliente, HistoricoRenovacao, Sistema
+from contratos.relatorios import versao_contratos, versao_renovacao
+from pedido.models import CategoriaPedido, ClientePedido
+from pedido.relatorios import versao_pedidos
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcorrenciaSaidaTests(TransactionTestCase):
+    """Dispara saídas simultâneas do mesmo produto por criar_transacao."""
+
+    ESTOQUE_INICIAL = 150
+    THREADS = 20
+    REQUISICOES_POR_THREAD = 15
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('estoquista', password='senha-teste-123', is_staff=True)
+        self.entrada = TipoTransacao.objects.create(nome='Compra', entrada=True)
+        self.saida = TipoTransacao.objects.create(nome='Venda', entrada=False)
+        self.produto = Produto.objects.create(nome='Parafuso')
+
+        # Vários lotes pequenos para forçar consumos parciais e totais
+        for numero in range(1, 6):
+            form = TransacaoForm(
+                {
+                    'produto': self.produto.id,
+                    'tipo_transacao': self.entrada.id,
+                    'quantidade': self.ESTOQUE_INICIAL // 5,
+                    'lote': f'L{numero}',
+                },
+                user=self.usuario,
+            )
+            self.assertTrue(form.is_valid(), form.errors)
+            form.save()
+
+    def _disparar_saidas(self, indice, erros):
+        client = Client()
+        client.force_login(self.usuario)
+        try:
+            for requisicao in range(self.REQUISICOES_POR_THREAD):
+                resposta = client.post(reverse('criar_transacao'), {
+                    'produto': self.produto.id,
+                    'tipo_transacao': self.saida.id,
+                    'quantidade': (indice + requisicao) % 3 + 1,
+                })
+                if resposta.status_code not in (200, 302):
+                    erros.append(resposta.status_code)
+        except Exception as erro:
+            erros.append(erro)
+        finally:
+            connection.close()
+
+    def test_saidas_concorrentes_nunca_deixam_estoque_negativo(self):
+        erros = []
+        threads = [
+            threading.Thread(target=self._disparar_saidas, args=(indice, erros))
+            for indice in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(erros, [])
+
+        saldo = SaldoEstoque.objects.get(produto=self.produto)
+        total_lotes = Item.objects.filter(produto=self.produto).aggregate(total=Sum('quantidade'))['total']
+        total_saidas = Transacao.objects.filter(
+            produto=self.produto, tipo_transacao=self.saida
+        ).aggregate(total=Sum('quantidade'))['total'] or 0
+        total_consumido = ConsumoLote.objects.filter(
+            item__produto=self.produto
+        ).aggregate(total=Sum('quantidade'))['total'] or 0
+
+        self.assertGreaterEqual(saldo.quantidade, 0)
+        self.assertEqual(saldo.quantidade, total_lotes)
+        self.assertEqual(total_saidas, total_consumido)
+        self.assertEqual(self.ESTOQUE_INICIAL - total_saidas, saldo.quantidade)
+        # Há mais pedidos que estoque: o produto deve ter sido esgotado
+        self.assertLess(saldo.quantidade, 3)
+
+
+class LotesFifoTests(TestCase):
+    """Saídas consomem os lotes em ordem FIFO, registrando um ConsumoLote por lote."""
+
+    def setUp(self):
+        self.usuario = User.objects.create(username='fifo')
+        self.entrada = TipoTransacao.objects.create(nome='Compra', entrada=True)
+        self.saida = TipoTransacao.objects.create(nome='Venda', entrada=False)
+        self.produto = Produto.objects.create(nome='Parafuso')
+        agora = timezone.now()
+        self.lotes = []
+        for numero, quantidade in enumerate((3, 4, 5), start=1):
+            transacao = self._transacao(self.entrada, quantidade)
+            item = registrar_entrada(self.produto, transacao, f'L{numero}', quantidade)
+            # Lotes em ordem de chegada, mesmo com ids fora de ordem
+            Item.objects.filter(pk=item.pk).update(data_criacao=agora - timedelta(days=10 - numero))
+            self.lotes.append(item)
+
+    def _transacao(self, tipo, quantidade):
+        return Transacao.objects.create(
+            tipo_transacao=tipo, usuario=self.usuario, produto=self.produto, quantidade=quantidade,
+        )
+
+    def _sair(self, quantidade):
+        transacao = self._transacao(self.saida, quantidade)
+        with transaction.atomic():
+            registrar_saida(self.produto, transacao, quantidade)
+        return transacao
+
+    def _estado(self):
+        return list(Item.objects.filter(produto=self.produto).order_by('lote').values_list(
+            'lote', 'quantidade', 'quantidade_inicial', 'disponivel'
+        ))
+
+    def test_saida_dividida_entre_lotes(self):
+        saida = self._sair(8)
+
+        self.assertEqual(self._estado(), [
+            ('L1', 0, 3, False), ('L2', 0, 4, False), ('L3', 4, 5, True),
+        ])
+        consumos = ConsumoLote.objects.filter(transacao=saida).order_by('item__lote')
+        self.assertEqual(list(consumos.values_list('item__lote', 'quantidade')), [('L1', 3), ('L2', 4), ('L3', 1)])
+        self.assertEqual(SaldoEstoque.objects.get(produto=self.produto).quantidade, 4)
+        # Item.transacao continua sendo a entrada
+        self.assertTrue(all(item.transacao.tipo_transacao.entrada for item in Item.objects.all()))
+
+    def test_lote_esgotado_e_estoque_insuficiente(self):
+        self._sair(3)
+        self.assertEqual(self._estado()[0], ('L1', 0, 3, False))
+        self._sair(9)
+        self.assertEqual(self._estado(), [
+            ('L1', 0, 3, False), ('L2', 0, 4, False), ('L3', 0, 5, False),
+        ])
+        self.assertEqual(SaldoEstoque.objects.get(produto=self.produto).quantidade, 0)
+
+        saida = self._transacao(self.saida, 1)
+        with self.assertRaises(ValidationError), transaction.atomic():
+            registrar_saida(self.produto, saida, 1)
+        self.assertFalse(ConsumoLote.objects.filter(transacao=saida).exists())
+
+
+    def test_consultas_nao_dependem_da_quantidade(self):
+        # Saída em SQL por conjunto: as consultas são as mesmas para um lote ou para centenas
+        Item.objects.bulk_create([
+            Item(produto=self.produto, transacao=self.lotes[0].transacao, lote=f'M{numero}',
+                 quantidade=2, quantidade_inicial=2, disponivel=True)
+            for numero in range(250)
+        ])
+        SaldoEstoque.objects.filter(produto=self.produto).update(quantidade=F('quantidade') + 500)
+
+        consultas = []
+        # As duas esgotam lotes e consomem parte de um: 2 lotes ou 203
+        for quantidade in (4, 409):
+            transacao = self._transacao(self.saida, quantidade)
+            with CaptureQueriesContext(connection) as capturadas, transaction.atomic():
+                consumos = registrar_saida(self.produto, transacao, quantidade)
+            consultas.append(len(capturadas))
+            self.assertEqual(sum(consumo.quantidade for consumo in consumos), quantidade)
+
+        # Saldo sob lock, lotes, baixa dos esgotados, baixa do parcial, ConsumoLote e
+        # saldo, mais o savepoint e o release do atomic
+        self.assertEqual(consultas, [8, 8])
+        self.assertEqual(SaldoEstoque.objects.get(produto=self.produto).quantidade, 12 + 500 - 413)
+
+
+class AlertasEstoqueTests(TestCase):
+    """SaldoEstoque.em_alerta acompanha o saldo, o mínimo configurado e a situação do produto."""
+
+    def setUp(self):
+        _indice_produtos.limpar()
+        self.addCleanup(_indice_produtos.limpar)
+        self.usuario = User.objects.create_user('alertas', password='senha-teste-123', is_staff=True)
+        self.client.force_login(self.usuario)
+        self.entrada = TipoTransacao.objects.create(nome='Compra', entrada=True)
+        self.saida = TipoTransacao.objects.create(nome='Venda', entrada=False)
+        self.categoria = Categoria.objects.create(nome='Fixação')
+        self.produto = Produto.objects.create(nome='Parafuso', categoria=self.categoria, alerta_estoque_minimo=5)
+
+    def _transacao(self, tipo, quantidade, produto=None):
+        return Transacao.objects.create(
+            tipo_transacao=tipo, usuario=self.usuario, produto=produto or self.produto, quantidade=quantidade,
+        )
+
+    def _entrar(self, quantidade, produto=None):
+        produto = produto or self.produto
+        registrar_entrada(produto, self._transacao(self.entrada, quantidade, produto), 'L1', quantidade)
+
+    def _sair(self, quantidade):
+        with transaction.atomic():
+            registrar_saida(self.produto, self._transacao(self.saida, quantidade), quantidade)
+
+    def _em_alerta(self, produto=None):
+        return SaldoEstoque.objects.get(produto=produto or self.produto).em_alerta
+
+    def test_saldo_cruza_o_minimo(self):
+        self._entrar(8)
+        self.assertFalse(self._em_alerta())
+        self._sair(3)  # 5: no limite
+        self.assertTrue(self._em_alerta())
+        self._entrar(1)
+        self.assertFalse(self._em_alerta())
+        self._sair(2)
+        self.assertTrue(self._em_alerta())
+        # Sem estoque o produto sai dos alertas (não é mais "baixo", é zerado)
+        self._sair(4)
+        self.assertFalse(self._em_alerta())
+
+    def _editar(self, minimo):
+        resposta = self.client.post(reverse('editar_produto', args=[self.produto.pk]), {
+            'nome': self.produto.nome, 'descricao': '', 'categoria': self.categoria.pk,
+            'alerta_estoque_minimo': minimo,
+        })
+        self.assertRedirects(resposta, reverse('listar_produtos'), fetch_redirect_response=False)
+
+    def test_edicao_do_minimo(self):
+        self._entrar(8)
+        self._editar(10)
+        self.assertTrue(self._em_alerta())
+        self._editar(7)
+        self.assertFalse(self._em_alerta())
+        self._editar('')
+        self.assertFalse(self._em_alerta())
+
+    def test_produto_inativado(self):
+        self._entrar(3)
+        self.assertTrue(self._em_alerta())
+
+        # Com estoque o produto não é inativado e o alerta continua
+        self.client.post(reverse('excluir_produto', args=[self.produto.pk]))
+        self.assertEqual(Produto.objects.get(pk=self.produto.pk).ativo, ATIVO)
+        self.assertTrue(self._em_alerta())
+
+        # Lotes baixados com o saldo materializado ainda por recalcular: a inativação
+        # reavalia o índice em vez de confiar no valor gravado
+        Item.objects.filter(produto=self.produto).update(disponivel=False)
+        self.client.post(reverse('excluir_produto', args=[self.produto.pk]))
+        self.assertEqual(Produto.objects.get(pk=self.produto.pk).ativo, INATIVO)
+        self.assertFalse(self._em_alerta())
+
+        # Entradas num produto inativo não o colocam de volta nos alertas
+        self.produto.refresh_from_db()
+        self._entrar(1)
+        self.assertFalse(self._em_alerta())
+
+    def _popular_alertas(self, quantidade):
+        for i in range(quantidade):
+            produto = Produto.objects.create(
+                nome=f'Produto {i:02d}', categoria=self.categoria if i % 2 else None, alerta_estoque_minimo=50,
+            )
+            self._entrar(i + 1, produto)
+        # Fora dos alertas: acima do mínimo e sem mínimo configurado
+        self._entrar(20)
+        self._entrar(1, Produto.objects.create(nome='Sem mínimo'))
+
+    def test_listagens_de_alertas(self):
+        self._popular_alertas(3)
+        resposta = self.client.get(reverse('alertas_estoque_json'))
+        self.assertEqual(resposta.json(), {
+            'total': 3,
+            'pagina': 1,
+            'num_paginas': 1,
+            'resultados': [
+                {
+                    'produto_id': Produto.objects.get(nome=f'Produto {i:02d}').pk,
+                    'nome': f'Produto {i:02d}',
+                    'categoria': 'Fixação' if i % 2 else None,
+                    'estoque': i + 1,
+                    'alerta_estoque_minimo': 50,
+                }
+                for i in range(3)
+            ],
+        })
+        resposta = self.client.get(reverse('alertas_estoque'))
+        self.assertEqual([saldo.produto.nome for saldo in resposta.context['page_obj']], [
+            'Produto 00', 'Produto 01', 'Produto 02',
+        ])
+
+    def test_consultas_das_listagens(self):
+        self._popular_alertas(25)
+        # Sessão, usuário, contagem e a página com produto e categoria por JOIN
+        for url in (reverse('alertas_estoque'), reverse('alertas_estoque_json')):
+            for pagina in (1, 2):
+                with self.assertNumQueries(4):
+                    resposta = self.client.get(url, {'page': pagina})
+                self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(len(resposta.json()['resultados']), 5)
+
+
+class SaldoEstoqueTests(TestCase):
+    """O saldo materializado acompanha a soma dos lotes disponíveis; recalcular_saldos o reconstrói."""
+
+    def setUp(self):
+        self.usuario = User.objects.create(username='saldos')
+        self.entrada = TipoTransacao.objects.create(nome='Compra', entrada=True)
+        self.saida = TipoTransacao.objects.create(nome='Venda', entrada=False)
+        self.produto = Produto.objects.create(nome='Parafuso', alerta_estoque_minimo=5)
+
+    def _transacao(self, tipo, quantidade, produto=None):
+        return Transacao.objects.create(
+            tipo_transacao=tipo, usuario=self.usuario, produto=produto or self.produto, quantidade=quantidade,
+        )
+
+    def _entrar(self, quantidade, produto=None):
+        produto = produto or self.produto
+        registrar_entrada(produto, self._transacao(self.entrada, quantidade, produto), 'L1', quantidade)
+
+    def _sair(self, quantidade):
+        with transaction.atomic():
+            registrar_saida(self.produto, self._transacao(self.saida, quantidade), quantidade)
+
+    def _saldo(self, produto=None):
+        return SaldoEstoque.objects.get(produto=produto or self.produto).quantidade
+
+    def _lotes(self, produto=None):
+        return Item.objects.filter(produto=produto or self.produto, disponivel=True)\
+            .aggregate(total=Sum('quantidade'))['total'] or 0
+
+    def test_saldo_igual_aos_lotes(self):
+        self.assertEqual(obter_saldo(self.produto).quantidade, 0)
+        self._entrar(7)
+        self.assertEqual((self._saldo(), self._lotes()), (7, 7))
+        self._entrar(4)
+        self._sair(9)
+        self.assertEqual((self._saldo(), self._lotes()), (2, 2))
+        self.assertEqual(obter_saldo(self.produto).quantidade, 2)
+
+    def test_saida_desfeita(self):
+        self._entrar(6)
+
+        # Estoque insuficiente: nada é baixado
+        with self.assertRaises(ValidationError), transaction.atomic():
+            registrar_saida(self.produto, self._transacao(self.saida, 7), 7)
+        self.assertEqual((self._saldo(), self._lotes()), (6, 6))
+
+        # Erro depois da baixa, na mesma transação: o rollback desfaz lotes e saldo juntos
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            registrar_saida(self.produto, self._transacao(self.saida, 4), 4)
+            self.assertEqual(self._saldo(), 2)
+            raise RuntimeError
+        self.assertEqual((self._saldo(), self._lotes()), (6, 6))
+        self.assertFalse(SaldoEstoque.objects.get(produto=self.produto).em_alerta)
+
+    def _divergir(self):
+        """Deixa um saldo errado, um índice de alerta errado e um produto sem SaldoEstoque."""
+        outro = Produto.objects.create(nome='Porca')
+        self._entrar(8)
+        self._entrar(3, outro)
+        SaldoEstoque.objects.filter(produto=self.produto).update(quantidade=4)
+        SaldoEstoque.objects.filter(produto=outro).update(em_alerta=True)
+        sem_saldo = Produto.objects.create(nome='Arruela')
+        Item.objects.create(
+            produto=sem_saldo, transacao=self._transacao(self.entrada, 2, sem_saldo), lote='L1',
+            quantidade=2, quantidade_inicial=2, disponivel=True,
+        )
+        return outro, sem_saldo
+
+    def test_recalcular_saldos(self):
+        outro, sem_saldo = self._divergir()
+        saida = io.StringIO()
+        call_command('recalcular_saldos', stdout=saida)
+
+        self.assertIn('1 criado(s), 2 corrigido(s)', saida.getvalue())
+        for produto in (self.produto, outro, sem_saldo):
+            self.assertEqual(self._saldo(produto), self._lotes(produto))
+        self.assertFalse(SaldoEstoque.objects.get(produto=outro).em_alerta)
+
+        # Uma segunda execução não encontra mais nada
+        saida = io.StringIO()
+        call_command('recalcular_saldos', '--verificar', stdout=saida)
+        self.assertIn('Todos os saldos conferem', saida.getvalue())
+
+    def test_verificar_nao_grava(self):
+        outro, sem_saldo = self._divergir()
+        antes = list(SaldoEstoque.objects.order_by('pk').values_list(
+            'produto', 'quantidade', 'em_alerta', 'ultima_atualizacao',
+        ))
+        saida = io.StringIO()
+        with self.assertRaisesMessage(CommandError, '2 saldo(s) divergente(s)'):
+            call_command('recalcular_saldos', '--verificar', stdout=saida)
+
+        self.assertIn(f'Produto {self.produto.pk}: saldo 4, itens disponíveis 8', saida.getvalue())
+        self.assertIn(f'Produto {sem_saldo.pk}: saldo 0, itens disponíveis 2', saida.getvalue())
+        self.assertEqual(list(SaldoEstoque.objects.order_by('pk').values_list(
+            'produto', 'quantidade', 'em_alerta', 'ultima_atualizacao',
+        )), antes)
+
+
+class MigracaoLotesLegadosTests(TransactionTestCase):
+    """A migração 0008 junta os itens unitários antigos em lotes ligados à entrada."""
+
+    antes = [('inventario', '0007_saldoestoque_em_alerta')]
+    depois = [('inventario', '0008_item_lote_quantidade')]
+
+    def _migrar(self, alvo):
+        executor = MigrationExecutor(connection)
+        executor.migrate(alvo)
+        return executor.loader.project_state(alvo).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_itens_unitarios_viram_lotes(self):
+        apps = self._migrar(self.antes)
+        Transacao = apps.get_model('inventario', 'Transacao')
+        Item = apps.get_model('inventario', 'Item')
+        usuario = apps.get_model('auth', 'User').objects.create(username='legado')
+        produto = apps.get_model('inventario', 'Produto').objects.create(nome='Parafuso')
+        tipos = apps.get_model('inventario', 'TipoTransacao').objects
+        compra, venda = tipos.create(nome='Compra', entrada=True), tipos.create(nome='Venda', entrada=False)
+        inicio = timezone.now() - timedelta(days=30)
+
+        def transacao(tipo, quantidade, dias):
+            return Transacao.objects.create(
+                tipo_transacao=tipo, usuario=usuario, produto=produto, quantidade=quantidade,
+                data=inicio + timedelta(days=dias),
+            )
+
+        # Modelo antigo: uma linha por unidade; a saída sobrescrevia `transacao` do item baixado
+        entrada_a, entrada_b = transacao(compra, 3, 0), transacao(compra, 2, 1)
+        saida = transacao(venda, 4, 2)
+        for entrada, lote in ((entrada_a, 'A'), (entrada_b, 'B')):
+            for unidade in range(entrada.quantidade):
+                Item.objects.create(
+                    produto=produto, transacao=entrada, lote=lote,
+                    data_criacao=entrada.data + timedelta(seconds=unidade + 1),
+                )
+        baixados = Item.objects.order_by('data_criacao')[:4]
+        Item.objects.filter(pk__in=[item.pk for item in baixados]).update(disponivel=False, transacao=saida)
+
+        apps = self._migrar(self.depois)
+        Item = apps.get_model('inventario', 'Item')
+        ConsumoLote = apps.get_model('inventario', 'ConsumoLote')
+
+        self.assertEqual(
+            list(Item.objects.order_by('lote').values_list(
+                'lote', 'transacao_id', 'quantidade', 'quantidade_inicial', 'disponivel'
+            )),
+            [('A', entrada_a.pk, 0, 3, False), ('B', entrada_b.pk, 1, 2, True)],
+        )
+        self.assertEqual(
+            sorted(ConsumoLote.objects.values_list('item__lote', 'transacao_id', 'quantidade')),
+            [('A', saida.pk, 3), ('B', saida.pk, 1)],
+        )
+
+        # Com o esquema atual, o rastreio mostra a entrada e a saída uma vez cada
+        self._migrar(MigrationExecutor(connection).loader.graph.leaf_nodes())
+        movimentos = [(m['transacao_id'], m['quantidade']) for m in rastrear_lote('A')[0]['movimentos']]
+        self.assertEqual(movimentos, [(entrada_a.pk, 3), (saida.pk, 3)])
+
+
+class RelatorioTransacoesConsultasTests(TestCase):
+    """O número de consultas do relatório não pode crescer com o período."""
+
+    def _popular(self, quantidade):
+        entrada = TipoTransacao.objects.create(nome='Compra', entrada=True)
+        saida = TipoTransacao.objects.create(nome='Venda', entrada=False)
+        usuarios = [User.objects.create(username=f'usuario{i}') for i in range(3)]
+        produtos = [Produto.objects.create(nome=f'Produto {i}') for i in range(5)]
+        agora = timezone.now()
+        Transacao.objects.bulk_create([
+            Transacao(
+                tipo_transacao=entrada if i % 3 else saida,
+                usuario=usuarios[i % len(usuarios)],
+                produto=produtos[i % len(produtos)],
+                quantidade=i + 1,
+                data=agora - timedelta(hours=i),
+            )
+            for i in range(quantidade)
+        ])
+        return agora - timedelta(days=30), agora
+
+    def _verificar(self, quantidade):
+        inicio, fim = self._popular(quantidade)
+
+        # Agregação na tabela principal e na de arquivo, a lista de transações e
+        # o saldo de abertura (SaldoDiario e o movimento nas duas tabelas)
+        with self.assertNumQueries(6):
+            dados = montar_relatorio_transacoes(inicio, fim)
+
+        esperado_entradas = sum(i + 1 for i in range(quantidade) if i % 3)
+        esperado_saidas = sum(i + 1 for i in range(quantidade) if not i % 3)
+        self.assertEqual(len(dados['transacoes']), quantidade)
+        self.assertEqual(dados['total_entradas'], esperado_entradas)
+        self.assertEqual(dados['total_saidas'], esperado_saidas)
+        self.assertEqual(
+            sum(linha['total_quantidade'] for linha in dados['entradas_por_produto']),
+            esperado_entradas,
+        )
+
+        # O template não pode disparar consultas por linha (tipo, produto, usuário)
+        with self.assertNumQueries(0):
+            render_to_string('pdf_template.html', dict(dados, data_inicio=inicio, data_fim=fim))
+
+    def test_relatorio_pequeno(self):
+        self._verificar(5)
+
+    def test_relatorio_grande(self):
+        self._verificar(200)
+
+
+class GraficosSvgTests(TestCase):
+    """Estrutura dos gráficos em SVG e o caminho até o PDF."""
+
+    def _dados(self, quantidade):
+        return [
+            {'produto__nome': f'Produto {i}', 'total_quantidade': i + 1}
+            for i in range(quantidade)
+        ]
+
+    def test_pizza(self):
+        svg = graficos.pie_svg(self._dados(4), 'Entradas por Produto')
+        self.assertTrue(svg.startswith('<svg xmlns="http://www.w3.org/2000/svg"'))
+        self.assertTrue(svg.endswith('</svg>'))
+        self.assertIn('Entradas por Produto', svg)
+        # Uma fatia e um item de legenda por produto
+        self.assertEqual(svg.count('<path '), 4)
+        self.assertEqual(svg.count('<rect x="360"'), 4)
+
+        # Um único produto ocupa o círculo inteiro
+        svg = graficos.pie_svg(self._dados(1), 'Único')
+        self.assertEqual((svg.count('<circle '), svg.count('<path ')), (1, 0))
+
+        # Além de MAXIMO_FATIAS, o excedente vira "Outros"
+        svg = graficos.pie_svg(self._dados(15), 'Muitos')
+        self.assertEqual(svg.count('<path '), graficos.MAXIMO_FATIAS)
+        self.assertIn('Outros (', svg)
+
+    def test_barras(self):
+        svg = graficos.bar_svg(self._dados(3), 'Saídas por Produto')
+        self.assertTrue(svg.startswith('<svg '))
+        self.assertEqual(svg.count('<rect '), 3)
+        # Maior valor primeiro
+        self.assertLess(svg.index('Produto 2'), svg.index('Produto 0'))
+
+        svg = graficos.bar_svg(self._dados(15), 'Muitos')
+        self.assertEqual(svg.count('<rect '), graficos.MAXIMO_FATIAS)
+        self.assertIn('>Outros<', svg)
+
+    def test_sem_dados(self):
+        zerados = [
+            {'produto__nome': 'Produto', 'total_quantidade': 0},
+            {'produto__nome': 'Outro', 'total_quantidade': None},
+        ]
+        for funcao in (graficos.pie_svg, graficos.bar_svg):
+            self.assertIsNone(funcao([], 'Vazio'))
+            self.assertIsNone(funcao(zerados, 'Zerado'))
+        self.assertIsNone(generate_pie_chart([], 'Vazio'))
+        self.assertIsNone(generate_bar_chart(zerados, 'Zerado'))
+        self.assertIsNone(graficos.para_base64(None))
+
+    def test_base64_e_pdf(self):
+        dados = self._dados(3)
+        svg = graficos.pie_svg(dados, 'Entradas – ação')
+        self.assertEqual(base64.b64decode(graficos.para_base64(svg)).decode('utf-8'), svg)
+        self.assertEqual(generate_pie_chart(dados, 'Entradas – ação'), graficos.para_base64(svg))
+        self.assertEqual(
+            base64.b64decode(generate_bar_chart(dados, 'Saídas')).decode('utf-8'),
+            graficos.bar_svg(dados, 'Saídas'),
+        )
+
+        # O caminho do relatório de transações: os gráficos só aparecem quando há transações
+        usuario = User.objects.create(username='graficos')
+        entrada = TipoTransacao.objects.create(nome='Compra', entrada=True)
+        for i in range(3):
+            Transacao.objects.create(
+                tipo_transacao=entrada, usuario=usuario, quantidade=i + 1,
+                produto=Produto.objects.create(nome=f'Produto {i}'),
+            )
+        hoje = timezone.localdate().isoformat()
+        template, contexto, _ = montar_pdf_transacoes({'data_inicio': hoje, 'data_fim': hoje}, usuario)
+        self.assertIsNotNone(contexto['chart_entradas'])
+        self.assertIsNone(contexto['chart_saidas'])
+
+        com_graficos = gerar_pdf(template, contexto)
+        sem_graficos = gerar_pdf(template, dict(contexto, chart_entradas=None))
+        self.assertTrue(com_graficos.startswith(b'%PDF'))
+        # Os gráficos entram como desenho vetorial, não são descartados pelo xhtml2pdf
+        self.assertGreater(len(com_graficos), len(sem_graficos))
+
+
+class ImportacaoCsvTests(TestCase):
+    """Importação de CSV: linhas inválidas viram erros da própria linha e o resto do arquivo é gravado."""
+
+    def setUp(self):
+        _indice_produtos.limpar()
+        self.addCleanup(_indice_produtos.limpar)
+        self.usuario = User.objects.create_user('importacao')
+        self.entrada = TipoTransacao.objects.create(nome='Compra', entrada=True)
+        self.saida = TipoTransacao.objects.create(nome='Venda', entrada=False)
+
+    def test_produtos(self):
+        Categoria.objects.create(nome='Fixação')
+        arquivo = io.StringIO(
+            'Nome;Categoria;Alerta_estoque_minimo\n'
+            'Parafuso;Fixação;5\n'
+            ';Fixação;\n'
+            'Porca;Ferragens;abc\n'
+            'Arruela;Ferragens;\n'
+            f'Rebite;Ferragens;{MAXIMO_INTEIRO + 1}\n'
+            'Prego;Ferragens;99999999999999999999\n'
+            'Parafuso;Ferragens;\n'
+        )
+        resultado = importar_produtos(arquivo, self.usuario, tamanho_bloco=2)
+
+        self.assertEqual((resultado.linhas, resultado.importadas, resultado.total_erros), (7, 3, 4))
+        self.assertEqual([linha for linha, _ in resultado.erros], [3, 4, 6, 7])
+        self.assertIn("'nome' é obrigatório", resultado.erros[0][1])
+        self.assertIn('no máximo', resultado.erros[2][1])
+        # Categoria nova repetida em vários blocos é criada uma vez; nomes repetidos de produto são aceitos
+        self.assertEqual(Categoria.objects.filter(nome='Ferragens').count(), 1)
+        self.assertEqual(Categoria.objects.filter(nome='Fixação').count(), 1)
+        self.assertEqual(Produto.objects.filter(nome='Parafuso').count(), 2)
+        parafuso = Produto.objects.filter(nome='Parafuso').order_by('id').first()
+        self.assertEqual((parafuso.categoria.nome, parafuso.alerta_estoque_minimo), ('Fixação', 5))
+
+    def test_movimentos(self):
+        parafuso = Produto.objects.create(nome='Parafuso')
+        duplicado = Produto.objects.create(nome='Parafuso')
+        porca = Produto.objects.create(nome='Porca')
+        arquivo = io.StringIO(
+            'produto,tipo,quantidade,lote,data\n'
+            'Parafuso,Compra,10,L1,2026-01-01\n'
+            f'{porca.pk},{self.entrada.pk},4,L2,02/01/2026\n'
+            'Parafuso,Compra,5,L3,2026-01-03\n'
+            'Parafuso,Venda,12,,2026-01-04\n'
+            'Inexistente,Compra,1,L4,\n'
+            'Porca,Doação,1,L5,\n'
+            'Porca,Compra,99999999999999999999,L6,\n'
+            'Porca,Compra,3,,\n'
+            'Porca,Venda,5,,\n'
+            'Porca,Compra,1,L7,31/02/2026\n'
+            'Porca,Venda,1,,\n'
+        )
+        resultado = importar_movimentos(arquivo, self.usuario, tamanho_bloco=3)
+
+        self.assertEqual((resultado.linhas, resultado.importadas, resultado.total_erros), (11, 5, 6))
+        erros = dict(resultado.erros)
+        self.assertEqual(sorted(erros), [6, 7, 8, 9, 10, 11])
+        self.assertIn("'Inexistente' não encontrado", erros[6])
+        self.assertIn("'Doação' não encontrado", erros[7])
+        self.assertIn('no máximo', erros[8])
+        self.assertIn('lote', erros[9])
+        self.assertIn('Estoque insuficiente', erros[10])
+        self.assertIn('formato', erros[11])
+
+        # Nome repetido resolve para o produto de menor id
+        self.assertFalse(Transacao.objects.filter(produto=duplicado).exists())
+        # A saída de 12 esgota L1 e consome 2 de L3 (FIFO pela data do lote)
+        lotes = Item.objects.filter(produto=parafuso).order_by('lote')
+        self.assertEqual(
+            list(lotes.values_list('lote', 'quantidade', 'disponivel')), [('L1', 0, False), ('L3', 3, True)],
+        )
+        self.assertEqual(SaldoEstoque.objects.get(produto=parafuso).quantidade, 3)
+        # A saída acima do estoque não deixa transação nem consumo para trás
+        self.assertEqual(SaldoEstoque.objects.get(produto=porca).quantidade, 3)
+        self.assertEqual(Transacao.objects.filter(produto=porca).count(), 2)
+        self.assertEqual(ConsumoLote.objects.filter(item__produto=porca).count(), 1)
+        self.assertIn(parafuso.pk, buscar_produtos('L3'))
+
+    def test_textos_acima_do_tamanho_da_coluna(self):
+        arquivo = io.StringIO(
+            'nome,categoria\n'
+            f'{"P" * TAMANHO_NOME},Fixação\n'
+            f'{"P" * (TAMANHO_NOME + 1)},Fixação\n'
+            f'Porca,{"C" * (TAMANHO_CATEGORIA + 1)}\n'
+        )
+        resultado = importar_produtos(arquivo, self.usuario)
+        self.assertEqual((resultado.importadas, [linha for linha, _ in resultado.erros]), (1, [3, 4]))
+        self.assertIn(f"'nome' deve ter no máximo {TAMANHO_NOME} caracteres", resultado.erros[0][1])
+        self.assertIn("'categoria' deve ter no máximo", resultado.erros[1][1])
+        self.assertEqual(list(Categoria.objects.values_list('nome', flat=True)), ['Fixação'])
+
+        Produto.objects.create(nome='Parafuso')
+        arquivo = io.StringIO(f'produto,tipo,quantidade,lote\nParafuso,Compra,1,{"L" * (TAMANHO_LOTE + 1)}\n')
+        resultado = importar_movimentos(arquivo, self.usuario)
+        self.assertIn("'lote' deve ter no máximo", resultado.erros[0][1])
+        self.assertFalse(Item.objects.exists())
+
+    def test_arquivo_malformado(self):
+        conteudo = 'nome\nParafuso\nPorca\nArruela\n"Rebite\nPrego\n'
+        resultado = importar_produtos(io.StringIO(conteudo), self.usuario, tamanho_bloco=2)
+        # As linhas antes do erro são gravadas; a leitura para na aspa sem fechar
+        self.assertEqual((resultado.linhas, resultado.importadas), (3, 3))
+        self.assertIn('Arquivo CSV inválido na linha', resultado.erro_arquivo)
+        self.assertEqual(sorted(Produto.objects.values_list('nome', flat=True)), ['Arruela', 'Parafuso', 'Porca'])
+        # e indexadas na busca, mesmo com a leitura interrompida
+        self.assertTrue(buscar_produtos('arruela'))
+
+        grande = f'produto,tipo,quantidade,lote\nParafuso,Compra,1,"{"L" * (csv.field_size_limit() + 1)}"\n'
+        resultado = importar_movimentos(io.StringIO(grande), self.usuario)
+        self.assertEqual(resultado.linhas, 0)
+        self.assertIn('field larger than field limit', resultado.erro_arquivo)
+
+        # Na tela vira erro do formulário; no comando, falha do comando
+        self.usuario.is_staff = True
+        self.usuario.save()
+        self.client.force_login(self.usuario)
+        envio = SimpleUploadedFile('produtos.csv', 'nome\nBucha\n"Aberta\n'.encode())
+        resposta = self.client.post(reverse('importar_csv'), {'tipo': 'produtos', 'arquivo': envio})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn('Arquivo CSV inválido na linha', resposta.context['form'].errors['arquivo'][0])
+        self.assertTrue(Produto.objects.filter(nome='Bucha').exists())
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as arquivo:
+            arquivo.write('nome\nBucha\n"Aberta\n')
+        self.addCleanup(os.remove, arquivo.name)
+        with self.assertRaisesMessage(CommandError, 'Arquivo CSV inválido'):
+            call_command('importar_csv', 'produtos', arquivo.name, usuario='importacao', stdout=io.StringIO())
+
+
+class FilaRelatoriosTests(TestCase):
+    """Relatórios acima do limite vão para a fila e são baixados depois de processados."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('relatorios', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        configuracao = override_settings(
+            RELATORIOS_DIR=diretorio.name,
+            RELATORIOS_CACHE_DIR=os.path.join(diretorio.name, 'cache'),
+            RELATORIO_LIMITE_SINCRONO=0,
+        )
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        self.entrada = TipoTransacao.objects.create(nome='Compra', entrada=True)
+        self.produto = Produto.objects.create(nome='Parafuso')
+        Transacao.objects.create(tipo_transacao=self.entrada, usuario=self.usuario, produto=self.produto, quantidade=3)
+
+    def test_relatorio_grande_e_gerado_pelo_worker(self):
+        hoje = timezone.localdate().isoformat()
+        resposta = self.client.post(reverse('relatorio_transacoes'), {'data_inicio': hoje, 'data_fim': hoje})
+
+        tarefa = TarefaRelatorio.objects.get()
+        self.assertRedirects(resposta, reverse('status_relatorio', args=[tarefa.pk]))
+        self.assertEqual(tarefa.status, TarefaRelatorio.PENDENTE)
+
+        # Mesmo passo do run_report_worker (o comando fecha conexões, o que o TestCase não permite)
+        executar(reservar_proxima())
+
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, TarefaRelatorio.CONCLUIDA)
+        resposta = self.client.get(reverse('download_relatorio', args=[tarefa.pk]))
+        self.assertEqual(resposta['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(resposta.streaming_content).startswith(b'%PDF'))
+
+        # Outro usuário não enxerga a tarefa
+        self.client.force_login(User.objects.create_user('outro'))
+        self.assertEqual(self.client.get(reverse('download_relatorio', args=[tarefa.pk])).status_code, 404)
+
+    def test_relatorio_pequeno_continua_sincrono(self):
+        hoje = timezone.localdate().isoformat()
+        with override_settings(RELATORIO_LIMITE_SINCRONO=100):
+            resposta = self.client.post(reverse('relatorio_transacoes'), {'data_inicio': hoje, 'data_fim': hoje})
+
+        self.assertEqual(resposta['Content-Type'], 'application/pdf')
+        self.assertFalse(TarefaRelatorio.objects.exists())
+
+    def test_cache_por_versao_dos_dados(self):
+        ontem = (timezone.localdate() - timedelta(days=1)).isoformat()
+        hoje = timezone.localdate().isoformat()
+        dados = {'data_inicio': ontem, 'data_fim': hoje}
+
+        with override_settings(RELATORIO_LIMITE_SINCRONO=100):
+            primeira = self.client.post(reverse('relatorio_transacoes'), dados)
+            etag = primeira['ETag']
+
+            # Mesmo período e mesmos dados: vem do cache, sem montar o relatório
+            # Sessão e usuário, mais as três agregações da versão
+            with self.assertNumQueries(5):
+                segunda = self.client.post(reverse('relatorio_transacoes'), dados, HTTP_IF_NONE_MATCH='"outro"')
+            self.assertEqual(segunda['ETag'], etag)
+            self.assertEqual(b''.join(segunda.streaming_content), primeira.content)
+
+            self.assertEqual(
+                self.client.post(reverse('relatorio_transacoes'), dados, HTTP_IF_NONE_MATCH=etag).status_code, 304
+            )
+
+            # Lançamento retroativo no período muda a versão
+            Transacao.objects.create(
+                tipo_transacao=self.entrada, usuario=self.usuario, produto=self.produto, quantidade=1,
+                data=timezone.now() - timedelta(days=1),
+            )
+            terceira = self.client.post(reverse('relatorio_transacoes'), dados)
+            self.assertNotEqual(terceira['ETag'], etag)
+
+    def test_cache_muda_com_transacao_anterior_ao_periodo(self):
+        # A coluna de saldo soma o histórico anterior ao período: mexer nele invalida o PDF
+        hoje = timezone.localdate().isoformat()
+        dados = {'data_inicio': hoje, 'data_fim': hoje}
+
+        with override_settings(RELATORIO_LIMITE_SINCRONO=100):
+            etag = self.client.post(reverse('relatorio_transacoes'), dados)['ETag']
+
+            antiga = Transacao.objects.create(
+                tipo_transacao=self.entrada, usuario=self.usuario, produto=self.produto, quantidade=7,
+                data=timezone.now() - timedelta(days=30),
+            )
+            resposta = self.client.post(reverse('relatorio_transacoes'), dados, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resposta.status_code, 200)
+            self.assertNotEqual(resposta['ETag'], etag)
+            etag = resposta['ETag']
+
+            # Edição retroativa de uma linha que não é a de maior id
+            Transacao.objects.filter(pk=antiga.pk).update(quantidade=8, ultima_alteracao=timezone.now())
+            resposta = self.client.post(reverse('relatorio_transacoes'), dados, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resposta.status_code, 200)
+            self.assertNotEqual(resposta['ETag'], etag)
+
+    def test_poda_lru(self):
+        for indice in range(4):
+            cache_relatorios.guardar(f'chave{indice}', 'relatorio.pdf', b'x' * 1000)
+            # mtime distinto para cada entrada, do mais antigo ao mais novo
+            os.utime(os.path.join(settings.RELATORIOS_CACHE_DIR, f'chave{indice}'), (indice, indice))
+        cache_relatorios.obter('chave0')  # acesso recente: não deve ser podada
+
+        self.assertEqual(cache_relatorios.podar(limite_bytes=2500), 2)
+        self.assertIsNotNone(cache_relatorios.obter('chave0'))
+        self.assertIsNone(cache_relatorios.obter('chave1'))
+        self.assertIsNone(cache_relatorios.obter('chave2'))
+        self.assertIsNotNone(cache_relatorios.obter('chave3'))
+
+
+class ArquivoHistoricoTests(TestCase):
+    """Lotes consumidos e transações arquivadas antigas saem das tabelas principais sem sumir dos relatórios."""
+
+    def setUp(self):
+        usuario = User.objects.create(username='arquivo')
+        self.produto = Produto.objects.create(nome='Parafuso')
+        entrada = TipoTransacao.objects.create(nome='Compra', entrada=True)
+        saida = TipoTransacao.objects.create(nome='Venda', entrada=False)
+        self.antiga = timezone.now() - timedelta(days=400)
+
+        def transacao(tipo, quantidade, data, arquivada=True):
+            return Transacao.objects.create(
+                tipo_transacao=tipo, usuario=usuario, produto=self.produto, quantidade=quantidade,
+                data=data, arquivada=arquivada,
+            )
+
+        # Lote antigo totalmente consumido: vai para o arquivo com a entrada e a saída
+        self.entrada_antiga = transacao(entrada, 5, self.antiga)
+        lote = Item.objects.create(
+            produto=self.produto, transacao=self.entrada_antiga, lote='L1', quantidade=0,
+            quantidade_inicial=5, disponivel=False,
+        )
+        saida_antiga = transacao(saida, 5, self.antiga + timedelta(days=1))
+        ConsumoLote.objects.create(item=lote, transacao=saida_antiga, quantidade=5)
+
+        # Lote antigo ainda com saldo: fica, e a sua entrada também
+        self.entrada_em_uso = transacao(entrada, 3, self.antiga)
+        Item.objects.create(
+            produto=self.produto, transacao=self.entrada_em_uso, lote='L2', quantidade=3,
+            quantidade_inicial=3, disponivel=True,
+        )
+        # Transação recente e não arquivada: fica
+        transacao(entrada, 2, timezone.now(), arquivada=False)
+
+    def test_arquivamento_preserva_relatorio(self):
+        inicio, fim = self.antiga - timedelta(days=1), timezone.now()
+        antes = montar_relatorio_transacoes(inicio, fim)
+
+        corte = timezone.now() - timedelta(days=180)
+        self.assertEqual(arquivar_itens(corte, tamanho_lote=1), 1)
+        self.assertEqual(arquivar_transacoes(corte, tamanho_lote=1), 2)
+
+        self.assertEqual(Item.objects.count(), 1)
+        self.assertFalse(ConsumoLote.objects.exists())
+        self.assertEqual(ItemArquivado.objects.get().transacao_id, self.entrada_antiga.pk)
+        self.assertEqual(ConsumoLoteArquivado.objects.count(), 1)
+        self.assertEqual(
+            set(Transacao.objects.values_list('quantidade', flat=True)), {3, 2}
+        )
+        self.assertTrue(TransacaoArquivada.objects.filter(pk=self.entrada_antiga.pk).exists())
+
+        # Com linhas no arquivo, o relatório também lê a lista arquivada
+        with self.assertNumQueries(7):
+            depois = montar_relatorio_transacoes(inicio, fim)
+        for campo in ('total_entradas', 'total_saidas', 'saldo'):
+            self.assertEqual(depois[campo], antes[campo])
+        self.assertEqual(
+            [t.pk for t in depois['transacoes']], [t.pk for t in antes['transacoes']]
+        )
+        self.assertEqual(
+            [t.saldo_apos for t in depois['transacoes']], [t.saldo_apos for t in antes['transacoes']]
+        )
+
+        # Rodar de novo não move nada
+        self.assertEqual(arquivar_itens(corte) + arquivar_transacoes(corte), 0)
+
+    def test_excluir_produto_com_historico_arquivado(self):
+        corte = timezone.now() - timedelta(days=180)
+        outro = Produto.objects.create(nome='Arruela')
+        usuario = User.objects.get(username='arquivo')
+        entrada, saida = TipoTransacao.objects.order_by('id')[:2]
+        for tipo in (entrada, saida):
+            Transacao.objects.create(
+                tipo_transacao=tipo, usuario=usuario, produto=outro, quantidade=1, data=self.antiga, arquivada=True,
+            )
+        arquivar_transacoes(corte)
+        self.assertFalse(Transacao.objects.filter(produto=outro).exists())
+
+        usuario.is_staff = True
+        usuario.save()
+        self.client.force_login(usuario)
+        resposta = self.client.post(reverse('excluir_produto', args=[outro.pk]), follow=True)
+
+        outro.refresh_from_db()
+        self.assertEqual(outro.ativo, INATIVO)
+        self.assertNotIn('Erro ao tentar excluir', resposta.content.decode())
+        self.assertEqual(TransacaoArquivada.objects.filter(produto=outro).count(), 2)
+
+    def test_ids_acima_de_32_bits(self):
+        # As tabelas de origem usam BigAutoField: o arquivo precisa guardar ids acima de 2**31 - 1
+        grande = 2 ** 31 + 10
+        entrada, saida = TipoTransacao.objects.order_by('id')[:2]
+        usuario = User.objects.get(username='arquivo')
+        transacoes = [
+            Transacao.objects.create(
+                id=grande + i, tipo_transacao=tipo, usuario=usuario, produto=self.produto, quantidade=4,
+                data=self.antiga, arquivada=True,
+            )
+            for i, tipo in enumerate((entrada, saida))
+        ]
+        lote = Item.objects.create(
+            id=grande, produto=self.produto, transacao=transacoes[0], lote='L3', quantidade=0,
+            quantidade_inicial=4, disponivel=False,
+        )
+        ConsumoLote.objects.create(id=grande, item=lote, transacao=transacoes[1], quantidade=4)
+
+        corte = timezone.now() - timedelta(days=180)
+        arquivar_itens(corte)
+        arquivar_transacoes(corte)
+
+        self.assertEqual(ItemArquivado.objects.get(pk=grande).transacao_id, grande)
+        self.assertEqual(
+            ConsumoLoteArquivado.objects.filter(pk=grande).values_list('item_id', 'transacao_id').get(),
+            (grande, grande + 1),
+        )
+        self.assertEqual(TransacaoArquivada.objects.filter(pk__gte=grande).count(), 2)
+
+
+class PaginacaoKeysetTests(TestCase):
+    """Navegar pelos cursores percorre a lista inteira, sem repetir nem pular linhas."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('paginacao', password='senha-teste-123')
+        tipo = TipoTransacao.objects.create(nome='Compra', entrada=True)
+        produto = Produto.objects.create(nome='Parafuso')
+        agora = timezone.now()
+        # Datas repetidas de três em três: o desempate é pelo id
+        Transacao.objects.bulk_create([
+            Transacao(tipo_transacao=tipo, usuario=self.usuario, produto=produto, quantidade=i + 1,
+                      data=agora - timedelta(minutes=i // 3))
+            for i in range(23)
+        ])
+        self.queryset = Transacao.objects.all()
+        self.esperado = list(self.queryset.order_by('-data', '-id').values_list('id', flat=True))
+
+    def test_ida_e_volta(self):
+        paginador = PaginadorKeyset(self.queryset, ('-data', '-id'), 5)
+        paginas = [paginador.pagina()]
+        while paginas[-1].has_next():
+            # Cada página custa uma consulta, em qualquer profundidade
+            with self.assertNumQueries(1):
+                paginas.append(paginador.pagina(paginas[-1].cursor_proximo))
+
+        self.assertEqual([pagina.number for pagina in paginas], [1, 2, 3, 4, 5])
+        self.assertEqual([t.id for pagina in paginas for t in pagina], self.esperado)
+        self.assertFalse(paginas[0].has_previous())
+
+        anterior = paginador.pagina(paginas[-1].cursor_anterior)
+        self.assertEqual([t.id for t in anterior], [t.id for t in paginas[-2]])
+        self.assertEqual(anterior.number, 4)
+        primeira = paginador.pagina(paginas[1].cursor_anterior)
+        self.assertEqual([t.id for t in primeira], self.esperado[:5])
+        self.assertFalse(primeira.has_previous())
+
+    def test_cursor_invalido_volta_para_o_inicio(self):
+        paginador = PaginadorKeyset(self.queryset, ('-data', '-id'), 5, total_maximo=10)
+        for cursor in ('lixo', 'WyJwIiwgWyJ4Il0sIDJd', ''):
+            pagina = paginador.pagina(cursor)
+            self.assertEqual([t.id for t in pagina], self.esperado[:5])
+        self.assertEqual(paginador.total, 10)
+        self.assertTrue(paginador.total_excede)
+
+    def test_listagem_mantem_filtros_na_paginacao(self):
+        self.client.force_login(self.usuario)
+        resposta = self.client.get(reverse('listar_transacao'), {'tipo': TipoTransacao.objects.get().pk})
+        self.assertEqual(len(resposta.context['page_obj']), 10)
+        cursor = resposta.context['page_obj'].cursor_proximo
+        self.assertContains(resposta, f'tipo={TipoTransacao.objects.get().pk}&amp;cursor={cursor}')
+        self.assertContains(resposta, 'Página 1 de 3')
+
+
+class BuscaProdutosTests(TestCase):
+    """Busca por nome, descrição, categoria e lote, sem diferenciar acentos nem plural."""
+
+    def setUp(self):
+        _indice_produtos.limpar()
+        self.addCleanup(_indice_produtos.limpar)
+        self.usuario = User.objects.create_user('busca', password='senha-teste-123')
+        fixacao = Categoria.objects.create(nome='Fixação')
+        self.parafuso = Produto.objects.create(nome='Parafuso de Aço 10mm', categoria=fixacao)
+        self.porca = Produto.objects.create(nome='Porca sextavada', descricao='Para parafusos de aço', categoria=fixacao)
+        self.cabo = Produto.objects.create(nome='Cabo flexível')
+        entrada = TipoTransacao.objects.create(nome='Compra', entrada=True)
+        transacao = Transacao.objects.create(tipo_transacao=entrada, usuario=self.usuario, produto=self.cabo, quantidade=1)
+        Item.objects.create(produto=self.cabo, transacao=transacao, lote='LT-2024/77', quantidade=1, quantidade_inicial=1)
+        indexar_produtos([self.parafuso.pk, self.porca.pk, self.cabo.pk])
+
+    def test_relevancia_acentos_e_plural(self):
+        # Nome pesa mais que descrição
+        self.assertEqual(buscar_produtos('parafusos aco'), [self.parafuso.pk, self.porca.pk])
+        self.assertEqual(buscar_produtos('FIXACAO sext'), [self.porca.pk])
+        self.assertEqual(buscar_produtos('lt 2024 77'), [self.cabo.pk])
+        self.assertEqual(buscar_produtos('flexiveis'), [self.cabo.pk])
+        self.assertEqual(buscar_produtos('de'), [])
+        self.assertEqual(buscar_categorias('fixacao'), [Categoria.objects.get().pk])
+
+    def test_indice_acompanha_alteracoes(self):
+        self.assertEqual(buscar_produtos('cabo'), [self.cabo.pk])
+        Produto.objects.filter(pk=self.cabo.pk).update(nome='Fio rígido')
+        indexar_produtos([self.cabo.pk])
+        self.assertEqual(buscar_produtos('cabo'), [])
+        self.assertEqual(buscar_produtos('rigido'), [self.cabo.pk])
+
+    def test_listagem_usa_busca(self):
+        self.client.force_login(self.usuario)
+        resposta = self.client.get(reverse('listar_produtos'), {'busca': 'aço'})
+        self.assertEqual([produto.pk for produto in resposta.context['page_obj']], [self.parafuso.pk, self.porca.pk])
+
+
+class AutocompleteProdutoTests(TestCase):
+    """O campo de produto não lista o catálogo: as consultas não crescem com o número de produtos."""
+
+    def setUp(self):
+        _indice_produtos.limpar()
+        self.addCleanup(_indice_produtos.limpar)
+        self.usuario = User.objects.create_user('autocompletar', password='senha-teste-123', is_staff=True)
+        self.client.force_login(self.usuario)
+        TipoTransacao.objects.create(nome='Compra', entrada=True)
+
+    def _criar_produtos(self, quantidade):
+        inicio = Produto.objects.count()
+        produtos = [Produto.objects.create(nome=f'Parafuso {inicio + i}') for i in range(quantidade)]
+        for produto in produtos:
+            SaldoEstoque.objects.create(produto=produto, quantidade=produto.pk)
+        indexar_produtos([produto.pk for produto in produtos])
+        return produtos
+
+    def _consultas(self, url, dados=None):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(url, dados)
+        self.assertEqual(resposta.status_code, 200)
+        return len(consultas), resposta
+
+    def test_paginas_nao_listam_o_catalogo(self):
+        self._criar_produtos(2)
+        poucos = [self._consultas(reverse(nome))[0] for nome in ('criar_transacao', 'listar_transacao')]
+        self._criar_produtos(30)
+        muitos = [self._consultas(reverse(nome))[0] for nome in ('criar_transacao', 'listar_transacao')]
+        self.assertEqual(poucos, muitos)
+
+    def test_endpoint_retorna_nome_e_estoque(self):
+        produtos = self._criar_produtos(3)
+        inativo = Produto.objects.create(nome='Parafuso antigo', ativo=1)
+        indexar_produtos([inativo.pk])
+
+        _, resposta = self._consultas(reverse('autocompletar_produtos'), {'q': 'parafus'})
+        resultados = resposta.json()['resultados']
+        self.assertEqual(
+            resultados, [{'id': p.pk, 'nome': p.nome, 'estoque': p.pk} for p in produtos]
+        )
+        _, resposta = self._consultas(reverse('autocompletar_produtos'), {'q': 'antigo', 'inativos': '1'})
+        self.assertEqual(resposta.json()['resultados'], [{'id': inativo.pk, 'nome': inativo.nome, 'estoque': 0}])
+        self.assertEqual(self.client.get(reverse('autocompletar_produtos')).json(), {'resultados': []})
+
+    def test_filtro_mostra_produto_escolhido(self):
+        produto = self._criar_produtos(1)[0]
+        _, resposta = self._consultas(reverse('listar_transacao'), {'produto': produto.pk})
+        self.assertContains(resposta, f'value="{produto.nome} (Estoque: {produto.pk})"')
+        self.assertContains(resposta, f'name="produto" value="{produto.pk}"')
+
+
+class RastreabilidadeLoteTests(TestCase):
+    """A consulta por lote acha a entrada e as saídas, inclusive no arquivo, com consultas por índice."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('rastreio', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        self.entrada = TipoTransacao.objects.create(nome='Compra', entrada=True)
+        self.saida = TipoTransacao.objects.create(nome='Venda', entrada=False)
+        self.produto = Produto.objects.create(nome='Parafuso')
+
+    def _transacao(self, tipo, quantidade, data=None):
+        return Transacao.objects.create(
+            tipo_transacao=tipo, usuario=self.usuario, produto=self.produto, quantidade=quantidade,
+            data=data or timezone.now(), arquivada=data is not None,
+        )
+
+    def _entrada(self, lote, quantidade, data=None):
+        transacao = self._transacao(self.entrada, quantidade, data)
+        item = registrar_entrada(self.produto, transacao, lote, quantidade)
+        if data is not None:
+            Item.objects.filter(pk=item.pk).update(data_criacao=data)
+        return transacao
+
+    def _saida(self, quantidade, data=None):
+        transacao = self._transacao(self.saida, quantidade, data)
+        registrar_saida(self.produto, transacao, quantidade)
+        return transacao
+
+    def test_entrada_e_saidas_do_lote(self):
+        antiga = timezone.now() - timedelta(days=400)
+        entrada_antiga = self._entrada('L1', 5, antiga)
+        saida_antiga = self._saida(5, antiga + timedelta(days=1))
+        arquivar_itens(timezone.now() - timedelta(days=180))
+        arquivar_transacoes(timezone.now() - timedelta(days=180))
+        self.assertTrue(ItemArquivado.objects.filter(lote='L1').exists())
+
+        # Mesmo código de lote recebido de novo, e um lote que não interessa
+        entrada = self._entrada('L1', 4)
+        self._entrada('L2', 10)
+        saidas = [self._saida(3), self._saida(3)]
+
+        with self.assertNumQueries(6):
+            lotes = rastrear_lote('L1')
+        self.assertEqual([lote['arquivado'] for lote in lotes], [True, False])
+        self.assertEqual(
+            [(m['transacao_id'], m['quantidade'], m['arquivada']) for m in lotes[0]['movimentos']],
+            [(entrada_antiga.pk, 5, True), (saida_antiga.pk, 5, True)],
+        )
+        self.assertEqual(
+            [(m['transacao_id'], m['quantidade']) for m in lotes[1]['movimentos']],
+            [(entrada.pk, 4), (saidas[0].pk, 3), (saidas[1].pk, 1)],
+        )
+        self.assertEqual(lotes[1]['quantidade_restante'], 0)
+        # A saída que terminou o L1 e passou para o L2 continua apontando para os dois
+        self.assertEqual(
+            [m['quantidade'] for m in rastrear_lote('L2')[0]['movimentos']], [10, 2]
+        )
+
+        resposta = self.client.get(reverse('rastrear_lote_json'), {'lote': ' L1 '})
+        self.assertEqual(len(resposta.json()['lotes']), 2)
+        resposta = self.client.get(reverse('rastrear_lote'), {'lote': 'L1'})
+        self.assertContains(resposta, f'#{saidas[1].pk}')
+        self.assertEqual(rastrear_lote('inexistente'), [])
+
+
+class ExportacaoTransacoesTests(TestCase):
+    """A exportação em streaming aplica os filtros da listagem e percorre todos os blocos."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('exportacao', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        entrada = TipoTransacao.objects.create(nome='Compra', entrada=True)
+        self.produto = Produto.objects.create(nome='Parafuso; sextavado')
+        outro = Produto.objects.create(nome='Porca')
+        agora = timezone.now()
+        Transacao.objects.bulk_create([
+            Transacao(
+                tipo_transacao=entrada,
+                usuario=self.usuario,
+                produto=self.produto if i % 2 else outro,
+                quantidade=i + 1,
+                data=agora - timedelta(days=i),
+            )
+            for i in range(10)
+        ])
+
+    def test_blocos_percorrem_todas_as_linhas(self):
+        linhas = list(linhas_transacoes(Transacao.objects.all(), tamanho_bloco=3))
+        self.assertEqual(len(linhas), 10)
+        self.assertEqual(len({linha[0] for linha in linhas}), 10)
+
+    def test_csv_com_filtros(self):
+        inicio = (timezone.localdate() - timedelta(days=4)).isoformat()
+        resposta = self.client.get(
+            reverse('exportar_transacoes', args=['csv']),
+            {'produto': self.produto.id, 'data_inicio': inicio},
+        )
+        self.assertTrue(resposta.streaming)
+        conteudo = b''.join(resposta.streaming_content).decode('utf-8-sig')
+        linhas = list(csv.reader(io.StringIO(conteudo), delimiter=';'))
+
+        self.assertEqual(linhas[0][:3], ['id', 'data', 'tipo'])
+        # Produto ímpar nos últimos 4 dias: i = 1 e 3
+        self.assertEqual(sorted(int(linha[6]) for linha in linhas[1:]), [2, 4])
+        self.assertEqual(linhas[1][5], 'Parafuso; sextavado')
+
+    def test_filtros_invalidos_sao_ignorados(self):
+        # Como as datas inválidas: o filtro some, em vez de virar erro 500
+        for filtros in (
+            {'produto': 'abc', 'tipo': 'x'},
+            {'produto': '-1', 'tipo': '1.5'},
+            {'produto': '9' * 30, 'data_inicio': '2026-13-01'},
+        ):
+            with self.subTest(filtros=filtros):
+                resposta = self.client.get(reverse('exportar_transacoes', args=['ndjson']), filtros)
+                self.assertEqual(resposta.status_code, 200)
+                self.assertEqual(len(b''.join(resposta.streaming_content).splitlines()), 10)
+                self.assertEqual(self.client.get(reverse('listar_transacao'), filtros).status_code, 200)
+
+        resposta = self.client.get(reverse('exportar_transacoes', args=['ndjson']), {'tipo': '999'})
+        self.assertEqual(b''.join(resposta.streaming_content), b'')
+
+    def test_ndjson(self):
+        resposta = self.client.get(reverse('exportar_transacoes', args=['ndjson']))
+        registros = [json.loads(linha) for linha in b''.join(resposta.streaming_content).splitlines()]
+        self.assertEqual(len(registros), 10)
+        self.assertEqual(registros[0]['movimento'], 'entrada')
+
+
+class SaldosDiariosTests(TestCase):
+    """O saldo em uma data (SaldoDiario mais o movimento posterior) bate com a soma do histórico."""
+
+    def setUp(self):
+        self.usuario = User.objects.create(username='saldos')
+        self.entrada = TipoTransacao.objects.create(nome='Compra', entrada=True)
+        self.saida = TipoTransacao.objects.create(nome='Venda', entrada=False)
+        self.produtos = [Produto.objects.create(nome=f'Produto {i}') for i in range(3)]
+        self.hoje = timezone.localdate()
+        # Movimentos nos últimos 10 dias, incluindo hoje (ainda não fechado)
+        for dias_atras in range(10, -1, -1):
+            for i, produto in enumerate(self.produtos):
+                if (dias_atras + i) % 3 == 0:
+                    continue
+                self._transacao(produto, self.entrada, 10 + i, dias_atras)
+                if dias_atras % 2:
+                    self._transacao(produto, self.saida, 3, dias_atras)
+
+    def _transacao(self, produto, tipo, quantidade, dias_atras):
+        data = inicio_do_dia(self.hoje - timedelta(days=dias_atras)) + timedelta(hours=12)
+        return Transacao.objects.create(
+            tipo_transacao=tipo, usuario=self.usuario, produto=produto, quantidade=quantidade, data=data,
+        )
+
+    def _somar_historico(self, produto, dia):
+        saldo = 0
+        for transacao in Transacao.objects.filter(produto=produto, data__lte=fim_do_dia(dia)):
+            saldo += transacao.quantidade if transacao.tipo_transacao.entrada else -transacao.quantidade
+        return saldo
+
+    def _conferir(self):
+        for dias_atras in range(12, -1, -1):
+            dia = self.hoje - timedelta(days=dias_atras)
+            for produto in self.produtos:
+                self.assertEqual(saldo_em(produto, dia), self._somar_historico(produto, dia), (produto, dia))
+
+    def test_fechamento_incremental(self):
+        self._conferir()
+        call_command('fechar_saldos_diarios', stdout=io.StringIO())
+
+        ontem = self.hoje - timedelta(days=1)
+        fechamento = FechamentoSaldoDiario.objects.get()
+        self.assertEqual(fechamento.dia, ontem)
+        self.assertEqual(fechamento.dias_processados, 10)
+        self.assertEqual(
+            fechamento.saldos_gravados,
+            Transacao.objects.filter(data__lt=inicio_do_dia(self.hoje)).values('produto', 'data').distinct().count(),
+        )
+        self.assertFalse(SaldoDiario.objects.filter(data__gte=self.hoje).exists())
+        self._conferir()
+
+        # Sem dias novos nem transações retroativas, nada a fazer
+        saida = io.StringIO()
+        call_command('fechar_saldos_diarios', stdout=saida)
+        self.assertIn('Nenhum dia a fechar', saida.getvalue())
+
+        # Uma saída lançada hoje com data de 5 dias atrás refaz os saldos a partir daquele dia
+        self._transacao(self.produtos[0], self.saida, 4, 5)
+        call_command('fechar_saldos_diarios', stdout=io.StringIO())
+        self.assertEqual(FechamentoSaldoDiario.objects.first().dias_processados, 5)
+        self._conferir()
+
+    def test_coluna_saldo_no_relatorio(self):
+        call_command('fechar_saldos_diarios', stdout=io.StringIO())
+        inicio = inicio_do_dia(self.hoje - timedelta(days=3))
+        dados = montar_relatorio_transacoes(inicio, fim_do_dia(self.hoje))
+
+        for produto in self.produtos:
+            linhas = [t for t in dados['transacoes'] if t.produto_id == produto.pk]
+            self.assertEqual(linhas[-1].saldo_apos, self._somar_historico(produto, self.hoje))
+            anterior = self._somar_historico(produto, self.hoje - timedelta(days=4))
+            for transacao in linhas:
+                anterior += transacao.quantidade if transacao.tipo_transacao.entrada else -transacao.quantidade
+                self.assertEqual(transacao.saldo_apos, anterior)
+        self.assertIn('<th>Saldo</th>', render_to_string('pdf_template.html', dados))
+
+
+class PlanosConsultaTests(TestCase):
+    """
+    As consultas das listagens e relatórios das três apps usam índice: o
+    EXPLAIN de cada uma não pode mostrar varredura completa das tabelas que
+    crescem com o uso.
+    """
+    TABELAS_GRANDES = {
+        modelo._meta.db_table for modelo in (
+            Produto, Transacao, TransacaoArquivada, Item, ConsumoLote, ItemArquivado, ConsumoLoteArquivado,
+            SaldoDiario, TarefaRelatorio, Cliente, HistoricoRenovacao, ClientePedido,
+        )
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('planos', password='senha-teste-123', is_staff=True)
+        outro = User.objects.create_user('planos2')
+        entrada = TipoTransacao.objects.create(nome='Compra', entrada=True)
+        categoria = Categoria.objects.create(nome='Fixação')
+        agora = timezone.now()
+
+        produtos = Produto.objects.bulk_create([
+            Produto(nome=f'Produto {i}', categoria=categoria, ativo=i % 5 == 0, data_criacao=agora - timedelta(hours=i))
+            for i in range(200)
+        ])
+        cls.produto = produtos[0]
+        transacoes = Transacao.objects.bulk_create([
+            Transacao(
+                tipo_transacao=entrada, usuario=cls.usuario, produto=produtos[i % 200], quantidade=1,
+                data=agora - timedelta(hours=i), arquivada=i % 7 == 0,
+            )
+            for i in range(1000)
+        ])
+        Item.objects.bulk_create([
+            Item(produto=t.produto, transacao=t, lote=f'L{t.pk}', quantidade=1, quantidade_inicial=1,
+                 disponivel=i % 3 != 0, data_criacao=t.data)
+            for i, t in enumerate(transacoes)
+        ])
+        for produto in produtos:
+            SaldoEstoque.objects.create(produto=produto, quantidade=5)
+
+        sistema = Sistema.objects.create(nome='ERP')
+        clientes = Cliente.objects.bulk_create([
+            Cliente(empresa=f'Empresa {i}', cnpj=f'{i:014d}', sistema=sistema, ativo=i % 4 != 0,
+                    validade=timezone.localdate() + timedelta(days=i - 100))
+            for i in range(300)
+        ])
+        HistoricoRenovacao.objects.bulk_create([
+            HistoricoRenovacao(cliente=cliente, validade_anterior=cliente.validade, nova_validade=cliente.validade,
+                               porcentagem_reajuste=5)
+            for cliente in clientes
+        ])
+        categoria_pedido = CategoriaPedido.objects.create(nome='Instalação')
+        ClientePedido.objects.bulk_create([
+            ClientePedido(nome=f'Cliente {i}', cnpj=f'{i:014d}', categoria=categoria_pedido,
+                          usuario_criador=cls.usuario if i % 10 == 0 else outro)
+            for i in range(300)
+        ])
+
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                for tabela in cls.TABELAS_GRANDES:
+                    cursor.execute(f'ANALYZE TABLE {tabela}')
+            elif connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def _varreduras(self, sql):
+        """Tabelas grandes lidas por inteiro no plano da consulta."""
+        varridas = set()
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                for *_, detalhe in cursor.fetchall():
+                    encontrado = re.fullmatch(r'SCAN (\w+)(?: AS \w+)?', detalhe)
+                    if encontrado:
+                        varridas.add(encontrado.group(1))
+            elif connection.vendor == 'mysql':
+                cursor.execute('EXPLAIN ' + sql)
+                colunas = [coluna[0] for coluna in cursor.description]
+                for linha in cursor.fetchall():
+                    linha = dict(zip(colunas, linha))
+                    if linha['type'] == 'ALL':
+                        varridas.add(linha['table'])
+            else:
+                self.skipTest(f'EXPLAIN não suportado para {connection.vendor}')
+        return varridas & self.TABELAS_GRANDES
+
+    def _conferir(self, descricao, executar):
+        with CaptureQueriesContext(connection) as consultas:
+            executar()
+        self.assertTrue(consultas.captured_queries, descricao)
+        for consulta in consultas.captured_queries:
+            sql = consulta['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            with self.subTest(descricao, sql=sql):
+                self.assertFalse(self._varreduras(sql), sql)
+
+    def _pagina(self, nome, dados=None, **kwargs):
+        resposta = self.client.get(reverse(nome, **kwargs), dados)
+        self.assertEqual(resposta.status_code, 200)
+        return resposta
+
+    def test_listagens_e_relatorios_usam_indice(self):
+        hoje = timezone.localdate()
+        inicio, fim = inicio_do_dia(hoje - timedelta(days=2)), fim_do_dia(hoje)
+        periodo = {'data_inicio': (hoje - timedelta(days=2)).isoformat(), 'data_fim': hoje.isoformat()}
+
+        primeira = self._pagina('listar_transacao')
+        cursor = primeira.context['page_obj'].cursor_proximo
+        self._conferir('transações', lambda: self._pagina('listar_transacao', {'cursor': cursor}))
+        self._conferir('produtos', lambda: self._pagina('listar_produtos'))
+        self._conferir('categorias', lambda: self._pagina('listar_categorias'))
+        self._conferir('relatório de transações', lambda: montar_relatorio_transacoes(inicio, fim))
+        self._conferir('versão do relatório', lambda: versao_transacoes(periodo, self.usuario))
+        self._conferir('saldo em uma data', lambda: saldos_em(hoje - timedelta(days=3), [self.produto.pk]))
+        self._conferir('lotes para a saída FIFO', lambda: list(
+            Item.objects.filter(produto=self.produto, disponivel=True).order_by('data_criacao', 'id')
+            .values_list('id', 'quantidade')[:100]
+        ))
+        lote = Item.objects.filter(produto=self.produto).values_list('lote', flat=True).first()
+        self._conferir('rastreio de lote', lambda: rastrear_lote(lote))
+        self._conferir('meus relatórios', lambda: self._pagina('listar_relatorios'))
+
+        # A listagem de clientes sem filtro devolve todos os ativos (sem paginação) e fica de fora
+        self._conferir('renovação por período', lambda: self._pagina('renovacao_list', {
+            'filtrar_por_data': 'on', 'data_inicio': hoje.isoformat(),
+            'data_fim': (hoje + timedelta(days=30)).isoformat(),
+        }))
+        self._conferir('versão do relatório de contratos', lambda: versao_contratos(periodo, self.usuario))
+        self._conferir('versão do relatório de renovação', lambda: versao_renovacao({'mostrar_vencidos': 'on'}, self.usuario))
+
+        self._conferir('pedidos do usuário', lambda: self._pagina('pedido:listar_clientes_pedido'))
+        self._conferir('pedidos do usuário por período', lambda: versao_pedidos(
+            dict(periodo, filtrar_por_data='on'), self.usuario
+        ))
+
+
+class ConsultasPorPaginaTests(TestCase):
+    """O número de consultas de cada página não cresce com o volume de dados."""
+
+    def setUp(self):
+        _indice_produtos.limpar()
+        self.addCleanup(_indice_produtos.limpar)
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        configuracao = override_settings(**configuracoes_medicao(diretorio.name))
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def test_todas_as_rotas_sao_medidas(self):
+        self.assertEqual(rotas_do_projeto() - set(IGNORADAS), set(ROTAS))
+
+    def test_consultas_nao_crescem_com_os_dados(self):
+        contexto = popular(1)
+        self.client.force_login(contexto['usuario'])
+        antes = medir(self.client, contexto)
+
+        popular(3)
+        _indice_produtos.limpar()
+        depois = medir(self.client, contexto)
+
+        for rota in ROTAS:
+            esperado = STATUS_ESPERADO.get(rota, 200)
+            self.assertEqual((antes[rota][2], depois[rota][2]), (esperado, esperado), rota)
+        crescimento = {
+            rota: f"{antes[rota][0]} -> {depois[rota][0]} consultas"
+            for rota in ROTAS if depois[rota][0] > antes[rota][0]
+        }
+        self.assertEqual(crescimento, {})
+
+
+class TempoImportacaoTests(TestCase):
+    """manage.py tempo_importacao --proibir: a carga do projeto não importa as dependências pesadas."""
+
+    def test_dependencias_pesadas_fora_da_inicializacao(self):
+        saida = io.StringIO()
+        call_command('tempo_importacao', '--proibir', 'matplotlib', 'xhtml2pdf', 'reportlab', stdout=saida)
+        self.assertIn('Medição concluída.', saida.getvalue())
+
+    def test_modulo_proibido_carregado_falha(self):
+        # O URLconf importa as views das três apps: proibir uma delas tem que falhar
+        with self.assertRaisesMessage(CommandError, 'Módulos carregados na inicialização: contratos.views'):
+            call_command('tempo_importacao', '--proibir', 'contratos.views', 'matplotlib', stdout=io.StringIO())
+
+
+class ServerTimingTests(TestCase):
+    """Cabeçalho Server-Timing e percentis por view (inventario.instrumentacao)."""
+
+    def setUp(self):
+        estatisticas.limpar()
+        self.addCleanup(estatisticas.limpar)
+        _indice_produtos.limpar()
+        self.addCleanup(_indice_produtos.limpar)
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        configuracao = override_settings(
+            RELATORIOS_DIR=diretorio.name,
+            RELATORIOS_CACHE_DIR=os.path.join(diretorio.name, 'cache'),
+            RELATORIO_LIMITE_SINCRONO=10 ** 6,
+        )
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        self.contexto = popular(1)
+
+    def _client(self):
+        # O client carrega os middlewares na primeira requisição, já com SERVER_TIMING sobrescrito
+        client = Client()
+        client.force_login(self.contexto['usuario'])
+        return client
+
+    @override_settings(SERVER_TIMING=True)
+    def test_cabecalho_com_sql_e_template(self):
+        resposta = self._client().get(reverse('listar_produtos'))
+
+        cabecalho = resposta['Server-Timing']
+        self.assertRegex(cabecalho, r'sql;dur=[\d.]+;desc="[1-9]\d* consultas"')
+        self.assertRegex(cabecalho, r'template;dur=[\d.]+')
+        self.assertRegex(cabecalho, r'total;dur=[\d.]+$')
+        self.assertNotIn('pdf;', cabecalho)
+
+    @override_settings(SERVER_TIMING=True)
+    def test_cabecalho_com_pdf_e_grafico(self):
+        hoje = timezone.localdate()
+        resposta = self._client().post(reverse('relatorio_transacoes'), {
+            'data_inicio': (hoje - timedelta(days=7)).isoformat(), 'data_fim': hoje.isoformat(),
+        })
+
+        self.assertEqual(resposta['Content-Type'], 'application/pdf')
+        self.assertRegex(resposta['Server-Timing'], r'pdf;dur=[\d.]+')
+        self.assertRegex(resposta['Server-Timing'], r'grafico;dur=[\d.]+')
+
+    @override_settings(SERVER_TIMING=False)
+    def test_desligado_nao_mede(self):
+        resposta = self._client().get(reverse('listar_produtos'))
+
+        self.assertFalse(resposta.has_header('Server-Timing'))
+        self.assertEqual(estatisticas.resumo(), [])
+
+    @override_settings(SERVER_TIMING=True)
+    def test_pagina_de_percentis(self):
+        client = self._client()
+        for _ in range(3):
+            client.get(reverse('listar_produtos'))
+
+        resposta = client.get(reverse('tempos_por_view'))
+        linhas = {linha['view']: linha for linha in resposta.context['linhas']}
+        self.assertEqual(linhas['listar_produtos']['requisicoes'], 3)
+        self.assertLessEqual(linhas['listar_produtos']['p50'], linhas['listar_produtos']['p99'])
+        self.assertContains(resposta, 'listar_produtos')
+
+        client.post(reverse('tempos_por_view'))
+        self.assertEqual([linha['view'] for linha in estatisticas.resumo()], ['tempos_por_view'])
+
+    def test_pagina_so_para_staff(self):
+        comum = User.objects.create_user('comum', password='senha-comum-123')
+        self.client.force_login(comum)
+
+        self.assertRedirects(self.client.get(reverse('tempos_por_view')), reverse('listar_produtos'))
+
+    def test_percentil(self):
+        valores = list(range(1, 101))
+        self.assertEqual(
+            [percentil(valores, p) for p in (50, 95, 99, 100)],
+            [50, 95, 99, 100],
+        )
+        self.assertEqual(percentil([7], 99), 7)
+        self.assertIsNone(percentil([], 50))
+
+
+@override_settings(METRICAS=True, METRICAS_TOKEN='')
+class MetricasPrometheusTests(TestCase):
+    """/metrics: histogramas por rota somados entre processos e indicadores de negócio."""
+
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        configuracao = override_settings(
+            METRICAS_DIR=os.path.join(diretorio.name, 'metricas'),
+            RELATORIOS_CACHE_DIR=os.path.join(diretorio.name, 'cache'),
+        )
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        metricas.limpar()
+        self.addCleanup(metricas.limpar)
+        cache.delete(metricas.CHAVE_CACHE_INDICADORES)
+        self.addCleanup(cache.delete, metricas.CHAVE_CACHE_INDICADORES)
+        _indice_produtos.limpar()
+        self.addCleanup(_indice_produtos.limpar)
+
+        self.contexto = popular(1)
+        hoje = timezone.localdate()
+        Cliente.objects.all().update(validade=hoje + timedelta(days=30), ativo=True, bloqueado=False)
+        vencido, bloqueado = Cliente.objects.order_by('pk')[:2]
+        Cliente.objects.filter(pk=vencido.pk).update(validade=hoje - timedelta(days=1))
+        Cliente.objects.filter(pk=bloqueado.pk).update(bloqueado=True)
+        self.client.force_login(self.contexto['usuario'])
+
+    def _metricas(self, **extra):
+        resposta = self.client.get(reverse('metricas_prometheus'), **extra)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return resposta.content.decode()
+
+    def test_requisicoes_e_indicadores(self):
+        self.client.get(reverse('listar_produtos'))
+        texto = self._metricas()
+
+        self.assertIn('http_requisicoes_total{view="listar_produtos",metodo="GET",status="200"} 1\n', texto)
+        self.assertIn('http_requisicao_segundos_bucket{view="listar_produtos",le="+Inf"} 1\n', texto)
+        self.assertIn('http_requisicao_consultas_sql_count{view="listar_produtos"} 1\n', texto)
+        self.assertIn('# TYPE pdf_renderizacao_segundos histogram\n', texto)
+        self.assertIn(f'contratos_ativos {Cliente.objects.count() - 2}\n', texto)
+        self.assertIn('contratos_vencidos 1\n', texto)
+        em_alerta = SaldoEstoque.objects.filter(em_alerta=True).count()
+        self.assertGreater(em_alerta, 0)
+        self.assertIn(f'produtos_abaixo_alerta {em_alerta}\n', texto)
+
+    def test_soma_arquivos_de_outros_processos(self):
+        os.makedirs(settings.METRICAS_DIR, exist_ok=True)
+        with open(os.path.join(settings.METRICAS_DIR, '999999.json'), 'w') as arquivo:
+            json.dump({'http_requisicoes_total': [[['listar_produtos', 'GET', '200'], 5]]}, arquivo)
+
+        self.client.get(reverse('listar_produtos'))
+
+        self.assertIn(
+            'http_requisicoes_total{view="listar_produtos",metodo="GET",status="200"} 6\n', self._metricas()
+        )
+
+    def test_indicadores_em_cache(self):
+        metricas.indicadores()
+        with self.assertNumQueries(0):
+            metricas.indicadores()
+
+    @override_settings(METRICAS_TOKEN='segredo')
+    def test_token(self):
+        self.assertEqual(self.client.get(reverse('metricas_prometheus')).status_code, 403)
+        self._metricas(HTTP_AUTHORIZATION='Bearer segredo')
+
+    @override_settings(METRICAS=False)
+    def test_desligado(self):
+        self.assertEqual(self.client.get(reverse('metricas_prometheus')).status_code, 404)
+
+
+@override_settings(CONSULTAS_LENTAS_MS=0.001, CONSULTAS_LENTAS_MAX=500)
+class ConsultasLentasTests(TestCase):
+    """Buffer de consultas lentas (inventario.consultas_lentas) e a página de staff."""
+
+    def setUp(self):
+        registro_consultas.limpar()
+        self.addCleanup(registro_consultas.limpar)
+        _indice_produtos.limpar()
+        self.addCleanup(_indice_produtos.limpar)
+        self.contexto = popular(1)
+        self.client.force_login(self.contexto['usuario'])
+
+    def test_normalizar(self):
+        self.assertEqual(
+            normalizar("SELECT *  FROM t WHERE id IN (%s, %s, %s) AND nome = 'O''Brien'\n LIMIT 21"),
+            "SELECT * FROM t WHERE id IN (...) AND nome = ? LIMIT ?",
+        )
+        self.assertEqual(normalizar('SELECT "T3"."id" FROM t T3 WHERE x = %s'), 'SELECT "T3"."id" FROM t T3 WHERE x = ?')
+
+    def test_registra_view_e_origem(self):
+        self.client.get(reverse('listar_clientes'))
+
+        itens = [item for item in registro_consultas.itens() if item['view'] == 'listar_clientes']
+        self.assertTrue(itens)
+        self.assertTrue(any(
+            quadro.startswith(os.path.join('contratos', 'views.py'))
+            for item in itens for quadro in item['origem']
+        ))
+
+    def test_pagina_agrupa_e_explica(self):
+        for _ in range(2):
+            self.client.get(reverse('renovacao_list'))
+        grupos = self.client.get(reverse('consultas_lentas')).context['grupos']
+        grupo = next(
+            grupo for grupo in grupos
+            if 'renovacao_list' in grupo['views'] and grupo['normalizado'].startswith('SELECT')
+        )
+        self.assertGreaterEqual(grupo['execucoes'], 2)
+
+        resposta = self.client.get(reverse('consultas_lentas'), {'explicar': grupo['chave']})
+        self.assertEqual(resposta.context['explicacao']['chave'], grupo['chave'])
+        self.assertTrue(resposta.context['explicacao']['linhas'])
+        # O EXPLAIN da página não entra no registro
+        self.assertFalse(any(item['sql'].startswith('EXPLAIN') for item in registro_consultas.itens()))
+
+    def test_buffer_limitado(self):
+        registro_consultas.redimensionar(3)
+        self.addCleanup(registro_consultas.redimensionar, settings.CONSULTAS_LENTAS_MAX)
+        for i in range(5):
+            registro_consultas.registrar(f'SELECT {i}', None, False, 1.0, 'teste', 'default')
+
+        self.assertEqual([item['sql'] for item in registro_consultas.itens()], ['SELECT 2', 'SELECT 3', 'SELECT 4'])
+        self.assertEqual(len(registro_consultas.agrupar()), 1)
+
+    @override_settings(CONSULTAS_LENTAS_MS=0)
+    def test_desligado(self):
+        self.client.get(reverse('listar_clientes'))
+        self.assertEqual(registro_consultas.itens(), [])
+
+
+class SeedBenchTests(TestCase):
+    """manage.py seed_bench: volumes pedidos, estoque consistente e dados determinísticos."""
+
+    volumes = {
+        'usuarios': 2, 'categorias': 3, 'produtos': 30, 'itens': 300, 'clientes': 20, 'pedidos': 15,
+        'ate': date(2026, 1, 31), 'bloco': 64,
+    }
+
+    def setUp(self):
+        _indice_produtos.limpar()
+        self.addCleanup(_indice_produtos.limpar)
+
+    def _gerar(self, semente):
+        call_command('seed_bench', semente=semente, stdout=io.StringIO(), **self.volumes)
+
+    def _retrato(self):
+        return (
+            list(Produto.objects.order_by('id').values_list('nome', 'categoria__nome', 'alerta_estoque_minimo')),
+            list(Transacao.objects.order_by('id').values_list('produto__nome', 'quantidade', 'data')),
+            list(Item.objects.order_by('id').values_list('lote', 'quantidade', 'quantidade_inicial')),
+            list(Cliente.objects.order_by('id').values_list('empresa', 'cnpj', 'validade', 'data_criacao')),
+            list(HistoricoRenovacao.objects.order_by('id').values_list('cliente__empresa', 'data_renovacao')),
+            list(ClientePedido.objects.order_by('id').values_list('nome', 'valor_pedido', 'data_criacao')),
+        )
+
+    def test_volumes_e_estoque_consistente(self):
+        self._gerar(7)
+
+        self.assertEqual(Produto.objects.count(), 30)
+        self.assertEqual(Item.objects.count(), 300)
+        self.assertEqual(Transacao.objects.count(), 300 + ConsumoLote.objects.count())
+        self.assertEqual(Cliente.objects.count(), 20)
+        self.assertEqual(ClientePedido.objects.count(), 15)
+        self.assertEqual(SaldoEstoque.objects.count(), 30)
+        # SaldoEstoque e em_alerta batem com os itens disponíveis
+        call_command('recalcular_saldos', verificar=True, stdout=io.StringIO())
+        # Índice de busca sincronizado, inclusive com os lotes
+        item = Item.objects.order_by('id').first()
+        self.assertIn(item.produto_id, buscar_produtos(item.lote))
+
+        fim = timezone.make_aware(datetime.combine(date(2026, 1, 31), time.max))
+        self.assertFalse(Transacao.objects.filter(data__gt=fim).exists())
+        self.assertFalse(Cliente.objects.filter(data_criacao__gt=fim).exists())
+
+    def test_mesma_semente_mesmos_dados(self):
+        retratos = []
+        for semente in (7, 7, 8):
+            with transaction.atomic():
+                self._gerar(semente)
+                retratos.append(self._retrato())
+                transaction.set_rollback(True)
+
+        self.assertEqual(retratos[0], retratos[1])
+        self.assertNotEqual(retratos[0], retratos[2])
+
+
+class TesteCargaTests(LiveServerTestCase):
+    """manage.py teste_carga contra o servidor de testes: todas as jornadas sem erro e JSON completo."""
+
+    def setUp(self):
+        _indice_produtos.limpar()
+        self.addCleanup(_indice_produtos.limpar)
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        configuracoes = override_settings(
+            RELATORIOS_DIR=diretorio.name, RELATORIOS_CACHE_DIR=os.path.join(diretorio.name, 'cache'),
+        )
+        configuracoes.enable()
+        self.addCleanup(configuracoes.disable)
+        self.contexto = popular(1)
+        self.saida = os.path.join(diretorio.name, 'carga.json')
+
+    def _rodar(self, **opcoes):
+        erros = io.StringIO()
+        call_command(
+            'teste_carga', url=self.live_server_url, usuario='medicao', senha='senha-medicao-123',
+            sessoes=1, duracao=0, iteracoes=1, saida=self.saida, stderr=erros, **opcoes,
+        )
+        with open(self.saida) as arquivo:
+            return json.load(arquivo), erros.getvalue()
+
+    def test_jornadas_sem_erro(self):
+        transacoes = Transacao.objects.count()
+        validade = self.contexto['cliente'].validade
+        relatorio, _ = self._rodar()
+
+        self.assertEqual(relatorio['total']['erros'], 0, relatorio['requisicoes'])
+        self.assertEqual(relatorio['passos'], list(PASSOS))
+        for passo in PASSOS:
+            self.assertEqual(relatorio['requisicoes'][passo]['requisicoes'], 1)
+        self.assertEqual(relatorio['requisicoes']['login']['requisicoes'], 1)
+        latencia = relatorio['requisicoes']['listar_produtos']['latencia_ms']
+        self.assertEqual(set(latencia), {'p50', 'p90', 'p95', 'p99', 'media', 'max'})
+        # Os POSTs de escrita chegaram ao banco
+        self.assertEqual(Transacao.objects.count(), transacoes + 1)
+        self.assertGreater(Cliente.objects.filter(validade__gt=validade).count(), 0)
+
+    def test_somente_leitura_e_comparacao(self):
+        anterior, _ = self._rodar(passos=['listar_produtos', 'criar_transacao'])
+        anterior_caminho = self.saida + '.anterior'
+        os.replace(self.saida, anterior_caminho)
+        transacoes = Transacao.objects.count()
+
+        relatorio, erros = self._rodar(
+            passos=['listar_produtos', 'criar_transacao'], somente_leitura=True, comparar=anterior_caminho,
+        )
+
+        self.assertEqual(Transacao.objects.count(), transacoes)
+        self.assertNotIn('criar_transacao', relatorio['requisicoes'])
+        self.assertIn('criar_transacao:form', relatorio['requisicoes'])
+        self.assertIn('listar_produtos', erros)
+        linhas = {linha[0]: linha for linha in comparar(anterior, relatorio)}
+        self.assertIsNone(linhas['criar_transacao'][2])
+        self.assertEqual(linhas['total'][1], anterior['total']['vazao_rps'])
+
+    def test_senha_errada_conta_como_erro(self):
+        with self.assertRaises(CommandError):
+            call_command('teste_carga', url=self.live_server_url, usuario='medicao', senha='', iteracoes=1)
+        call_command(
+            'teste_carga', url=self.live_server_url, usuario='medicao', senha='errada',
+            sessoes=1, duracao=0, iteracoes=1, saida=self.saida, stderr=io.StringIO(),
+        )
+        with open(self.saida) as arquivo:
+            relatorio = json.load(arquivo)
+        self.assertEqual(relatorio['requisicoes']['login']['erros_por_tipo'], {'HTTP 200': 1})
+        self.assertNotIn('listar_produtos', relatorio['requisicoes'])
@@ -1,55 +1,55 @@
 from io import BytesIO
 from django.http import HttpResponse
 from django.template.loader import get_template
-from xhtml2pdf import pisa
 import os
 from django.conf import settings
-import base64
 
-# --- INÍCIO DA ADAPTAÇÃO ---
-# Força o matplotlib a usar um modo "não-visual" para evitar erros no servidor
-import matplotlib
-matplotlib.use('Agg')
-# --- FIM DA ADAPTAÇÃO ---
+from . import graficos
+from .instrumentacao import cronometrar
+from .metricas import DURACAO_PDF
 
-import matplotlib.pyplot as plt
+# xhtml2pdf (reportlab) é pesado de importar e só é usado ao gerar
+# relatórios: é importado na primeira chamada, não na carga do módulo, para
+# não pesar na inicialização dos workers e dos comandos.
+
+@cronometrar('pdf')
+def gerar_pdf(template_src, context_dict={}):
+    """Renderiza o template em PDF e retorna os bytes, ou None em caso de erro."""
+    from xhtml2pdf import pisa
+
+    with DURACAO_PDF.medir(template=template_src):
+        template = get_template(template_src)
+        html = template.render(context_dict)
+        result = BytesIO()
+
+        # Set encoding to handle Portuguese characters
+        pdf = pisa.pisaDocument(BytesIO(html.encode("UTF-8")), result,
+                               encoding='UTF-8',
+                               link_callback=link_callback)
 
-def render_to_pdf(template_src, context_dict={}):
-    template = get_template(template_src)
-    html = template.render(context_dict)
-    result = BytesIO()
-    
-    # Set encoding to handle Portuguese characters
-    pdf = pisa.pisaDocument(BytesIO(html.encode("UTF-8")), result, 
-                           encoding='UTF-8',
-                           link_callback=link_callback)
-    
     if not pdf.err:
-        return HttpResponse(result.getvalue(), content_type='application/pdf')
+        return result.getvalue()
+    return None
+
+def render_to_pdf(template_src, context_dict={}):
+    pdf = gerar_pdf(template_src, context_dict)
+    if pdf is not None:
+        return HttpResponse(pdf, content_type='application/pdf')
     return None
 
+@cronometrar('grafico')
 def generate_pie_chart(data, title):
-    """Gera um gráfico de pizza e retorna como uma imagem base64."""
+    """Gera um gráfico de pizza em SVG e retorna como base64 (data:image/svg+xml)."""
     if not data:
         return None
+    return graficos.para_base64(graficos.pie_svg(data, title))
 
-    labels = [item['produto__nome'] for item in data]
-    sizes = [item['total_quantidade'] for item in data]
-
-    fig, ax = plt.subplots(figsize=(6, 4)) # Ajusta o tamanho da figura
-    ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90, textprops={'fontsize': 8})
-    ax.axis('equal')  # Garante que a pizza seja um círculo.
-    plt.title(title, fontsize=12)
-
-    # Salva o gráfico em um buffer de memória
-    buf = BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight')
-    plt.close(fig)
-    buf.seek(0)
-
-    # Codifica a imagem em base64
-    image_base64 = base64.b64encode(buf.read()).decode('utf-8')
-    return image_base64
+@cronometrar('grafico')
+def generate_bar_chart(data, title):
+    """Gera um gráfico de barras em SVG e retorna como base64 (data:image/svg+xml)."""
+    if not data:
+        return None
+    return graficos.para_base64(graficos.bar_svg(data, title))
 
 def link_callback(uri, rel):
     """
@@ -1,9 +1,11 @@
 import calendar
-from datetime import datetime, time
-from django.db import IntegrityError
+import hmac
+import io
+from django.db import DatabaseError, IntegrityError
 from django.forms import ValidationError
-from django.http import HttpResponse, HttpResponseForbidden
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render, redirect
+from django.urls import reverse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.forms import AuthenticationForm, PasswordResetForm
 from django.contrib import messages
@@ -18,14 +20,30 @@ from django.template.loader import render_to_string
 from django.core.mail import send_mail
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
-from .forms import CadastroUsuarioForm, CategoriaForm, DateFilterForm, ProdutoForm, TransacaoForm
-from .models import Produto, Categoria, TipoTransacao, Transacao, Item
+from .forms import CadastroUsuarioForm, CategoriaForm, DateFilterForm, ImportacaoCSVForm, ProdutoForm, TransacaoForm
+from .exportacao import FORMATOS, filtrar_transacoes, linhas_transacoes
+from .importacao import IMPORTADORES
+from .fila_relatorios import caminho_arquivo, gerar_ou_enfileirar, titulo_relatorio
+from .busca import buscar_categorias, buscar_produtos, indexar_categoria, indexar_produtos
+from .rastreabilidade import rastrear_lote
+from .instrumentacao import ETAPAS, estatisticas
+from .metricas import exposicao
+from .consultas_lentas import explicar, registro as registro_consultas
+from .paginacao import TOTAL_MAXIMO, PaginadorKeyset, paginar_por_ids
+from .widgets import AutocompleteProduto
+from .models import (
+    ATIVO, Produto, Categoria, TipoTransacao, Transacao, TransacaoArquivada, Item, SaldoEstoque, TarefaRelatorio,
+)
+from .estoque import obter_saldo, sincronizar_alerta
 from django.conf import settings
 from django.db.models.deletion import ProtectedError
-from django.db.models import Sum
-from .utils import render_to_pdf, generate_pie_chart
+from django.db.models import Count
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+# Sugestões devolvidas por autocompletar_produtos
+LIMITE_AUTOCOMPLETAR = 20
+
 def staff_required(view_func):
     def _wrapped_view(request, *args, **kwargs):
         if not request.user.is_staff and not request.user.is_superuser:
@@ -154,15 +172,16 @@ def password_reset_request(request):
 
 @login_required
 def listar_categorias(request):
-    categorias_list = Categoria.objects.all().order_by('nome')
+    # Quantidade de produtos por categoria numa única consulta, junto com a página
+    categorias_list = Categoria.objects.annotate(num_produtos=Count('produto')).order_by('nome')
     
     busca = request.GET.get('busca')
     if busca:
-        categorias_list = categorias_list.filter(nome__icontains=busca)
-
-    paginator = Paginator(categorias_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+        # Resultados por relevância (nome e descrição, sem diferenciar acentos)
+        page_obj = paginar_por_ids(categorias_list, buscar_categorias(busca), 10, request.GET.get('page'))
+    else:
+        paginator = PaginadorKeyset(categorias_list, ('nome', 'id'), 10)
+        page_obj = paginator.pagina(request.GET.get('cursor'))
     
     context = {
         'page_obj': page_obj,
@@ -205,6 +224,8 @@ def editar_categoria(request, pk):
                 change_message='Categoria criada'
             )
             categoria = form.save()
+            # O nome da categoria faz parte do texto de busca dos produtos
+            indexar_categoria(categoria)
             messages.success(request, f'Categoria "{categoria.nome}" atualizada com sucesso!')
             return redirect('listar_categorias')
         else:
@@ -242,17 +263,7 @@ def excluir_categoria(request, pk):
 
 @login_required
 def listar_produtos(request):
-    produtos_list = Produto.objects.filter(ativo=0).select_related('categoria').order_by('-data_criacao')
-    
-    for produto in produtos_list:
-        if produto.alerta_estoque_minimo is not None:
-            estoque_atual = produto.estoque_total
-            limite_aviso = produto.alerta_estoque_minimo
-            if 0 < estoque_atual <= limite_aviso:
-                if estoque_atual == limite_aviso:
-                    messages.warning(request, f"Atenção: O produto '{produto.nome}' atingiu o nível de estoque para aviso ({limite_aviso} unidades).")
-                else:
-                    messages.warning(request, f"Atenção: O produto '{produto.nome}' está com estoque baixo ({estoque_atual} unidades), abaixo do nível de aviso de {limite_aviso}.")
+    produtos_list = Produto.objects.filter(ativo=0).select_related('categoria', 'saldo').order_by('-data_criacao')
 
     categoria_id = request.GET.get('categoria')
     if categoria_id:
@@ -260,18 +271,81 @@ def listar_produtos(request):
     
     busca = request.GET.get('busca')
     if busca:
-        produtos_list = produtos_list.filter(nome__icontains=busca)
-    
-    paginator = Paginator(produtos_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+        # Nome, descrição, categoria e lotes, do mais para o menos relevante (inventario.busca)
+        page_obj = paginar_por_ids(produtos_list, buscar_produtos(busca), 10, request.GET.get('page'))
+    else:
+        paginator = PaginadorKeyset(produtos_list, ('-data_criacao', '-id'), 10)
+        page_obj = paginator.pagina(request.GET.get('cursor'))
                                   
     context = {
         'categorias': Categoria.objects.all(),
         'page_obj': page_obj,
+        'total_alertas': SaldoEstoque.objects.filter(em_alerta=True).count(),
     }
     return render(request, 'produto/listar.html', context)
 
+def _alertas_queryset():
+    return SaldoEstoque.objects.filter(em_alerta=True)\
+        .select_related('produto', 'produto__categoria')\
+        .order_by('quantidade', 'produto__nome')
+
+@login_required
+def alertas_estoque(request):
+    paginator = Paginator(_alertas_queryset(), 20)
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
+
+    return render(request, 'produto/alertas.html', {'page_obj': page_obj})
+
+@login_required
+def autocompletar_produtos(request):
+    """Id, nome e estoque dos produtos que casam com `q`, para o campo AutocompleteProduto."""
+    termo = request.GET.get('q', '').strip()
+    ids = buscar_produtos(termo, limite=LIMITE_AUTOCOMPLETAR * 5) if termo else []
+
+    produtos = Produto.objects.filter(id__in=ids)
+    if not request.GET.get('inativos'):
+        produtos = produtos.filter(ativo=ATIVO)
+    # Estoque vem do saldo materializado por JOIN: uma consulta para a lista inteira
+    encontrados = {
+        produto['id']: produto
+        for produto in produtos.annotate(estoque=Coalesce('saldo__quantidade', 0)).values('id', 'nome', 'estoque')
+    }
+    resultados = [encontrados[id] for id in ids if id in encontrados][:LIMITE_AUTOCOMPLETAR]
+    return JsonResponse({'resultados': resultados})
+
+@login_required
+def rastrear_lote_view(request):
+    lote = request.GET.get('lote', '').strip()
+    lotes = rastrear_lote(lote) if lote else []
+    return render(request, 'produto/rastrear_lote.html', {'lote': lote, 'lotes': lotes})
+
+@login_required
+def rastrear_lote_json(request):
+    lote = request.GET.get('lote', '').strip()
+    return JsonResponse({'lote': lote, 'lotes': rastrear_lote(lote)})
+
+@login_required
+def alertas_estoque_json(request):
+    paginator = Paginator(_alertas_queryset(), 20)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    return JsonResponse({
+        'total': paginator.count,
+        'pagina': page_obj.number,
+        'num_paginas': paginator.num_pages,
+        'resultados': [
+            {
+                'produto_id': saldo.produto_id,
+                'nome': saldo.produto.nome,
+                'categoria': saldo.produto.categoria.nome if saldo.produto.categoria else None,
+                'estoque': saldo.quantidade,
+                'alerta_estoque_minimo': saldo.produto.alerta_estoque_minimo,
+            }
+            for saldo in page_obj
+        ],
+    })
+
 @login_required
 @staff_required
 def criar_produto(request):
@@ -281,6 +355,8 @@ def criar_produto(request):
             produto = form.save(commit=False)
             produto.usuario_responsavel = request.user
             produto.save()
+            obter_saldo(produto)
+            indexar_produtos([produto.id])
             messages.success(request, f'Produto "{produto.nome}" criado com sucesso!')
             return redirect('listar_produtos')
         else:
@@ -312,6 +388,8 @@ def editar_produto(request, pk):
             produto = form.save(commit=False)
             produto.usuario_responsavel = request.user
             produto.save()
+            sincronizar_alerta(obter_saldo(produto))
+            indexar_produtos([produto.id])
             messages.success(request, f'Produto "{produto.nome}" atualizado com sucesso!')
             return redirect('listar_produtos')
         else:
@@ -334,7 +412,11 @@ def excluir_produto(request, pk):
     
     if request.method == 'POST':
         nome_produto = produto.nome
-        tem_transacoes = Transacao.objects.filter(produto=produto).exists()
+        # O histórico arquivado (arquivar_historico) também impede a exclusão definitiva
+        tem_transacoes = (
+            Transacao.objects.filter(produto=produto).exists()
+            or TransacaoArquivada.objects.filter(produto=produto).exists()
+        )
         tem_item = Item.objects.filter(produto=produto, disponivel=1).exists()
         
         if tem_item:
@@ -346,6 +428,7 @@ def excluir_produto(request, pk):
         elif tem_transacoes:
             produto.ativo = 1
             produto.save()
+            sincronizar_alerta(obter_saldo(produto))
             messages.warning(request, f'Produto "{nome_produto}" excluído com sucesso!')
             
         else:
@@ -372,26 +455,34 @@ def listar_transacao(request):
         'tipo_transacao', 'usuario', 'produto'
     ).order_by('-data')
     
-    produto_id = request.GET.get('produto')
-    tipo_transacao = request.GET.get('tipo')
-    
-    if produto_id:
-        transacoes_list = transacoes_list.filter(produto_id=produto_id)
+    transacoes_list = filtrar_transacoes(transacoes_list, request.GET)
     
-    if tipo_transacao:
-        transacoes_list = transacoes_list.filter(tipo_transacao_id=tipo_transacao)
-    
-    paginator = Paginator(transacoes_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = PaginadorKeyset(transacoes_list, ('-data', '-id'), 10, total_maximo=TOTAL_MAXIMO)
+    page_obj = paginator.pagina(request.GET.get('cursor'))
     
     context = {
-        'produtos': Produto.objects.all(),
+        # Busca por digitação: sem <option> para cada produto do catálogo
+        'campo_produto': AutocompleteProduto(
+            attrs={'class': 'form-control', 'placeholder': 'Todos os produtos'}, incluir_inativos=True,
+        ).render('produto', request.GET.get('produto')),
         'tipos_transacao': TipoTransacao.objects.all(),
         'page_obj': page_obj,
     }
     return render(request, 'transacao/listar.html', context)
 
+@login_required
+def exportar_transacoes(request, formato):
+    if formato not in FORMATOS:
+        raise Http404
+    gerar, content_type = FORMATOS[formato]
+
+    # Mesmos filtros de listar_transacao, sem carregar o período na memória
+    transacoes = filtrar_transacoes(Transacao.objects.filter(arquivada=False), request.GET)
+    response = StreamingHttpResponse(gerar(linhas_transacoes(transacoes)), content_type=content_type)
+    filename = f"transacoes_{timezone.localtime().strftime('%Y%m%d_%H%M')}.{formato}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 @login_required
 @staff_required
 def criar_transacao(request):
@@ -413,6 +504,32 @@ def criar_transacao(request):
     
     return render(request, 'transacao/form.html', {'form': form})
 
+@login_required
+@staff_required
+def importar_csv(request):
+    resultado = None
+    if request.method == 'POST':
+        form = ImportacaoCSVForm(request.POST, request.FILES)
+        if form.is_valid():
+            importar = IMPORTADORES[form.cleaned_data['tipo']]
+            # Lê o upload em streaming, sem carregar o arquivo inteiro na memória
+            arquivo = io.TextIOWrapper(form.cleaned_data['arquivo'].file, encoding='utf-8-sig', newline='')
+            try:
+                resultado = importar(arquivo, request.user)
+            except UnicodeDecodeError:
+                messages.error(request, "O arquivo deve estar codificado em UTF-8.")
+            else:
+                if resultado.erro_arquivo:
+                    form.add_error('arquivo', resultado.erro_arquivo)
+                if resultado.total_erros:
+                    messages.warning(request, f"{resultado.total_erros} linha(s) não foram importadas.")
+                elif not resultado.erro_arquivo:
+                    messages.success(request, "Importação concluída com sucesso!")
+    else:
+        form = ImportacaoCSVForm()
+
+    return render(request, 'importacao/form.html', {'form': form, 'resultado': resultado})
+
 # NOVO: View para arquivar a transação
 @require_http_methods(["POST"])
 @login_required
@@ -491,63 +608,17 @@ def excluir_usuario(request, user_id):
     return redirect('gerenciamento_usuario')
 
 
+@login_required
 def transacao_pdf_view(request):
     if request.method == 'POST':
         form = DateFilterForm(request.POST)
         if form.is_valid():
-            data_inicio = form.cleaned_data['data_inicio']
-            data_fim = form.cleaned_data['data_fim']
-            
-            start_date = timezone.make_aware(datetime.combine(data_inicio, time.min))
-            end_date = timezone.make_aware(datetime.combine(data_fim, time.max))
-            
-            transacoes = Transacao.objects.filter(
-                data__gte=start_date,
-                data__lte=end_date
-            ).order_by('data')
-            
-            total_entradas = transacoes.filter(
-                tipo_transacao__entrada=True
-            ).aggregate(Sum('quantidade'))['quantidade__sum'] or 0
-            
-            total_saidas = transacoes.filter(
-                tipo_transacao__entrada=False
-            ).aggregate(Sum('quantidade'))['quantidade__sum'] or 0
-            
-            saldo = total_entradas - total_saidas
-            
-            entradas_por_produto = transacoes.filter(tipo_transacao__entrada=True)\
-                .values('produto__nome')\
-                .annotate(total_quantidade=Sum('quantidade'))\
-                .order_by('-total_quantidade')
-
-            saidas_por_produto = transacoes.filter(tipo_transacao__entrada=False)\
-                .values('produto__nome')\
-                .annotate(total_quantidade=Sum('quantidade'))\
-                .order_by('-total_quantidade')
-            
-            chart_entradas = generate_pie_chart(entradas_por_produto, "Entradas por Produto")
-            chart_saidas = generate_pie_chart(saidas_por_produto, "Saídas por Produto")
-            
-            context = {
-                'transacoes': transacoes,
-                'data_inicio': data_inicio,
-                'data_fim': data_fim,
-                'total_entradas': total_entradas,
-                'total_saidas': total_saidas,
-                'saldo': saldo,
-                'data_geracao': timezone.now(),
-                'chart_entradas': chart_entradas,
-                'chart_saidas': chart_saidas,
+            parametros = {
+                'data_inicio': form.cleaned_data['data_inicio'].isoformat(),
+                'data_fim': form.cleaned_data['data_fim'].isoformat(),
             }
-            
-            pdf = render_to_pdf('pdf_template.html', context)
-            
-            if pdf:
-                response = HttpResponse(pdf, content_type='application/pdf')
-                filename = f"transacoes_{data_inicio.strftime('%Y%m%d')}_{data_fim.strftime('%Y%m%d')}.pdf"
-                content = f"attachment; filename={filename}"
-                response['Content-Disposition'] = content
+            response = gerar_ou_enfileirar(request, 'transacoes', parametros, disposicao='attachment')
+            if response:
                 return response
             
             return HttpResponse("Error generating PDF", status=500)
@@ -562,4 +633,118 @@ def transacao_pdf_view(request):
             'data_fim': end_of_month
         })
     
-    return render(request, 'relatorio/relatorio_form.html', {'form': form})
\ No newline at end of file
+    return render(request, 'relatorio/relatorio_form.html', {'form': form})
+
+def _tarefa_do_usuario(request, pk):
+    tarefa = get_object_or_404(TarefaRelatorio.objects.select_related('usuario'), pk=pk)
+    if tarefa.usuario_id != request.user.id and not request.user.is_staff:
+        raise Http404
+    return tarefa
+
+
+@login_required
+def listar_relatorios(request):
+    tarefas = TarefaRelatorio.objects.filter(usuario=request.user)
+    paginator = Paginator(tarefas, 20)
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
+    for tarefa in page_obj:
+        tarefa.titulo = titulo_relatorio(tarefa.tipo)
+
+    return render(request, 'relatorio/tarefas.html', {
+        'page_obj': page_obj,
+        'atualizar': any(not tarefa.finalizada for tarefa in page_obj),
+    })
+
+
+@login_required
+def status_relatorio(request, pk):
+    tarefa = _tarefa_do_usuario(request, pk)
+    tarefa.titulo = titulo_relatorio(tarefa.tipo)
+    return render(request, 'relatorio/status.html', {'tarefa': tarefa})
+
+
+@login_required
+def status_relatorio_json(request, pk):
+    tarefa = _tarefa_do_usuario(request, pk)
+    return JsonResponse({
+        'id': tarefa.pk,
+        'status': tarefa.status,
+        'status_display': tarefa.get_status_display(),
+        'finalizada': tarefa.finalizada,
+        'download': reverse('download_relatorio', args=[tarefa.pk]) if tarefa.status == TarefaRelatorio.CONCLUIDA else None,
+        'erro': tarefa.mensagem_erro or None,
+    })
+
+
+@login_required
+def download_relatorio(request, pk):
+    tarefa = _tarefa_do_usuario(request, pk)
+    if tarefa.status != TarefaRelatorio.CONCLUIDA:
+        messages.warning(request, "O relatório ainda não está pronto.")
+        return redirect('status_relatorio', pk=tarefa.pk)
+
+    try:
+        arquivo = open(caminho_arquivo(tarefa), 'rb')
+    except FileNotFoundError:
+        messages.error(request, "O arquivo deste relatório expirou. Gere o relatório novamente.")
+        return redirect('listar_relatorios')
+
+    return FileResponse(arquivo, as_attachment=True, filename=tarefa.nome_arquivo, content_type='application/pdf')
+
+
+@login_required
+@staff_required
+def tempos_por_view(request):
+    if request.method == 'POST':
+        estatisticas.limpar()
+        messages.success(request, "Tempos zerados.")
+        return redirect('tempos_por_view')
+
+    return render(request, 'instrumentacao/tempos.html', {
+        'linhas': estatisticas.resumo(),
+        'etapas': ETAPAS,
+        'ativo': settings.SERVER_TIMING,
+        'amostras': estatisticas.amostras,
+    })
+
+
+@login_required
+@staff_required
+def consultas_lentas(request):
+    if request.method == 'POST':
+        registro_consultas.limpar()
+        messages.success(request, "Consultas lentas apagadas.")
+        return redirect('consultas_lentas')
+
+    grupos = registro_consultas.agrupar()
+    explicacao = None
+    chave = request.GET.get('explicar')
+    if chave:
+        grupo = next((grupo for grupo in grupos if grupo['chave'] == chave), None)
+        if grupo is None:
+            messages.warning(request, "Essa consulta não está mais no registro.")
+        else:
+            try:
+                colunas, linhas = explicar(grupo['amostra'])
+                explicacao = {'chave': chave, 'colunas': colunas, 'linhas': linhas}
+            except (ValueError, DatabaseError) as e:
+                messages.error(request, f"Não foi possível rodar o EXPLAIN: {e}")
+
+    return render(request, 'instrumentacao/consultas_lentas.html', {
+        'grupos': grupos,
+        'explicacao': explicacao,
+        'limite_ms': settings.CONSULTAS_LENTAS_MS,
+        'tamanho': settings.CONSULTAS_LENTAS_MAX,
+    })
+
+
+def metricas_prometheus(request):
+    """Raspagem do Prometheus: sem sessão, protegida por METRICAS_TOKEN quando definido."""
+    if not settings.METRICAS:
+        raise Http404
+    if settings.METRICAS_TOKEN:
+        esperado = f'Bearer {settings.METRICAS_TOKEN}'
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), esperado):
+            return HttpResponseForbidden("Token inválido.")
+    return HttpResponse(exposicao(), content_type='text/plain; version=0.0.4; charset=utf-8')
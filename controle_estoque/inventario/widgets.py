@@ -0,0 +1,35 @@
+from django import forms
+from django.urls import reverse
+
+from .models import Produto
+
+
+class AutocompleteProduto(forms.Widget):
+    """
+    Campo de produto com busca por digitação (view autocompletar_produtos).
+
+    Substitui o <select> com o catálogo inteiro: só o produto já escolhido é
+    lido do banco, para mostrar o nome e o estoque. O valor enviado é o id do
+    produto, num campo oculto com o nome do campo.
+    """
+    template_name = 'widgets/autocomplete_produto.html'
+
+    class Media:
+        js = ['js/autocomplete_produto.js']
+
+    def __init__(self, attrs=None, incluir_inativos=False):
+        super().__init__(attrs)
+        self.incluir_inativos = incluir_inativos
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        rotulo = ''
+        if value not in (None, '') and str(value).isdigit():
+            produto = Produto.objects.filter(pk=value).select_related('saldo').first()
+            if produto is not None:
+                rotulo = f"{produto.nome} (Estoque: {produto.estoque_total})"
+        url = reverse('autocompletar_produtos')
+        if self.incluir_inativos:
+            url += '?inativos=1'
+        context['widget'].update({'rotulo': rotulo, 'url': url})
+        return context
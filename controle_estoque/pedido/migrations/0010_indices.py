@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contratos', '0013_indices'),
+        ('pedido', '0009_ultima_alteracao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clientepedido',
+            index=models.Index(fields=['nome', 'id'], name='clientepedido_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clientepedido',
+            index=models.Index(fields=['usuario_criador', 'nome', 'id'], name='clientepedido_usuario_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clientepedido',
+            index=models.Index(fields=['usuario_criador', 'data_criacao'], name='clientepedido_usuario_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clientepedido',
+            index=models.Index(fields=['data_criacao'], name='clientepedido_data_idx'),
+        ),
+    ]
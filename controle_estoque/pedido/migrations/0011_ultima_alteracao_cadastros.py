@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedido', '0010_indices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoriapedido',
+            name='ultima_alteracao',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última Alteração'),
+        ),
+    ]
@@ -7,6 +7,8 @@ from django.utils import timezone
 class CategoriaPedido(models.Model):
     nome = models.CharField(max_length=100, unique=True)
     descricao = models.TextField(blank=True, null=True, verbose_name="Descrição")
+    # O nome aparece no relatório de pedidos: entra na versão do cache (pedido.relatorios)
+    ultima_alteracao = models.DateTimeField(auto_now=True, verbose_name="Última Alteração")
 
     class Meta:
         ordering = ['nome']
@@ -28,6 +30,8 @@ class ClientePedido(models.Model):
         auto_now_add=True, 
         verbose_name="Data de Cadastro"
     )
+    # Usado na versão dos relatórios em cache (inventario.cache_relatorios)
+    ultima_alteracao = models.DateTimeField(auto_now=True, verbose_name="Última Alteração")
 
     nome = models.CharField(max_length=200, verbose_name="Nome/Empresa")
     cnpj = models.CharField(max_length=18, verbose_name="CNPJ/CPF")
@@ -53,6 +57,14 @@ class ClientePedido(models.Model):
         ordering = ['nome']
         verbose_name = "Cliente (Pedido)"
         verbose_name_plural = "Clientes (Pedido)"
+        indexes = [
+            # Listagem paginada por (nome, id): todos (superusuário) ou só os do usuário
+            models.Index(fields=['nome', 'id'], name='clientepedido_nome_idx'),
+            models.Index(fields=['usuario_criador', 'nome', 'id'], name='clientepedido_usuario_nome_idx'),
+            # Filtro por período de cadastro
+            models.Index(fields=['usuario_criador', 'data_criacao'], name='clientepedido_usuario_data_idx'),
+            models.Index(fields=['data_criacao'], name='clientepedido_data_idx'),
+        ]
 
     # Atualizei o __str__ para ficar mais informativo
     def __str__(self):
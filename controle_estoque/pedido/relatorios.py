@@ -0,0 +1,91 @@
+"""
+Montagem do relatório em PDF de pedidos, usado pela view gerar_pdf_pedidos
+e pelo worker de relatórios (manage.py run_report_worker).
+"""
+from datetime import datetime, time
+
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from contratos.models import Tecnico
+
+from .forms import ClientePedidoFilterForm
+from .models import CategoriaPedido, ClientePedido
+
+
+def _filtrar_pedidos(parametros, usuario):
+    # Lógica de filtro (idêntica à da view 'listar_clientes_pedido')
+    clientes_list = ClientePedido.objects.select_related('categoria', 'usuario_criador', 'tecnico').all()
+
+    if not usuario.is_superuser:
+        clientes_list = clientes_list.filter(usuario_criador=usuario)
+
+    filter_form = ClientePedidoFilterForm(parametros or None)
+
+    if filter_form.is_valid():
+        categoria = filter_form.cleaned_data.get('categoria')
+        if categoria:
+            clientes_list = clientes_list.filter(categoria=categoria)
+
+        if usuario.is_superuser:
+            tecnico = filter_form.cleaned_data.get('tecnico')
+            if tecnico:
+                clientes_list = clientes_list.filter(tecnico=tecnico)
+
+        if filter_form.cleaned_data.get('filtrar_por_data'):
+            data_inicio = filter_form.cleaned_data.get('data_inicio')
+            data_fim = filter_form.cleaned_data.get('data_fim')
+            if data_inicio and data_fim:
+                data_fim_com_hora = datetime.combine(data_fim, time.max)
+                clientes_list = clientes_list.filter(data_criacao__range=[data_inicio, data_fim_com_hora])
+
+    return filter_form, clientes_list
+
+
+def contar_pedidos(parametros, usuario):
+    return _filtrar_pedidos(parametros, usuario)[1].count()
+
+
+def versao_pedidos(parametros, usuario):
+    """Versão dos dados para o cache de relatórios; o conteúdo depende do usuário."""
+    versao = _filtrar_pedidos(parametros, usuario)[1].aggregate(
+        total=Count('id'), maior_id=Max('id'), alteracao=Max('ultima_alteracao')
+    )
+    # Nomes de categoria e técnico aparecem no PDF
+    versao['cadastros'] = [
+        modelo.objects.aggregate(alteracao=Max('ultima_alteracao'))['alteracao']
+        for modelo in (CategoriaPedido, Tecnico)
+    ]
+    versao['usuario'] = (usuario.pk, usuario.is_superuser)
+    return versao
+
+
+def montar_pdf_pedidos(parametros, usuario):
+    """Retorna (template, contexto, nome do arquivo) do relatório de pedidos."""
+    filter_form, clientes_list = _filtrar_pedidos(parametros, usuario)
+
+    # Sumário financeiro por categoria
+    financial_summary = clientes_list.filter(categoria__nome__isnull=False) \
+                                  .values('categoria__nome') \
+                                  .annotate(total_valor=Sum('valor_pedido')) \
+                                  .order_by('categoria__nome')
+
+    # Contagem por técnico (apenas se for superuser)
+    tecnico_summary = None
+    if usuario.is_superuser:
+        tecnico_summary = clientes_list.filter(tecnico__nome__isnull=False) \
+                                    .values('tecnico__nome') \
+                                    .annotate(total=Count('id')) \
+                                    .order_by('tecnico__nome')
+
+    context = {
+        'clientes': clientes_list,
+        'filter_form': filter_form,
+        'financial_summary': financial_summary,
+        'tecnico_summary': tecnico_summary,
+        'total_clientes_encontrados': clientes_list.count(),
+        'data_geracao': timezone.now(),
+        'user': usuario,
+    }
+    filename = f"relatorio_pedidos_{timezone.now().strftime('%Y%m%d')}.pdf"
+    return 'pedido/pdf_pedido.html', context, filename
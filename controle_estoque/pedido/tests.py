@@ -1,3 +1,64 @@
-from django.test import TestCase
+import os
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from contratos.models import Tecnico
+
+from .models import CategoriaPedido, ClientePedido
+from .relatorios import versao_pedidos
+
+
+class VersaoRelatorioPedidosTests(TestCase):
+    """A versão do relatório de pedidos em cache muda com tudo o que aparece no PDF."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('pedidos', password='senha-teste-123')
+        self.client.force_login(self.usuario)
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        configuracao = override_settings(
+            RELATORIOS_DIR=diretorio.name,
+            RELATORIOS_CACHE_DIR=os.path.join(diretorio.name, 'cache'),
+            RELATORIO_LIMITE_SINCRONO=100,
+        )
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        self.categoria = CategoriaPedido.objects.create(nome='Instalação')
+        self.tecnico = Tecnico.objects.create(nome='Ana')
+        self.pedido = ClientePedido.objects.create(
+            nome='Cliente', cnpj='00000000000100', categoria=self.categoria, tecnico=self.tecnico,
+            usuario_criador=self.usuario,
+        )
+
+    def _renomear(self, cadastro):
+        cadastro.nome += ' (novo)'
+        cadastro.save()
+
+    def test_versao_pedidos(self):
+        versao = versao_pedidos({}, self.usuario)
+        self.assertEqual(versao_pedidos({}, self.usuario), versao)
+
+        for cadastro in (self.categoria, self.tecnico, self.pedido):
+            self._renomear(cadastro)
+            nova = versao_pedidos({}, self.usuario)
+            self.assertNotEqual(nova, versao, cadastro)
+            versao = nova
+
+        # O conteúdo depende de quem pede: outro usuário tem outra versão
+        self.assertNotEqual(versao_pedidos({}, User.objects.create_user('outro')), versao)
+
+    def test_pdf_em_cache_refeito_ao_renomear(self):
+        url = reverse('pedido:gerar_pdf_pedidos')
+        primeira = self.client.get(url)
+        self.assertEqual(primeira['Content-Type'], 'application/pdf')
+        etag = primeira['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self._renomear(self.categoria)
+        resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta['ETag'], etag)
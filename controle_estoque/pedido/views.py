@@ -3,12 +3,12 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from .models import CategoriaPedido, ClientePedido
 from .forms import CategoriaPedidoForm, ClientePedidoForm, ClientePedidoFilterForm
-from django.core.paginator import Paginator
 from django.db.models import ProtectedError, Count, Sum
 from datetime import datetime, time
 from django.http import HttpResponse
 from django.utils import timezone
-from inventario.utils import render_to_pdf
+from inventario.fila_relatorios import gerar_ou_enfileirar
+from inventario.paginacao import TOTAL_MAXIMO, PaginadorKeyset
 from django.template.loader import render_to_string
 
 @login_required
@@ -31,9 +31,8 @@ def listar_categorias_pedido(request):
     if busca:
         categorias_list = categorias_list.filter(nome__icontains=busca)
 
-    paginator = Paginator(categorias_list, 10) # 10 itens por página
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = PaginadorKeyset(categorias_list, ('nome', 'id'), 10) # 10 itens por página
+    page_obj = paginator.pagina(request.GET.get('cursor'))
 
     context = {
         'page_obj': page_obj,
@@ -157,16 +156,16 @@ def listar_clientes_pedido(request):
     # ---------------------------------------------
         
     # Paginação (agora usa a lista 100% filtrada)
-    paginator = Paginator(clientes_list, 15) 
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = PaginadorKeyset(clientes_list, ('nome', 'id'), 15, total_maximo=TOTAL_MAXIMO)
+    page_obj = paginator.pagina(request.GET.get('cursor'))
     
     context = {
         'page_obj': page_obj,
         'filter_form': filter_form, 
         'request': request, 
         'financial_summary': financial_summary, # <-- Passa o novo sumário
-        'total_clientes_encontrados': paginator.count # <-- Passa o total de clientes
+        'total_clientes_encontrados': paginator.total, # <-- Passa o total de clientes (até TOTAL_MAXIMO)
+        'total_excede': paginator.total_excede,
     }
     return render(request, 'pedido/cliente/lista.html', context)
 
@@ -278,64 +277,9 @@ def gerar_pdf_pedidos(request):
     """
     Gera um PDF da lista de pedidos filtrada.
     """
-    # 1. Lógica de filtro (idêntica à sua view 'listar_clientes_pedido')
-    clientes_list = ClientePedido.objects.select_related('categoria', 'usuario_criador', 'tecnico').all()
-    
-    if not request.user.is_superuser:
-        clientes_list = clientes_list.filter(usuario_criador=request.user)
-    
-    filter_form = ClientePedidoFilterForm(request.GET or None)
-    
-    if filter_form.is_valid():
-        categoria = filter_form.cleaned_data.get('categoria')
-        if categoria:
-            clientes_list = clientes_list.filter(categoria=categoria)
-        
-        if request.user.is_superuser:
-            tecnico = filter_form.cleaned_data.get('tecnico')
-            if tecnico:
-                clientes_list = clientes_list.filter(tecnico=tecnico)
-        
-        if filter_form.cleaned_data.get('filtrar_por_data'):
-            data_inicio = filter_form.cleaned_data.get('data_inicio')
-            data_fim = filter_form.cleaned_data.get('data_fim')
-            if data_inicio and data_fim:
-                data_fim_com_hora = datetime.combine(data_fim, time.max)
-                clientes_list = clientes_list.filter(data_criacao__range=[data_inicio, data_fim_com_hora])
-    
-    # 2. Sumário Financeiro (Existente)
-    financial_summary = clientes_list.filter(categoria__nome__isnull=False) \
-                                  .values('categoria__nome') \
-                                  .annotate(total_valor=Sum('valor_pedido')) \
-                                  .order_by('categoria__nome')
-                                  
-    # --- 3. NOVO SUMÁRIO DE TÉCNICOS (como em image_d7d97a.png) ---
-    # Calcula a contagem por técnico (apenas se for superuser)
-    tecnico_summary = None
-    if request.user.is_superuser:
-        tecnico_summary = clientes_list.filter(tecnico__nome__isnull=False) \
-                                    .values('tecnico__nome') \
-                                    .annotate(total=Count('id')) \
-                                    .order_by('tecnico__nome')
-    # -----------------------------------------------------------
-    
-    # 4. Prepara o contexto para o PDF
-    context = {
-        'clientes': clientes_list,
-        'filter_form': filter_form, 
-        'financial_summary': financial_summary,
-        'tecnico_summary': tecnico_summary, # <-- Passa o novo sumário
-        'total_clientes_encontrados': clientes_list.count(),
-        'data_geracao': timezone.now(),
-        'user': request.user
-    }
-    
-    # 5. Renderiza o PDF (Existente)
-    pdf = render_to_pdf('pedido/pdf_pedido.html', context)
-    if pdf:
-        response = HttpResponse(pdf, content_type='application/pdf')
-        filename = f"relatorio_pedidos_{timezone.now().strftime('%Y%m%d')}.pdf"
-        response['Content-Disposition'] = f'inline; filename="{filename}"'
+    # Filtros da lista de pedidos; ver pedido.relatorios.montar_pdf_pedidos
+    response = gerar_ou_enfileirar(request, 'pedidos', request.GET.dict())
+    if response:
         return response
     
     messages.error(request, "Ocorreu um erro ao gerar o PDF.")